@@ -1,95 +1,73 @@
 
-import yfinance as yf
 import pandas as pd
 import numpy as np
 import argparse
+import bar_resampler
+import backtest_engine
+import robustness
+import result_sinks
+import instrumentation
+import indicator_cache
 
-def backtest_aggressive(df, initial_capital=100.0, leverage=10):
-    capital = initial_capital
-    position = 0.0
-    entry_price = 0.0
-    
-    trades = []
-    in_trade = False
-    
-    print("\n" + "="*70)
-    print(f"🔥 AGGRESSIVE KAMIKAZE BOT (Leverage {leverage}x) - Capital: ${initial_capital}")
-    print(f"⚠️  ADVERTENCIA: El apalancamiento magnifica ganancias Y PÉRDIDAS.")
-    print("-" * 70)
-    print(f"{'FECHA':<25} {'ACCIÓN':<10} {'PRECIO':<10} {'BALANCE':<10} {'P&L (REAL)'}")
-    print("-" * 70)
+def aggressive_signals(rsi, oversold=10, overbought=90):
+    # ENTRY Condition: RSI < 10 (Deep Oversold)
+    # EXIT Condition: RSI > 90 (Mean reverted high)
+    with np.errstate(invalid='ignore'):
+        return rsi < oversold, rsi > overbought
 
+def backtest_aggressive(df, initial_capital=100.0, leverage=10, montecarlo=0, verbose=True, sinks=None,
+                        run='aggressive'):
     # Strategy: Larry Connors RSI 2 Strategy (Mean Reversion extremely fast)
     # 1. RSI (2 periods)
     # 2. Buy when RSI < 10 (Oversold)
     # 3. Sell when RSI > 90 (Overbought)
     # 4. Stop Loss? No, we pray (or use a tight one). Let's use a fixed 1% movement stop (which is 10-20% equity loss).
     
-    delta = df['Close'].diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=2).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=2).mean()
-    rs = gain / loss
-    df['RSI_2'] = 100 - (100 / (1 + rs))
-    
-    for i in range(5, len(df)):
-        curr = df.iloc[i]
-        date = df.index[i]
-        price = curr['Close']
-        rsi = curr['RSI_2']
-        
-        # ------------------------
-        # TRADE MANAGEMENT (Exit)
-        # ------------------------
-        if in_trade:
-            # EXIT Condition: RSI > 90 (Mean reverted high) OR Stop Loss
-            
-            # Check Stop Loss (1% move against us = 10% loss at 10x leverage)
-            pct_change = (price - entry_price) / entry_price
-            leveraged_pnl = pct_change * leverage
-            
-            # Hard Stop at -1.5% price move (which is -15% equity at 10x)
-            if pct_change < -0.015: 
-                revenue = capital * (1 + leveraged_pnl)
-                capital = revenue
-                position = 0
-                in_trade = False
-                print(f"{str(date):<25} 💀 STOP LOSS  ${price:.2f}     ${capital:.2f}     {leveraged_pnl*100:+.2f}%")
-                trades.append({'date': date, 'type': 'SELL', 'price': price, 'pnl': leveraged_pnl*100})
-            
-            elif rsi > 90:
-                revenue = capital * (1 + leveraged_pnl)
-                capital = revenue
-                position = 0
-                in_trade = False
-                print(f"{str(date):<25} 🚀 TAKE PROFIT ${price:.2f}     ${capital:.2f}     {leveraged_pnl*100:+.2f}%")
-                trades.append({'date': date, 'type': 'SELL', 'price': price, 'pnl': leveraged_pnl*100})
+    df['RSI_2'] = indicator_cache.compute('rsi', df['Close'].to_numpy(), 2)
+    entries, exits = aggressive_signals(df['RSI_2'].to_numpy())
 
-            if capital <= 10: # Rekt
-                print(f"\n❌ CUENTA LIQUIDADA (Balance < $10). Game Over.")
-                break
+    # Hard Stop below -1.5% price move (which is -15% equity at 10x), checked before the RSI exit.
+    # Strict like the original pct_change < -0.015: a close at exactly -1.5% stays in the trade.
+    result = backtest_engine.run_backtest(df['Close'].to_numpy(), entries, exits, start=5, sl_pct=0.015, sl_strict=True,
+                                          leverage=leverage, initial_capital=initial_capital,
+                                          liquidation_level=10, index=df.index)
+    if verbose:
+        print_trades(df, result, leverage)
+    result_sinks.emit(result, sinks, run)
 
-        # ------------------------
-        # TRADE ENTRY (Signal)
-        # ------------------------
-        else: 
-            # ENTRY Condition: RSI < 10 (Deep Oversold)
-            if rsi < 10:
-                entry_price = price
-                position = 1 # Just a flag
-                in_trade = True
-                print(f"{str(date):<25} 🟢 BUY (Aggr)  ${price:.2f}     en haberes   -")
-                trades.append({'date': date, 'type': 'BUY', 'price': price})
+    if montecarlo:
+        # Same ledger in thousands of alternative orders / samples / fills
+        summary = robustness.analyze_result(result, montecarlo, leverage=leverage, liquidation_level=10)
+        robustness.print_report(summary, montecarlo, initial_capital)
+    return result
 
-    # Close Position at End
-    if in_trade:
-        final_price = df['Close'].iloc[-1]
-        pct_change = (final_price - entry_price) / entry_price
-        leveraged_pnl = pct_change * leverage
-        capital = capital * (1 + leveraged_pnl)
-        print(f"{'CIERRE FINAL':<25} ⚠️ CLOSE      ${final_price:.2f}     ${capital:.2f}     {leveraged_pnl*100:+.2f}%")
+def print_trades(df, result, leverage):
+    print("\n" + "="*70)
+    print(f"🔥 AGGRESSIVE KAMIKAZE BOT (Leverage {leverage}x) - Capital: ${result.initial_capital}")
+    print(f"⚠️  ADVERTENCIA: El apalancamiento magnifica ganancias Y PÉRDIDAS.")
+    print("-" * 70)
+    print(f"{'FECHA':<25} {'ACCIÓN':<10} {'PRECIO':<10} {'BALANCE':<10} {'P&L (REAL)'}")
+    print("-" * 70)
 
-    profit_total = capital - initial_capital
-    profit_pct = (profit_total / initial_capital) * 100
+    dates = df.index
+    for k in range(result.n_trades):
+        print(f"{str(dates[result.entry_idx[k]]):<25} 🟢 BUY (Aggr)  ${result.entry_price[k]:.2f}     en haberes   -")
+
+        date, price = dates[result.exit_idx[k]], result.exit_price[k]
+        capital, leveraged_pnl = result.capital_after[k], result.pnl[k]
+        if result.reason[k] == backtest_engine.SL:
+            print(f"{str(date):<25} 💀 STOP LOSS  ${price:.2f}     ${capital:.2f}     {leveraged_pnl*100:+.2f}%")
+        elif result.reason[k] == backtest_engine.EXIT:
+            print(f"{str(date):<25} 🚀 TAKE PROFIT ${price:.2f}     ${capital:.2f}     {leveraged_pnl*100:+.2f}%")
+        else:
+            # Close Position at End
+            print(f"{'CIERRE FINAL':<25} ⚠️ CLOSE      ${price:.2f}     ${capital:.2f}     {leveraged_pnl*100:+.2f}%")
+
+    if result.liquidated: # Rekt
+        print(f"\n❌ CUENTA LIQUIDADA (Balance < $10). Game Over.")
+
+    capital = result.final_capital
+    profit_pct = result.profit_pct
     
     print("-" * 70)
     print(f"RESULTADO FINAL: ${capital:.2f} ({profit_pct:+.2f}%)")
@@ -102,26 +80,27 @@ def backtest_aggressive(df, initial_capital=100.0, leverage=10):
         
     print("="*70 + "\n")
 
-def run_aggressive(ticker, interval='5m', leverage=10):
-    print(f"🔍 Ejecutando Estrategia Agresiva para {ticker} en {interval} con {leverage}x Apalancamiento...")
+def run_aggressive(ticker, interval='5m', leverage=10, start=None, end=None, montecarlo=0, verbose=True, sinks=None):
+    if verbose:
+        print(f"🔍 Ejecutando Estrategia Agresiva para {ticker} en {interval} con {leverage}x Apalancamiento...")
     
     # 5 days of 5m data
-    df = yf.download(ticker, period='5d', interval=interval, progress=False)
-    
-    if isinstance(df.columns, pd.MultiIndex):
-        try:
-            df.columns = df.columns.get_level_values(0)
-        except:
-            pass
-            
-    df.dropna(inplace=True)
-    backtest_aggressive(df, 100.0, leverage)
+    df = bar_resampler.get_bars(ticker, interval, period='5d', start=start, end=end)
+    return backtest_aggressive(df, 100.0, leverage, montecarlo, verbose, sinks, f"aggressive {ticker} {interval}")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("ticker", nargs="?", default="BTC-USD", help="Ticker")
     parser.add_argument("--interval", default="5m", help="Timeframe (1m, 5m)")
     parser.add_argument("--leverage", type=int, default=10, help="Leverage multiplier (e.g. 10, 20)")
+    parser.add_argument("--start", default=None, help="Inicio del rango (YYYY-MM-DD), usa el historial local")
+    parser.add_argument("--end", default=None, help="Fin del rango (YYYY-MM-DD)")
+    parser.add_argument("--montecarlo", type=int, nargs="?", const=10000, default=0,
+                        help="Simulaciones Monte Carlo sobre el resultado (por defecto 10000)")
+    result_sinks.add_export_argument(parser)
+    instrumentation.add_arguments(parser)
     args = parser.parse_args()
     
-    run_aggressive(args.ticker, args.interval, args.leverage)
+    with instrumentation.cli_session(args, f"aggressive {args.ticker}"):
+        run_aggressive(args.ticker, args.interval, args.leverage, args.start, args.end, args.montecarlo,
+                       sinks=result_sinks.from_specs(args.export))
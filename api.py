@@ -1,26 +1,55 @@
-from fastapi import FastAPI
-import psycopg2
-from psycopg2.extras import RealDictCursor
+import os
+from contextlib import asynccontextmanager
 
-app = FastAPI()
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse
+import db
+import response_cache
 
-def get_db_connection():
-    return psycopg2.connect(
-        dbname="trading_data",
-        user="postgres",
-        password="postgres",
-        host="localhost"
-    )
+# One bounded connection pool per process, opened at startup and closed at shutdown
+# (db.py: TRADING_DB_URL, TRADING_DB_POOL_MAX, ...). The handlers stay sync: FastAPI runs
+# them in its threadpool, and the pool caps how many of those threads hold a connection;
+# the rest wait up to the pool timeout and then get a 503 instead of piling up connections.
+#
+# Query endpoints go through response_cache: ETag / If-None-Match (304) and an in-memory
+# copy of the last result, dropped when the optimizer writes new rows (db.Pool.listen on
+# the optimization_logs channel). TTL in seconds: TRADING_API_CACHE_TTL (default 300).
+
+@asynccontextmanager
+async def lifespan(app):
+    app.state.pool = db.create_pool()
+    app.state.cache = response_cache.ResponseCache(float(os.environ.get('TRADING_API_CACHE_TTL', 300)))
+    app.state.pool.listen(db.OPTIMIZATION_CHANNEL, lambda: app.state.cache.invalidate(db.OPTIMIZATION_CHANNEL))
+    yield
+    app.state.pool.closeall()
+
+app = FastAPI(lifespan=lifespan)
 
 @app.get("/mejores-estrategias")
-def leer_optimizaciones():
-    conn = get_db_connection()
-    # RealDictCursor nos devuelve los datos como JSON listo para la API
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    cur.execute("SELECT * FROM optimization_logs ORDER BY run_date DESC LIMIT 10")
-    resultados = cur.fetchall()
-    cur.close()
-    conn.close()
-    return resultados
-
-# Para correrlo: uvicorn api:app --reload
\ No newline at end of file
+def leer_optimizaciones(request: Request):
+    # Filas como dict: JSON listo para la API (desde memoria mientras no haya resultados nuevos)
+    pool = request.app.state.pool
+    try:
+        return request.app.state.cache.respond(
+            request, 'mejores-estrategias',
+            lambda: pool.query("SELECT * FROM optimization_logs ORDER BY run_date DESC LIMIT 10"),
+            tags=(db.OPTIMIZATION_CHANNEL,))
+    except db.UNAVAILABLE as e:
+        # Pool exhausted (db.PoolTimeout) or database unreachable; anything else is a 500
+        raise HTTPException(status_code=503, detail=str(e))
+
+@app.get("/health")
+def health(request: Request):
+    pool = request.app.state.pool
+    try:
+        latency = pool.ping()
+    except Exception as e:
+        return JSONResponse(status_code=503, content={'status': 'error', 'detail': str(e), 'pool': pool.stats()})
+    return {'status': 'ok', 'db_ms': latency * 1000, 'pool': pool.stats()}
+
+@app.get("/metrics/pool")
+def pool_metrics(request: Request):
+    return {**request.app.state.pool.stats(), 'cache': request.app.state.cache.stats()}
+
+# Para correrlo: uvicorn api:app --reload
+# Sin Postgres (tests / local): TRADING_DB_URL=sqlite:///:memory: uvicorn api:app
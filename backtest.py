@@ -1,18 +1,15 @@
-import yfinance as yf
 import pandas as pd
 import numpy as np
+import market_data
+import indicators
 
 def ejecutar_backtest(ticket):
     # Descargamos historial amplio
-    df = yf.download(ticket, start='2024-01-01', interval='1d')
-    if isinstance(df.columns, pd.MultiIndex):
-        df.columns = df.columns.get_level_values(0)
-    
-    df.dropna(inplace=True)
+    df = market_data.get_bars(ticket, '1d', start='2024-01-01')
 
     # 1. Calculamos indicadores
-    df['SMA_20'] = df['Close'].rolling(window=20).mean()
-    df['SMA_50'] = df['Close'].rolling(window=50).mean()
+    df['SMA_20'] = indicators.sma(df['Close'].to_numpy(), 20)
+    df['SMA_50'] = indicators.sma(df['Close'].to_numpy(), 50)
 
     # 2. Definimos la Estrategia (1 = Comprado, 0 = Fuera del mercado)
     df['Posicion'] = np.where(df['SMA_20'] > df['SMA_50'], 1, 0)
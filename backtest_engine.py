@@ -0,0 +1,200 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+import instrumentation
+
+# Array-based backtest core shared by the bar-loop strategies.
+# Strategies precompute their entry / exit signals as boolean arrays (plus optional per-bar
+# TP/SL price levels) and this module runs one tight long-only position state machine over
+# plain Python floats: entry, take profit, stop loss, trailing stop, signal exit, leveraged
+# PnL, liquidation and close at the end. No pandas row access inside the loop.
+#
+# Exit priority on a bar: TP, then SL, then trailing stop, then the exit signal.
+# A bar that closes a trade cannot open a new one (same as the original loops).
+
+TP, SL, TRAIL, EXIT, END = 0, 1, 2, 3, 4
+REASONS = {TP: 'TP', SL: 'SL', TRAIL: 'TRAIL', EXIT: 'EXIT', END: 'END'}
+
+
+class TradeLedger:
+    # Columnar trade ledger: one preallocated NumPy array per field, filled in place.
+    # A long-only trade needs an entry bar and a later exit bar, so a run over n bars
+    # never has more than n // 2 + 1 trades.
+    COLUMNS = {
+        'entry_idx': np.int64, 'exit_idx': np.int64,
+        'entry_price': 'float64', 'exit_price': 'float64',
+        'tp_level': 'float64', 'sl_level': 'float64',
+        'pnl': 'float64', 'capital_after': 'float64',
+        'reason': np.int8,
+    }
+
+    def __init__(self, n_bars):
+        self.n = 0
+        self.columns = {name: np.empty(n_bars // 2 + 1, dtype) for name, dtype in self.COLUMNS.items()}
+        self._cols = list(self.columns.values())
+
+    def add(self, *row):
+        k = self.n
+        for col, value in zip(self._cols, row):
+            col[k] = value
+        self.n = k + 1
+
+    def arrays(self):
+        # Filled part of every column (views, no copy)
+        return {name: col[:self.n] for name, col in self.columns.items()}
+
+
+@dataclass
+class BacktestResult:
+    initial_capital: float
+    final_capital: float
+    liquidated: bool
+    # Trade ledger, one entry per trade
+    entry_idx: np.ndarray
+    exit_idx: np.ndarray
+    entry_price: np.ndarray
+    exit_price: np.ndarray
+    tp_level: np.ndarray
+    sl_level: np.ndarray
+    pnl: np.ndarray             # leveraged return of the trade (0.01 = +1%)
+    capital_after: np.ndarray
+    reason: np.ndarray
+    # Mark-to-market equity for every bar
+    equity: np.ndarray
+    # Bar timestamps (optional, for trades())
+    index: pd.Index = None
+
+    @property
+    def n_trades(self):
+        return len(self.entry_idx)
+
+    @property
+    def profit_pct(self):
+        return (self.final_capital - self.initial_capital) / self.initial_capital * 100
+
+    def trades(self):
+        # Ledger as a DataFrame, one row per trade (times are bar numbers without an index)
+        when = self.index if self.index is not None else np.arange(len(self.equity))
+        return pd.DataFrame({
+            'entry_time': when[self.entry_idx], 'exit_time': when[self.exit_idx],
+            'entry_price': self.entry_price, 'exit_price': self.exit_price,
+            'tp_level': self.tp_level, 'sl_level': self.sl_level,
+            'pnl': self.pnl, 'capital_after': self.capital_after,
+            'reason': [REASONS[r] for r in self.reason.tolist()],
+        })
+
+
+def _as_list(x, dtype):
+    return np.asarray(x, dtype=dtype).tolist() if x is not None else None
+
+
+@instrumentation.timed('backtest')
+def run_backtest(close, entries, exits=None, start=0, tp_pct=None, sl_pct=None,
+                 tp_price=None, sl_price=None, trail_pct=None, leverage=1.0,
+                 initial_capital=100.0, liquidation_level=None, index=None, sl_strict=False):
+    # tp_price / sl_price: per-bar price levels read at the entry bar (they win over tp_pct /
+    # sl_pct, which are a percentage of the entry price). The stop fires at price <= level,
+    # or only below it with sl_strict=True. The loop runs on Python lists: indexing a list
+    # of floats is much cheaper than indexing NumPy scalars.
+    close = np.asarray(close, dtype='float64')
+    n = len(close)
+    prices = close.tolist()
+    entry_sig = _as_list(entries, bool)
+    exit_sig = _as_list(exits, bool)
+    tp_levels = _as_list(tp_price, 'float64')
+    sl_levels = _as_list(sl_price, 'float64')
+
+    capital = float(initial_capital)
+    in_trade = False
+    liquidated = False
+    entry = tp = sl = peak = 0.0
+    entry_i = 0
+    has_tp = tp_pct is not None or tp_levels is not None
+    has_sl = sl_pct is not None or sl_levels is not None
+    below_sl = has_sl and sl_strict
+    has_sl = has_sl and not sl_strict
+    trail_keep = 1 - trail_pct if trail_pct else None
+
+    ledger = TradeLedger(max(n - start, 0))
+    for i in range(start, n):
+        price = prices[i]
+
+        # ------------------------
+        # TRADE MANAGEMENT (Exit)
+        # ------------------------
+        if in_trade:
+            reason = -1
+            if has_tp and price >= tp:
+                reason = TP
+            elif has_sl and price <= sl:
+                reason = SL
+            elif below_sl and price < sl:
+                reason = SL
+            elif trail_keep is not None and price <= peak * trail_keep:
+                reason = TRAIL
+            elif exit_sig is not None and exit_sig[i]:
+                reason = EXIT
+            elif price > peak:
+                peak = price
+
+            if reason >= 0:
+                pnl = (price - entry) / entry * leverage
+                capital = capital * (1 + pnl)
+                in_trade = False
+                ledger.add(entry_i, i, entry, price, tp, sl, pnl, capital, reason)
+                if liquidation_level is not None and capital <= liquidation_level:
+                    liquidated = True
+                    break
+
+        # ------------------------
+        # TRADE ENTRY (Signal)
+        # ------------------------
+        elif entry_sig[i]:
+            entry = peak = price
+            entry_i = i
+            tp = tp_levels[i] if tp_levels is not None else (entry * (1 + tp_pct) if tp_pct is not None else np.nan)
+            sl = sl_levels[i] if sl_levels is not None else (entry * (1 - sl_pct) if sl_pct is not None else np.nan)
+            in_trade = True
+
+    # Close Position at End
+    if in_trade:
+        price = prices[-1]
+        pnl = (price - entry) / entry * leverage
+        capital = capital * (1 + pnl)
+        ledger.add(entry_i, n - 1, entry, price, tp, sl, pnl, capital, END)
+
+    result = BacktestResult(
+        initial_capital=float(initial_capital),
+        final_capital=capital,
+        liquidated=liquidated,
+        **ledger.arrays(),
+        equity=None,
+        index=index,
+    )
+    result.equity = equity_curve(close, result, leverage)
+    instrumentation.count('bars_processed', max(n - start, 0))
+    instrumentation.count('trades', result.n_trades)
+    return result
+
+
+def equity_curve(close, result, leverage=1.0):
+    # Realised capital between trades, marked to market while a position is open
+    n = len(close)
+    equity = np.full(n, result.initial_capital)
+    if result.n_trades == 0:
+        return equity
+
+    # Realised capital steps at every exit bar
+    step = np.searchsorted(result.exit_idx, np.arange(n), side='right') - 1
+    equity = np.where(step >= 0, result.capital_after[np.maximum(step, 0)], result.initial_capital)
+
+    capital_before = np.r_[result.initial_capital, result.capital_after[:-1]]
+    for k in range(result.n_trades):
+        i0, i1 = result.entry_idx[k], result.exit_idx[k]
+        if i1 > i0:
+            move = (close[i0:i1] - result.entry_price[k]) / result.entry_price[k] * leverage
+            equity[i0:i1] = capital_before[k] * (1 + move)
+    if result.liquidated:
+        equity[result.exit_idx[-1]:] = result.final_capital
+    return equity
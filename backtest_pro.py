@@ -1,61 +1,75 @@
-import yfinance as yf
 import pandas as pd
 import numpy as np
+import market_data
+import indicators
+import instrumentation
 
-def ejecutar_backtest_con_stoploss(ticket, fast_ma, slow_ma, stop_loss_pct=0.05):
-    df = yf.download(ticket, start='2024-01-01', progress=False)
-    if isinstance(df.columns, pd.MultiIndex):
-        df.columns = df.columns.get_level_values(0)
-    
-    df.dropna(inplace=True)
-
-    # Indicadores
-    df['SMA_fast'] = df['Close'].rolling(window=fast_ma).mean()
-    df['SMA_slow'] = df['Close'].rolling(window=slow_ma).mean()
+@instrumentation.timed('backtest.stoploss')
+def stoploss_returns(close, sma_fast, sma_slow, stop_loss_pct=0.05):
+    # Motor lineal: los retornos diarios se calculan una sola vez (antes se recalculaba
+    # pct_change() de toda la serie en cada vela -> O(n²)) y el bucle recorre listas de floats.
+    # Devuelve (retornos por vela, índices donde saltó el stop-loss).
+    close = np.asarray(close, dtype='float64')
+    precios = close.tolist()
+    diarios = (close / indicators.shift(close, 1) - 1).tolist()
+    with np.errstate(invalid='ignore'):
+        cruce_arriba = (sma_fast > sma_slow).tolist()
+        cruce_abajo = (sma_fast < sma_slow).tolist()
+    umbral = 1 - stop_loss_pct
 
     # Variables de estado
     en_posicion = False
     precio_entrada = 0
-    retornos = []
-
-    for i in range(len(df)):
-        precio_actual = df['Close'].iloc[i]
-        sma_f = df['SMA_fast'].iloc[i]
-        sma_s = df['SMA_slow'].iloc[i]
+    retornos = [0.0] * len(precios)
+    stops = []
 
+    for i, precio_actual in enumerate(precios):
         # Lógica de Entrada (Cruce Dorado)
-        if not en_posicion and sma_f > sma_s:
-            en_posicion = True
-            precio_entrada = precio_actual
-            retornos.append(0) # Primer día de entrada no hay retorno
+        if not en_posicion:
+            if cruce_arriba[i]:
+                en_posicion = True
+                precio_entrada = precio_actual # Primer día de entrada no hay retorno
 
         # Lógica de Salida por Stop-Loss
-        elif en_posicion and precio_actual < precio_entrada * (1 - stop_loss_pct):
+        elif precio_actual < precio_entrada * umbral:
             en_posicion = False
-            retorno_operacion = (precio_actual / precio_entrada) - 1
-            retornos.append(retorno_operacion)
-            print(f"🛑 STOP-LOSS ACTIVADO en {df.index[i].date()} | Precio: {precio_actual:.2f}")
+            retornos[i] = (precio_actual / precio_entrada) - 1
+            stops.append(i)
 
         # Lógica de Salida por Cruce (Muerte)
-        elif en_posicion and sma_f < sma_s:
+        elif cruce_abajo[i]:
             en_posicion = False
-            retorno_operacion = (precio_actual / precio_entrada) - 1
-            retornos.append(retorno_operacion)
-        
+            retornos[i] = (precio_actual / precio_entrada) - 1
+
+        # Si estamos dentro, retorno diario; si no, 0
         else:
-            # Si estamos dentro, calculamos el retorno diario; si no, 0
-            if en_posicion:
-                retornos.append(df['Close'].pct_change().iloc[i])
-            else:
-                retornos.append(0)
+            retornos[i] = diarios[i]
+
+    return np.array(retornos), stops
+
+def backtest_stoploss(df, fast_ma, slow_ma, stop_loss_pct=0.05, verbose=True):
+    close = df['Close'].to_numpy()
+
+    # Indicadores
+    df['SMA_fast'] = indicators.sma(close, fast_ma)
+    df['SMA_slow'] = indicators.sma(close, slow_ma)
+
+    retornos, stops = stoploss_returns(close, df['SMA_fast'].to_numpy(), df['SMA_slow'].to_numpy(), stop_loss_pct)
+    if verbose:
+        for i in stops:
+            print(f"🛑 STOP-LOSS ACTIVADO en {df.index[i].date()} | Precio: {close[i]:.2f}")
 
     df['Retorno_Estrategia'] = retornos
     df['Cum_Estrategia'] = (1 + df['Retorno_Estrategia']).cumprod()
     
     return df
 
+def ejecutar_backtest_con_stoploss(ticket, fast_ma, slow_ma, stop_loss_pct=0.05):
+    df = market_data.get_bars(ticket, '1d', start='2024-01-01')
+    return backtest_stoploss(df, fast_ma, slow_ma, stop_loss_pct)
+
 if __name__ == "__main__":
     # Probamos con tus parámetros optimizados (5/40)
     resultado = ejecutar_backtest_con_stoploss('BTC-USD', 5, 40)
     final_val = resultado['Cum_Estrategia'].iloc[-1]
-    print(f"\nResultado Final con Stop-Loss: {final_val:.2f}x")
\ No newline at end of file
+    print(f"\nResultado Final con Stop-Loss: {final_val:.2f}x")
@@ -0,0 +1,135 @@
+import numpy as np
+import pandas as pd
+import market_data
+import bar_store
+
+# Local bar resampling.
+# Instead of downloading every symbol once per timeframe (5m aggressive, 15m scalping,
+# 1h breakout/fib, 1d backtests), the finest interval that covers the requested history is
+# fetched once and every coarser interval is aggregated locally:
+#   Open=first, High=max, Low=min, Close=last, Volume=sum
+# Bins are aligned to the trading session: UTC midnight for 24/7 crypto, 09:30 New York
+# for stocks (so 1h stock bars are 09:30, 10:30, ... like Yahoo's). Derived series are
+# cached in the bar store under "<interval>@<base>" and only their last bin is rebuilt
+# when new base bars arrive.
+
+OHLCV_RULES = {'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last', 'Volume': 'sum'}
+
+INTERVAL_MINUTES = {
+    '1m': 1, '2m': 2, '5m': 5, '15m': 15, '30m': 30, '60m': 60, '90m': 90,
+    '1h': 60, '2h': 120, '4h': 240, '1d': 1440, '1wk': 10080, '1mo': 43200,
+}
+
+# Intervals we are willing to download as a base, finest first
+BASE_INTERVALS = ['5m', '15m', '1h', '1d']
+
+SESSIONS = {
+    'crypto': {'tz': 'UTC', 'open_minutes': 0},
+    'stock': {'tz': 'America/New_York', 'open_minutes': 9 * 60 + 30},
+}
+
+
+def session_for(ticker):
+    # Same heuristic as the portfolio runner: '-USD' pairs trade 24/7
+    return 'crypto' if '-USD' in ticker else 'stock'
+
+
+def _bin_labels(index, interval, session):
+    # Start of the target bar each source bar belongs to, computed on the session wall clock
+    spec = SESSIONS[session]
+    index = pd.DatetimeIndex(index)
+    if index.tz is None:
+        index = index.tz_localize('UTC')
+    local = index.tz_convert(spec['tz'])
+    day = local.normalize()
+
+    if interval == '1d':
+        return day
+    if interval == '1wk':
+        return day - pd.to_timedelta(local.dayofweek, unit='D')
+    if interval == '1mo':
+        return day - pd.to_timedelta(local.day - 1, unit='D')
+
+    freq = INTERVAL_MINUTES[interval]
+    minutes = local.hour * 60 + local.minute
+    offset = spec['open_minutes'] % freq
+    bins = np.floor((minutes - offset) / freq) * freq + offset
+    return day + pd.to_timedelta(bins, unit='m')
+
+
+def resample_bars(df, interval, session='crypto'):
+    # Aggregate finer OHLCV bars into `interval` bars
+    if len(df) == 0:
+        return df.copy()
+    labels = _bin_labels(df.index, interval, session)
+    out = df[list(OHLCV_RULES)].groupby(labels).agg(OHLCV_RULES)
+    out.index.name = None
+    return out.dropna(subset=['Open'])
+
+
+def _divides(base, interval):
+    return INTERVAL_MINUTES[interval] % INTERVAL_MINUTES[base] == 0
+
+
+def _covers(ticker, base, requested):
+    # Can `base` bars reach back to `requested`, either from the provider or the local store?
+    meta = bar_store.read_meta(ticker, base)
+    if meta is not None and meta['rows'] and meta['requested_from'] is not None and requested is not None:
+        if meta['requested_from'] <= requested.value:
+            return True
+    limits = getattr(market_data.get_provider(), 'MAX_HISTORY_DAYS', {})
+    if base not in limits:
+        return True
+    if requested is None:
+        return False
+    # One day of slack: Yahoo's 60d limit should still serve a "60d" request
+    earliest = pd.Timestamp.now(tz='UTC') - pd.Timedelta(days=limits[base] + 1)
+    return requested >= earliest
+
+
+def choose_base(ticker, interval, requested):
+    for base in BASE_INTERVALS:
+        if INTERVAL_MINUTES[base] >= INTERVAL_MINUTES[interval]:
+            break
+        if _divides(base, interval) and _covers(ticker, base, requested):
+            return base
+    return interval
+
+
+def derive(ticker, interval, base_interval, session=None):
+    # Bring the cached "<interval>@<base>" series up to date with the stored base bars
+    session = session or session_for(ticker)
+    key = f'{interval}@{base_interval}'
+    base = bar_store.open_series(ticker, base_interval)
+    if base is None:
+        return key
+
+    derived = bar_store.open_series(ticker, key)
+    meta = bar_store.read_meta(ticker, key)
+    base_last = int(base.index[-1])
+
+    if derived is None or base.index[0] < derived.index[0] or meta.get('session') != session:
+        bars = resample_bars(base.to_frame(), interval, session)
+        bar_store.write_bars(ticker, key, bars, rewrite=True,
+                             extra={'base_last': base_last, 'session': session})
+    elif meta.get('base_last') != base_last:
+        # Only the last (possibly incomplete) bin and anything after it needs rebuilding
+        last_label = derived.last_timestamp()
+        bars = resample_bars(base.to_frame(start=last_label), interval, session)
+        bar_store.write_bars(ticker, key, bars, extra={'base_last': base_last})
+    return key
+
+
+def get_bars(ticker, interval='1d', period=None, start=None, end=None, refresh=True,
+             base_interval=None, session=None):
+    # Same contract as market_data.get_bars, but coarse intervals are built locally from
+    # the finest stored/downloadable interval instead of being downloaded separately
+    requested = market_data.requested_start(period, start)
+    base_interval = base_interval or choose_base(ticker, interval, requested)
+    if base_interval == interval:
+        return market_data.get_bars(ticker, interval, period=period, start=start, end=end, refresh=refresh)
+
+    if refresh:
+        market_data.update(ticker, base_interval, period=period, start=start)
+    key = derive(ticker, interval, base_interval, session)
+    return bar_store.load_frame(ticker, key, requested, end)
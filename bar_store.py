@@ -0,0 +1,194 @@
+import os
+import json
+import tempfile
+
+import pandas as pd
+import numpy as np
+import instrumentation
+
+# Memory-mapped bar store.
+# Each (symbol, interval) lives in its own folder with one contiguous fixed-dtype file per
+# column plus the timestamp index:
+#
+#   data_cache/<interval>/<SYMBOL>/index.i8   -> int64 timestamps (ns, UTC), sorted
+#   data_cache/<interval>/<SYMBOL>/Open.f8    -> float64 (same for High/Low/Close/Volume)
+#   data_cache/<interval>/<SYMBOL>/meta.json  -> rows, tz, requested_from
+#
+# Readers map the files read-only (np.memmap mode 'r'), so years of 1m bars can be sliced by
+# time range without loading them into RAM and several processes share the same OS pages.
+# Writers only ever extend a file or overwrite its last rows in place; full rewrites go
+# through a temp file + os.replace so an open mapping is never truncated under a reader.
+
+CACHE_DIR = os.environ.get(
+    'TRADING_DATA_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data_cache')
+)
+
+COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+
+def symbol_dir(ticker, interval):
+    safe = ticker.replace('/', '_').replace('^', '_')
+    return os.path.join(CACHE_DIR, interval, safe)
+
+
+def _column_files(path):
+    files = {'index': os.path.join(path, 'index.i8')}
+    for col in COLUMNS:
+        files[col] = os.path.join(path, f'{col}.f8')
+    return files
+
+
+def read_meta(ticker, interval):
+    meta_file = os.path.join(symbol_dir(ticker, interval), 'meta.json')
+    if not os.path.exists(meta_file):
+        return None
+    with open(meta_file) as f:
+        return json.load(f)
+
+
+def _write_meta(path, meta):
+    tmp = os.path.join(path, 'meta.json.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp, os.path.join(path, 'meta.json'))
+
+
+def to_utc_ns(ts):
+    ts = pd.Timestamp(ts)
+    if ts.tzinfo is None:
+        ts = ts.tz_localize('UTC')
+    return int(ts.tz_convert('UTC').as_unit('ns').value)
+
+
+def index_to_ns(index):
+    index = pd.DatetimeIndex(index)
+    if index.tz is not None:
+        index = index.tz_convert('UTC').tz_localize(None)
+    return index.as_unit('ns').asi8
+
+
+def ns_to_index(values, tz):
+    index = pd.DatetimeIndex(np.asarray(values).astype('datetime64[ns]'))
+    if tz is not None:
+        index = index.tz_localize('UTC').tz_convert(tz)
+    return index
+
+
+class BarSeries:
+    # Read-only, memory-mapped view over the stored bars of one (symbol, interval)
+
+    def __init__(self, path, meta):
+        self.path = path
+        self.rows = meta['rows']
+        self.tz = meta.get('tz')
+        files = _column_files(path)
+        self.index = np.memmap(files['index'], dtype='<i8', mode='r', shape=(self.rows,))
+        self.columns = {
+            col: np.memmap(files[col], dtype='<f8', mode='r', shape=(self.rows,))
+            for col in COLUMNS
+        }
+
+    def __len__(self):
+        return self.rows
+
+    def last_timestamp(self):
+        return ns_to_index(self.index[-1:], self.tz)[0]
+
+    def locate(self, start=None, end=None):
+        # Row bounds [i0, i1) for start <= ts < end, found by binary search on the index
+        i0 = 0 if start is None else int(np.searchsorted(self.index, to_utc_ns(start), side='left'))
+        i1 = self.rows if end is None else int(np.searchsorted(self.index, to_utc_ns(end), side='left'))
+        return i0, max(i0, i1)
+
+    def slice(self, start=None, end=None):
+        # Zero-copy views: (index, {column: array}) for the requested time range
+        i0, i1 = self.locate(start, end)
+        return self.index[i0:i1], {col: arr[i0:i1] for col, arr in self.columns.items()}
+
+    def to_frame(self, start=None, end=None):
+        # Only the requested range is copied into RAM
+        index, cols = self.slice(start, end)
+        data = {col: np.array(arr) for col, arr in cols.items()}
+        return pd.DataFrame(data, index=ns_to_index(index, self.tz))
+
+
+def open_series(ticker, interval):
+    # Memory-mapped series for (ticker, interval), or None if nothing is stored yet
+    meta = read_meta(ticker, interval)
+    if meta is None or meta['rows'] == 0:
+        return None
+    return BarSeries(symbol_dir(ticker, interval), meta)
+
+
+@instrumentation.timed('fetch.store_read')
+def load_frame(ticker, interval, start=None, end=None):
+    series = open_series(ticker, interval)
+    if series is None:
+        return pd.DataFrame(columns=COLUMNS, dtype='float64')
+    df = series.to_frame(start, end)
+    instrumentation.count('bars_loaded', len(df))
+    return df
+
+
+def _write_column(file_name, offset_rows, values):
+    # Overwrite from offset_rows onwards, extending the file; never shrink it below the
+    # new end so existing mappings stay valid
+    mode = 'r+b' if os.path.exists(file_name) else 'wb'
+    with open(file_name, mode) as f:
+        f.seek(offset_rows * 8)
+        values.tofile(f)
+
+
+def _rewrite(path, files, df):
+    # Full rewrite: new files are swapped in atomically, old mappings keep the old inode
+    for name, file_name in files.items():
+        if name == 'index':
+            values = index_to_ns(df.index).astype('<i8')
+        else:
+            values = df[name].to_numpy(dtype='<f8')
+        fd, tmp = tempfile.mkstemp(dir=path)
+        with os.fdopen(fd, 'wb') as f:
+            values.tofile(f)
+        os.replace(tmp, file_name)
+
+
+@instrumentation.timed('fetch.store_write')
+def write_bars(ticker, interval, df, requested_from=None, rewrite=False, extra=None):
+    # Append bars to the store. Stored bars at or after the first new timestamp are
+    # replaced (the last stored candle may have been incomplete when it was saved).
+    path = symbol_dir(ticker, interval)
+    os.makedirs(path, exist_ok=True)
+    files = _column_files(path)
+    meta = read_meta(ticker, interval)
+
+    if meta is None or rewrite:
+        tz = pd.DatetimeIndex(df.index).tz if len(df) else None
+        meta = {'rows': 0, 'tz': str(tz) if tz is not None else None, 'requested_from': None}
+        _rewrite(path, files, df)
+        meta['rows'] = len(df)
+
+    elif len(df) > 0:
+        new_index = index_to_ns(df.index)
+        keep = meta['rows']
+        if keep > 0:
+            stored = np.memmap(files['index'], dtype='<i8', mode='r', shape=(keep,))
+            keep = int(np.searchsorted(stored, new_index[0], side='left'))
+            del stored
+
+        _write_column(files['index'], keep, new_index.astype('<i8'))
+        for col in COLUMNS:
+            _write_column(files[col], keep, df[col].to_numpy(dtype='<f8'))
+        # Rows past the new end (if any) are simply ignored by readers via meta['rows']
+        meta['rows'] = keep + len(df)
+
+    if extra:
+        # Free-form bookkeeping for derived series (e.g. which base bar they were built from)
+        meta.update(extra)
+
+    if requested_from is not None:
+        requested_ns = to_utc_ns(requested_from)
+        if meta['requested_from'] is None or requested_ns < meta['requested_from']:
+            meta['requested_from'] = requested_ns
+
+    _write_meta(path, meta)
@@ -0,0 +1,261 @@
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+
+import numpy as np
+import pandas as pd
+import indicator_cache
+import synthetic_data
+import smart_trend_strategy
+import aggressive_strategy
+import breakout_strategy
+import fib_strategy
+import scalping_signals
+import optimizer_db
+import portfolio_engine
+import robustness
+
+# Benchmark suite over synthetic bars (no network).
+# Every stage gets its inputs prepared outside the timer and is timed on a cold indicator
+# cache (the cache is cleared before each run); the best of --repeat runs is reported.
+# Results go to a JSON file; with --baseline each stage is compared against a stored run
+# and the exit code is 1 when any stage got slower than the tolerance.
+#
+# Some stages don't scale to 10M bars in a useful amount of time (a 5k-pair grid, a
+# per-bar portfolio walk, a plotly figure), so they run on the most recent STAGE_LIMITS
+# bars of the series; the JSON records how many bars each stage actually used.
+
+STAGE_LIMITS = {
+    'detect_patterns': 2_000_000,
+    'optimizer_grid': 200_000,
+    'portfolio': 100_000,
+    'montecarlo': 100_000,
+    'chart': 20_000,
+}
+
+SIZES = {'1k': 1_000, '10k': 10_000, '100k': 100_000, '1M': 1_000_000, '10M': 10_000_000}
+
+
+def parse_size(text):
+    # '1k', '250k', '1M', '10M' or a plain number
+    text = str(text)
+    if text in SIZES:
+        return SIZES[text]
+    for suffix, mult in (('k', 1_000), ('K', 1_000), ('M', 1_000_000)):
+        if text.endswith(suffix):
+            return int(float(text[:-1]) * mult)
+    return int(text)
+
+
+def size_label(n):
+    for label, size in SIZES.items():
+        if size == n:
+            return label
+    return str(n)
+
+
+# ------------------------
+# Stages: setup(df) -> zero-argument callable that does the timed work. A stage that
+# doesn't process df's bars as-is sets run.bars to the number of bars it really handles.
+# ------------------------
+
+def _indicators(df):
+    frames = [df.copy(), df.copy()]
+
+    def run():
+        smart_trend_strategy.calculate_indicators(frames[0])
+        scalping_signals.calculate_indicators(frames[1])
+    return run
+
+
+def _detect_patterns(df):
+    data = scalping_signals.calculate_indicators(df.copy())
+    return lambda: scalping_signals.detect_patterns(data)
+
+
+def _backtest_smart_trend(df):
+    data = smart_trend_strategy.calculate_indicators(df.copy())
+    return lambda: smart_trend_strategy.backtest_smart_trend(data, 100.0, 5, verbose=False)
+
+
+def _backtest_aggressive(df):
+    data = df.copy()
+    return lambda: aggressive_strategy.backtest_aggressive(data, 100.0, 10, verbose=False)
+
+
+def _backtest_breakout(df):
+    data = df.copy()
+    return lambda: breakout_strategy.backtest_breakout(data, 100.0, verbose=False)
+
+
+def _backtest_fib(df):
+    data = df.copy()
+    data['EMA_50'] = fib_strategy.calculate_ema(data, 50)
+    return lambda: fib_strategy.backtest_fib_strategy(data, 100.0, verbose=False)
+
+
+def _backtest_scalping(df):
+    data = scalping_signals.calculate_indicators(df.copy())
+    signals = scalping_signals.detect_patterns(data)
+    return lambda: scalping_signals.backtest_strategy(signals, 100.0, data, verbose=False)
+
+
+def _optimizer_grid(df):
+    close = df['Close'].to_numpy()
+    return lambda: optimizer_db.evaluate_sma_grid(close, range(2, 60), range(20, 200, 2))
+
+
+def _portfolio(df):
+    # 10 fresh crypto-like assets (every bar tradable) of len(df) // 10 bars each; the bar
+    # count recorded for the stage is what is actually simulated (run.bars)
+    n = max(len(df) // 10, 100)
+    frames = {f'SYN{i:03d}-USD': synthetic_data.regime_bars(n, i, interval='1h') for i in range(10)}
+
+    def run():
+        portfolio_engine.run_smart_trend_portfolio(frames, leverage=5, max_positions=5)
+    run.bars = sum(len(f) for f in frames.values())
+    return run
+
+
+def _montecarlo(df):
+    data = smart_trend_strategy.calculate_indicators(df.copy())
+    result = smart_trend_strategy.backtest_smart_trend(data, 100.0, 5, verbose=False)
+    return lambda: robustness.analyze_result(result, 10_000, leverage=5)
+
+
+def _chart(df):
+    data = scalping_signals.calculate_indicators(df.copy())
+    signals = scalping_signals.detect_patterns(data)
+    return lambda: scalping_signals.build_chart(data, signals, 'benchmark').to_html(include_plotlyjs='cdn')
+
+
+STAGES = {
+    'indicators': _indicators,
+    'detect_patterns': _detect_patterns,
+    'backtest_smart_trend': _backtest_smart_trend,
+    'backtest_aggressive': _backtest_aggressive,
+    'backtest_breakout': _backtest_breakout,
+    'backtest_fib_strategy': _backtest_fib,
+    'backtest_scalping': _backtest_scalping,
+    'optimizer_grid': _optimizer_grid,
+    'portfolio': _portfolio,
+    'montecarlo': _montecarlo,
+    'chart': _chart,
+}
+
+
+def time_stage(setup, df, repeat=3):
+    # (best seconds, bars processed)
+    best = np.inf
+    for _ in range(repeat):
+        run = setup(df)
+        indicator_cache.CACHE.clear()
+        t0 = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - t0)
+    return best, getattr(run, 'bars', len(df))
+
+
+def run_suite(sizes, stages=None, repeat=3, seed=0, interval='1m', verbose=True):
+    # {size label: {stage: {'seconds', 'bars', 'bars_per_sec'}}}
+    stages = stages or list(STAGES)
+    # Warm-up on a small series: lazy imports, plotly templates, first-call allocations
+    warmup = synthetic_data.regime_bars(1_000, seed, interval=interval)
+    for name in stages:
+        time_stage(STAGES[name], warmup, 1)
+
+    results = {}
+    for n in sizes:
+        t0 = time.perf_counter()
+        df = synthetic_data.regime_bars(n, seed, interval=interval)
+        if verbose:
+            print(f"\n📦 {size_label(n)} velas ({interval}) generadas en {time.perf_counter() - t0:.2f}s")
+        results[size_label(n)] = {}
+        for name in stages:
+            limit = STAGE_LIMITS.get(name)
+            data = df.iloc[-limit:] if limit and n > limit else df
+            seconds, bars = time_stage(STAGES[name], data, repeat)
+            results[size_label(n)][name] = {'seconds': seconds, 'bars': bars,
+                                            'bars_per_sec': bars / seconds if seconds > 0 else None}
+            if verbose:
+                print(f"   {name:<24} {seconds:9.4f}s  {bars:>10} velas  {bars / seconds:>14,.0f} velas/s")
+    return results
+
+
+def environment():
+    return {
+        'created': pd.Timestamp.now(tz='UTC').isoformat(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def compare(current, baseline, tolerance=0.25, min_seconds=0.005):
+    # [(size, stage, baseline s, current s, ratio, regression?)] for the stages in both runs.
+    # Timings under min_seconds are too noisy to flag.
+    rows = []
+    for size, stages in current['results'].items():
+        for stage, cur in stages.items():
+            base = baseline.get('results', {}).get(size, {}).get(stage)
+            if base is None or base['bars'] != cur['bars']:
+                continue
+            ratio = cur['seconds'] / base['seconds'] if base['seconds'] > 0 else np.inf
+            slower = ratio > 1 + tolerance and cur['seconds'] >= min_seconds
+            rows.append((size, stage, base['seconds'], cur['seconds'], ratio, slower))
+    return rows
+
+
+def print_comparison(rows, tolerance):
+    print("\n" + "="*80)
+    print(f"📊 COMPARACIÓN CON BASELINE (tolerancia +{tolerance:.0%})")
+    print("-" * 80)
+    print(f"{'TAMAÑO':<7} {'ETAPA':<24} {'BASELINE':>10} {'ACTUAL':>10} {'RATIO':>7}")
+    for size, stage, base, cur, ratio, slower in rows:
+        flag = "🔴 REGRESIÓN" if slower else ("🟢" if ratio < 1 - tolerance else "")
+        print(f"{size:<7} {stage:<24} {base:>9.4f}s {cur:>9.4f}s {ratio:>6.2f}x {flag}")
+    print("="*80 + "\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", nargs="+", default=['1k', '10k', '100k'], help="Tamaños de serie (1k ... 10M)")
+    parser.add_argument("--stages", nargs="+", default=None, choices=list(STAGES), help="Etapas a medir (todas por defecto)")
+    parser.add_argument("--repeat", type=int, default=3, help="Repeticiones por etapa (se guarda la mejor)")
+    parser.add_argument("--seed", type=int, default=0, help="Semilla de los datos sintéticos")
+    parser.add_argument("--interval", default="1m", help="Timeframe de las velas sintéticas")
+    parser.add_argument("--output", default="benchmark_results.json", help="Archivo JSON de resultados")
+    parser.add_argument("--baseline", default=None, help="JSON de referencia para detectar regresiones")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Lentitud permitida frente al baseline (0.25 = +25%%)")
+    parser.add_argument("--update-baseline", action="store_true", help="Guardar esta ejecución como nuevo baseline (requiere --baseline)")
+    args = parser.parse_args()
+    if args.update_baseline and not args.baseline:
+        parser.error("--update-baseline necesita --baseline con la ruta donde guardar la referencia")
+
+    sizes = [parse_size(s) for s in args.sizes]
+    report = {
+        'environment': environment(),
+        'config': {'seed': args.seed, 'interval': args.interval, 'repeat': args.repeat, 'stage_limits': STAGE_LIMITS},
+        'results': run_suite(sizes, args.stages, args.repeat, args.seed, args.interval),
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 Resultados guardados en {args.output}")
+
+    if args.baseline and args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"📌 Baseline actualizado: {args.baseline}")
+    elif args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        rows = compare(report, baseline, args.tolerance)
+        print_comparison(rows, args.tolerance)
+        if any(row[-1] for row in rows):
+            print("❌ Regresiones de rendimiento detectadas")
+            sys.exit(1)
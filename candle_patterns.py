@@ -0,0 +1,132 @@
+import numpy as np
+
+# Vectorized candle-pattern engine.
+# Candle anatomy (body, wicks, direction, previous candle) is computed once for the whole
+# frame as arrays, every pattern is a mask function over those arrays, and the
+# Bollinger/RSI context is another pair of masks. No per-bar Series objects, so thousands
+# of bars across many symbols are scanned in milliseconds.
+#
+# New patterns: register_pattern('Doji', 'BUY', lambda c: c['body'] < 0.1 * c['full_range'])
+# Patterns of the same side are tried in registration order; the first match names the bar.
+# detect_bar() runs the same masks on just the previous + new candle (live streaming).
+
+
+def candle_features(df):
+    return features(df['Open'].to_numpy(dtype='float64'), df['High'].to_numpy(dtype='float64'),
+                    df['Low'].to_numpy(dtype='float64'), df['Close'].to_numpy(dtype='float64'))
+
+
+def features(o, h, l, c):
+    prev_o = np.r_[np.nan, o[:-1]]
+    prev_c = np.r_[np.nan, c[:-1]]
+    return {
+        'open': o, 'high': h, 'low': l, 'close': c,
+        'prev_open': prev_o, 'prev_close': prev_c,
+        'body': np.abs(c - o),
+        'full_range': h - l,
+        'lower_wick': np.minimum(o, c) - l,
+        'upper_wick': h - np.maximum(o, c),
+        'is_bullish': c > o,
+        'is_bearish': c < o,
+        'prev_bullish': prev_c > prev_o,
+        'prev_bearish': prev_c < prev_o,
+    }
+
+
+# ------------------------
+# Pattern masks
+# ------------------------
+
+def hammer(c):
+    # Long lower wick, small body at top
+    return (c['lower_wick'] > 2 * c['body']) & (c['upper_wick'] < c['body'])
+
+
+def bullish_engulfing(c):
+    # Current bullish body engulfs previous bearish body
+    return (c['is_bullish'] & c['prev_bearish']
+            & (c['close'] > c['prev_open']) & (c['open'] < c['prev_close']))
+
+
+def shooting_star(c):
+    # Long upper wick, small body at bottom
+    return (c['upper_wick'] > 2 * c['body']) & (c['lower_wick'] < c['body'])
+
+
+def bearish_engulfing(c):
+    return (c['is_bearish'] & c['prev_bullish']
+            & (c['close'] < c['prev_open']) & (c['open'] > c['prev_close']))
+
+
+PATTERNS = {
+    'BUY': [('Hammer', hammer), ('Bullish Engulfing', bullish_engulfing)],
+    'SELL': [('Shooting Star', shooting_star), ('Bearish Engulfing', bearish_engulfing)],
+}
+
+
+def register_pattern(name, side, mask_fn):
+    PATTERNS[side].append((name, mask_fn))
+
+
+# ------------------------
+# Context (Bollinger + RSI)
+# ------------------------
+
+def buy_context(c, rsi, bb_lower):
+    # Price <= Lower Band AND RSI < 35
+    return (c['low'] <= bb_lower * 1.002) & (rsi < 35)
+
+
+def sell_context(c, rsi, bb_upper):
+    # Price >= Upper Band AND RSI > 65
+    return (c['high'] >= bb_upper * 0.998) & (rsi > 65)
+
+
+def _name_first_match(side, c):
+    patterns = PATTERNS[side]
+    if not patterns:
+        return np.full(len(c['close']), '', dtype=object)
+    masks = [fn(c) for _, fn in patterns]
+    names = [name for name, _ in patterns]
+    return np.select(masks, names, default='').astype(object)
+
+
+def detect(df):
+    # Per bar: (signal, pattern) arrays. Bullish patterns win if their context holds;
+    # otherwise the bar carries the bearish pattern name (SELL only with context).
+    return classify(candle_features(df), df['RSI'].to_numpy(), df['BB_Upper'].to_numpy(), df['BB_Lower'].to_numpy())
+
+
+def classify(c, rsi, bb_upper, bb_lower):
+    bull = _name_first_match('BUY', c)
+    bear = _name_first_match('SELL', c)
+
+    is_buy = (bull != '') & buy_context(c, rsi, bb_lower)
+    is_sell = ~is_buy & (bear != '') & sell_context(c, rsi, bb_upper)
+
+    signal = np.full(len(c['close']), None, dtype=object)
+    signal[is_buy] = 'BUY'
+    signal[is_sell] = 'SELL'
+    pattern = np.where(is_buy, bull, bear)
+    return signal, pattern
+
+
+def detect_patterns(df, start=2):
+    # Same records as the old per-bar loop: [(date, signal, pattern, price), ...]
+    signal, pattern = detect(df)
+    close = df['Close'].to_numpy()
+    return list(zip(df.index[start:], signal[start:].tolist(), pattern[start:].tolist(), close[start:]))
+
+
+def detect_bar(prev, bar, rsi, bb_upper, bb_lower):
+    # (signal, pattern) for one new candle: prev / bar are (open, high, low, close) tuples,
+    # the context values are the ones of the new bar
+    o, h, l, c = (np.array(pair, dtype='float64') for pair in zip(prev, bar))
+    signal, pattern = classify(features(o, h, l, c), np.array([np.nan, rsi]),
+                               np.array([np.nan, bb_upper]), np.array([np.nan, bb_lower]))
+    return signal[1], pattern[1]
+
+
+def detect_many(frames):
+    # {ticker: records} for a whole universe (frames already carry RSI / Bollinger columns)
+    return {ticker: detect_patterns(df) for ticker, df in frames.items()}
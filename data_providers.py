@@ -0,0 +1,113 @@
+import os
+import time
+
+import yfinance as yf
+import pandas as pd
+import instrumentation
+
+# Pluggable market-data providers.
+# A provider knows how to fetch OHLCV bars for one or more tickers and returns
+# {ticker: flat OHLCV DataFrame}. market_data / download_scheduler only talk to this
+# interface, so the Yahoo source can be swapped for a local stand-in (tests, offline
+# benchmarks) without touching the strategies.
+
+COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+
+class DownloadError(Exception):
+    pass
+
+
+def normalize_frame(df, ticker=None):
+    # Flatten the yfinance MultiIndex and keep only plain OHLCV columns
+    if df is None or len(df) == 0:
+        return pd.DataFrame(columns=COLUMNS, dtype='float64')
+
+    if isinstance(df.columns, pd.MultiIndex):
+        if ticker is not None and df.columns.nlevels > 1:
+            if ticker not in df.columns.get_level_values(-1):
+                return pd.DataFrame(columns=COLUMNS, dtype='float64')
+            df = df.xs(ticker, axis=1, level=-1)
+        else:
+            df = df.copy()
+            df.columns = df.columns.get_level_values(0)
+
+    df = df[[c for c in COLUMNS if c in df.columns]].astype('float64')
+    df = df.dropna()
+    df = df[~df.index.duplicated(keep='last')].sort_index()
+    return df
+
+
+class YahooProvider:
+    name = 'yahoo'
+    supports_batch = True
+    max_batch = 50
+
+    # Yahoo only serves a limited window of intraday history
+    MAX_HISTORY_DAYS = {
+        '1m': 7, '2m': 60, '5m': 60, '15m': 60, '30m': 60, '90m': 60,
+        '60m': 730, '1h': 730,
+    }
+
+    def clamp_start(self, start, interval):
+        limit = self.MAX_HISTORY_DAYS.get(interval)
+        if limit is None:
+            return start
+        # Stay a little inside the limit, Yahoo rejects requests right at the edge
+        earliest = pd.Timestamp.now(tz='UTC') - pd.Timedelta(days=limit) + pd.Timedelta(hours=1)
+        return earliest if start is None else max(start, earliest)
+
+    def fetch(self, tickers, interval, start=None):
+        start = self.clamp_start(start, interval)
+        if start is None:
+            raw = yf.download(tickers, period='max', interval=interval, progress=False)
+        else:
+            raw = yf.download(tickers, start=int(start.timestamp()), interval=interval, progress=False)
+
+        frames = {t: normalize_frame(raw, t) for t in tickers}
+        instrumentation.count('bars_downloaded', sum(len(f) for f in frames.values()))
+        # yfinance swallows network errors and returns an empty frame: surface that so the
+        # scheduler can retry (a single delisted symbol in a batch is not an error)
+        if all(len(f) == 0 for f in frames.values()):
+            raise DownloadError(f"Sin datos de Yahoo para {', '.join(tickers)} ({interval})")
+        return frames
+
+
+class LocalFileProvider:
+    # File-backed stand-in: reads <directory>/<interval>/<TICKER>.csv
+    # latency (seconds) simulates a network round trip for offline benchmarks.
+    name = 'local'
+    supports_batch = False
+    max_batch = 1
+
+    def __init__(self, directory, latency=0.0):
+        self.directory = directory
+        self.latency = latency
+
+    def _path(self, ticker, interval):
+        safe = ticker.replace('/', '_').replace('^', '_')
+        return os.path.join(self.directory, interval, f'{safe}.csv')
+
+    def fetch(self, tickers, interval, start=None):
+        frames = {}
+        for ticker in tickers:
+            if self.latency:
+                time.sleep(self.latency)
+            path = self._path(ticker, interval)
+            if not os.path.exists(path):
+                frames[ticker] = normalize_frame(None)
+                continue
+            df = pd.read_csv(path, index_col=0)
+            df.index = pd.to_datetime(df.index, utc=True)
+            df = normalize_frame(df)
+            if start is not None:
+                df = df[df.index >= start]
+            frames[ticker] = df
+        return frames
+
+    def export(self, frames, interval):
+        # Write {ticker: frame} as fixtures this provider can serve later
+        for ticker, df in frames.items():
+            path = self._path(ticker, interval)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            df.to_csv(path)
@@ -0,0 +1,351 @@
+import os
+import time
+import sqlite3
+import itertools
+import threading
+import contextlib
+
+import instrumentation
+
+# Bounded connection pool for the API (and anything else that talks to the DB repeatedly).
+#
+#   pool = db.create_pool()                  # TRADING_DB_URL, or the local Postgres below
+#   rows = pool.query("SELECT ...", params)  # list of dicts
+#   with pool.connection() as conn: ...      # commit on success, rollback on error
+#
+# At most `maxconn` connections are open; a caller that finds them all busy waits up to
+# `timeout` seconds for one to come back and then gets PoolTimeout (the API answers 503)
+# instead of opening yet another connection. Connections that broke while in use are
+# dropped and replaced on the next checkout.
+#
+# TRADING_DB_URL=sqlite:///ruta.db (or sqlite:///:memory:) swaps Postgres for a local
+# SQLite stand-in with the same tables, for tests and offline runs.
+#
+# Change notifications: writers call notify(cur, channel) inside their transaction
+# (Postgres NOTIFY, delivered on commit to every process that LISTENs) and publish(channel)
+# after committing (callbacks in this process). pool.listen(channel, callback) hooks up
+# both: a dedicated LISTEN connection for Postgres, the in-process callbacks for SQLite.
+
+DB_PARAMS = {
+    'dbname': 'trading_data',
+    'user': 'postgres',
+    'password': 'postgres',
+    'host': 'localhost',
+}
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS optimization_logs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    symbol TEXT,
+    best_fast INTEGER,
+    best_slow INTEGER,
+    final_return REAL,
+    study TEXT,
+    fold INTEGER,
+    train_start TEXT,
+    train_end TEXT,
+    test_start TEXT,
+    test_end TEXT,
+    train_return REAL,
+    run_date TEXT DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+
+OPTIMIZATION_CHANNEL = 'optimization_logs'
+
+_subscribers = {}
+_subscribers_lock = threading.Lock()
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+# Failures that mean "database unavailable" (the API answers 503); anything else is a bug
+UNAVAILABLE = (PoolTimeout, sqlite3.OperationalError)
+try:
+    import psycopg2
+    UNAVAILABLE += (psycopg2.OperationalError,)
+except ImportError:
+    pass
+
+
+def subscribe(channel, callback):
+    with _subscribers_lock:
+        _subscribers.setdefault(channel, []).append(callback)
+
+
+def unsubscribe(channel, callback):
+    with _subscribers_lock:
+        if callback in _subscribers.get(channel, ()):
+            _subscribers[channel].remove(callback)
+
+
+def publish(channel):
+    with _subscribers_lock:
+        callbacks = list(_subscribers.get(channel, ()))
+    for callback in callbacks:
+        callback()
+
+
+def notify(cur, channel):
+    # Postgres only: queued in the writer's transaction, sent to listeners on commit
+    cur.execute(f"NOTIFY {channel}")
+
+
+class Pool:
+    backend = None
+
+    def __init__(self, minconn=1, maxconn=10, timeout=5.0):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.idle = []
+        self.in_use = 0
+        self.slots = threading.BoundedSemaphore(maxconn)
+        self.lock = threading.Lock()
+        self.closed = False
+        self.counters = {'checkouts': 0, 'waits': 0, 'timeouts': 0, 'connects': 0,
+                         'discarded': 0, 'errors': 0}
+        self.wait_seconds = 0.0
+        self.max_wait = 0.0
+        self.listeners = []
+
+    # Backend hooks
+    def _connect(self):
+        raise NotImplementedError
+
+    def _cursor(self, conn):
+        return conn.cursor()
+
+    def _sql(self, sql):
+        return sql
+
+    def _is_broken(self, conn):
+        return False
+
+    def prefill(self):
+        # Opens `minconn` connections up front; a DB that is down only shows up in /health
+        try:
+            conns = [self.getconn() for _ in range(self.minconn)]
+        except Exception as e:
+            print(f"⚠️ Pool sin conexiones iniciales: {e}")
+            return
+        for conn in conns:
+            self.putconn(conn)
+
+    def getconn(self):
+        if self.closed:
+            raise PoolTimeout("pool cerrado")
+        t0 = time.perf_counter()
+        if not self.slots.acquire(blocking=False):
+            with self.lock:
+                self.counters['waits'] += 1
+            if not self.slots.acquire(timeout=self.timeout):
+                with self.lock:
+                    self.counters['timeouts'] += 1
+                raise PoolTimeout(f"sin conexiones libres tras {self.timeout:.1f}s ({self.maxconn} en uso)")
+        waited = time.perf_counter() - t0
+        with self.lock:
+            self.counters['checkouts'] += 1
+            self.wait_seconds += waited
+            self.max_wait = max(self.max_wait, waited)
+            conn = self.idle.pop() if self.idle else None
+            self.in_use += 1
+        if conn is not None and self._is_broken(conn):
+            self._close(conn)
+            conn = None
+        if conn is None:
+            try:
+                conn = self._connect()
+            except Exception:
+                with self.lock:
+                    self.in_use -= 1
+                    self.counters['errors'] += 1
+                self.slots.release()
+                raise
+            with self.lock:
+                self.counters['connects'] += 1
+        return conn
+
+    def putconn(self, conn, discard=False):
+        with self.lock:
+            self.in_use -= 1
+        if discard or self.closed or self._is_broken(conn):
+            self._close(conn)
+        else:
+            with self.lock:
+                self.idle.append(conn)
+        self.slots.release()
+
+    def _close(self, conn):
+        with self.lock:
+            self.counters['discarded'] += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    @contextlib.contextmanager
+    def connection(self):
+        conn = self.getconn()
+        discard = False
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            with self.lock:
+                self.counters['errors'] += 1
+            try:
+                conn.rollback()
+            except Exception:
+                discard = True
+            raise
+        finally:
+            self.putconn(conn, discard)
+
+    @instrumentation.timed('db')
+    def query(self, sql, params=()):
+        with self.connection() as conn:
+            cur = self._cursor(conn)
+            cur.execute(self._sql(sql), params)
+            rows = [dict(row) for row in cur.fetchall()] if cur.description else []
+            cur.close()
+            return rows
+
+    def ping(self):
+        # Round trip of SELECT 1 in seconds (raises if the DB is unreachable)
+        t0 = time.perf_counter()
+        self.query("SELECT 1 AS ok")
+        return time.perf_counter() - t0
+
+    def stats(self):
+        with self.lock:
+            checkouts = self.counters['checkouts']
+            return {
+                'backend': self.backend,
+                'maxconn': self.maxconn,
+                'open': self.in_use + len(self.idle),
+                'in_use': self.in_use,
+                'idle': len(self.idle),
+                **self.counters,
+                'wait_seconds_total': self.wait_seconds,
+                'wait_seconds_avg': self.wait_seconds / checkouts if checkouts else 0.0,
+                'wait_seconds_max': self.max_wait,
+            }
+
+    def listen(self, channel, callback):
+        # callback() on every change published to `channel` from this process
+        subscribe(channel, callback)
+        self.listeners.append((channel, callback))
+
+    def closeall(self):
+        self.closed = True
+        for channel, callback in self.listeners:
+            unsubscribe(channel, callback)
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for conn in idle:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+
+class PostgresPool(Pool):
+    backend = 'postgres'
+
+    def __init__(self, dsn=None, minconn=1, maxconn=10, timeout=5.0):
+        super().__init__(minconn, maxconn, timeout)
+        self.dsn = dsn
+
+    def _connect(self):
+        import psycopg2
+        if self.dsn:
+            return psycopg2.connect(self.dsn)
+        return psycopg2.connect(**DB_PARAMS)
+
+    def _cursor(self, conn):
+        from psycopg2.extras import RealDictCursor
+        return conn.cursor(cursor_factory=RealDictCursor)
+
+    def _is_broken(self, conn):
+        return bool(conn.closed)
+
+    def listen(self, channel, callback):
+        # Plus NOTIFYs from other processes, on a dedicated connection outside the pool
+        super().listen(channel, callback)
+        threading.Thread(target=self._listen_loop, args=(channel, callback),
+                         name=f'listen-{channel}', daemon=True).start()
+
+    def _listen_loop(self, channel, callback):
+        import select
+        conn = None
+        while not self.closed:
+            try:
+                if conn is None:
+                    conn = self._connect()
+                    conn.autocommit = True
+                    conn.cursor().execute(f"LISTEN {channel}")
+                    # Anything written while we weren't listening
+                    callback()
+                if select.select([conn], [], [], 1.0)[0]:
+                    conn.poll()
+                    if conn.notifies:
+                        conn.notifies.clear()
+                        callback()
+            except Exception:
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+                conn = None
+                time.sleep(5.0)
+        if conn is not None:
+            conn.close()
+
+
+class SqlitePool(Pool):
+    # Local stand-in: same interface and tables; ':memory:' is one shared in-memory DB
+    backend = 'sqlite'
+    _memory_ids = itertools.count()
+
+    def __init__(self, path=':memory:', minconn=1, maxconn=10, timeout=5.0):
+        super().__init__(minconn, maxconn, timeout)
+        if path == ':memory:':
+            self.target = f"file:trading_mem_{next(self._memory_ids)}?mode=memory&cache=shared"
+        else:
+            self.target = f"file:{path}"
+        # Keeps a shared in-memory database alive while pooled connections come and go
+        self.keeper = self._connect()
+        self.keeper.executescript(SQLITE_SCHEMA)
+        self.keeper.commit()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.target, uri=True, check_same_thread=False, timeout=self.timeout)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _sql(self, sql):
+        # psycopg2 placeholders -> sqlite
+        return sql.replace('%s', '?')
+
+    def closeall(self):
+        super().closeall()
+        self.keeper.close()
+
+
+def create_pool(url=None, minconn=None, maxconn=None, timeout=None):
+    # URL: sqlite:///path, sqlite:///:memory:, a postgres DSN, or None for DB_PARAMS
+    url = url or os.environ.get('TRADING_DB_URL')
+    minconn = minconn if minconn is not None else int(os.environ.get('TRADING_DB_POOL_MIN', 1))
+    maxconn = maxconn if maxconn is not None else int(os.environ.get('TRADING_DB_POOL_MAX', 10))
+    timeout = timeout if timeout is not None else float(os.environ.get('TRADING_DB_POOL_TIMEOUT', 5.0))
+    if url and url.startswith('sqlite://'):
+        pool = SqlitePool(url[len('sqlite:///'):] or ':memory:', minconn, maxconn, timeout)
+    else:
+        pool = PostgresPool(url, minconn, maxconn, timeout)
+    pool.prefill()
+    return pool
@@ -0,0 +1,170 @@
+import time
+import random
+import shutil
+import tempfile
+import threading
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+import market_data
+import instrumentation
+import data_providers
+import bar_store
+import synthetic_data
+
+# Download scheduler for a whole universe of tickers.
+# Works out which symbols are missing bars in the local store, then fetches them up front:
+# one request per chunk when the provider supports batching, one request per ticker
+# otherwise, spread over a thread pool. Every request goes through a shared rate limiter
+# and is retried with exponential backoff. Strategies then run on the preloaded frames.
+
+
+class RateLimiter:
+    # Token bucket: on average `rate` requests per second, bursts of up to `burst`
+
+    def __init__(self, rate=2.0, burst=None):
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if not self.rate:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def retry_with_backoff(fn, retries=3, base_delay=0.5, max_delay=8.0):
+    # Call fn(); on failure wait base_delay * 2^attempt (+ jitter) and try again
+    for attempt in range(retries + 1):
+        try:
+            return fn()
+        except Exception:
+            if attempt == retries:
+                raise
+            delay = min(max_delay, base_delay * (2 ** attempt))
+            time.sleep(delay * (0.5 + random.random() / 2))
+
+
+def _build_jobs(tickers, interval, requested, provider):
+    # [(tickers_in_request, start, {ticker: rewrite})] for every symbol that needs bars
+    plans = {t: market_data.plan_update(t, interval, requested) for t in tickers}
+    pending = [t for t in tickers if plans[t][0] is not False]
+
+    if not provider.supports_batch:
+        return [([t], plans[t][0], {t: plans[t][1]}) for t in pending]
+
+    # Sort by missing-since so each batch re-downloads as little overlap as possible
+    def sort_key(t):
+        start = plans[t][0]
+        return -np.inf if start is None else start.value
+
+    pending.sort(key=sort_key)
+    jobs = []
+    for i in range(0, len(pending), provider.max_batch):
+        chunk = pending[i:i + provider.max_batch]
+        starts = [plans[t][0] for t in chunk]
+        start = None if any(s is None for s in starts) else min(starts)
+        jobs.append((chunk, start, {t: plans[t][1] for t in chunk}))
+    return jobs
+
+
+def preload(tickers, interval='1d', period=None, start=None, end=None, provider=None,
+            max_workers=8, rate=2.0, retries=3, refresh=True, load=True):
+    # Bring every ticker up to date concurrently and return {ticker: OHLCV DataFrame}
+    # (load=False only refreshes the store, for callers that read the memory-mapped series)
+    provider = provider or market_data.get_provider()
+    requested = market_data.requested_start(period, start)
+
+    if refresh:
+        jobs = _build_jobs(tickers, interval, requested, provider)
+        limiter = RateLimiter(rate)
+
+        def run_job(job):
+            chunk, job_start, rewrites = job
+
+            def request():
+                limiter.acquire()
+                with instrumentation.stage('fetch.download'):
+                    return provider.fetch(chunk, interval, job_start)
+
+            frames = retry_with_backoff(request, retries=retries)
+            for ticker in chunk:
+                market_data.apply_download(ticker, interval, frames, requested, rewrites[ticker])
+
+        if jobs:
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                futures = {pool.submit(run_job, job): job[0] for job in jobs}
+                for future in as_completed(futures):
+                    try:
+                        future.result()
+                    except Exception as e:
+                        # Failed symbols fall back to whatever is stored locally
+                        print(f"❌ Error descargando {', '.join(futures[future])}: {e}")
+
+    if not load:
+        return None
+    return {t: bar_store.load_frame(t, interval, requested, end) for t in tickers}
+
+
+# ------------------------
+# Offline benchmark
+# ------------------------
+
+def benchmark(n_tickers=17, bars=2000, interval='1h', latency=0.2, workers=8):
+    fixtures = tempfile.mkdtemp()
+    cache_dir = bar_store.CACHE_DIR
+    try:
+        provider = data_providers.LocalFileProvider(fixtures, latency=latency)
+        tickers = [f'SYN{i:03d}' for i in range(n_tickers)]
+        provider.export({t: synthetic_data.gbm_bars(bars, i, interval=interval) for i, t in enumerate(tickers)}, interval)
+
+        for label, n_workers in (('serial', 1), ('concurrent', workers)):
+            bar_store.CACHE_DIR = tempfile.mkdtemp()
+            t0 = time.perf_counter()
+            frames = preload(tickers, interval, period='max', provider=provider,
+                             max_workers=n_workers, rate=0)
+            cold = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            preload(tickers, interval, period='max', provider=provider, max_workers=n_workers, rate=0)
+            warm = time.perf_counter() - t0
+            rows = sum(len(f) for f in frames.values())
+            print(f"{label:<12} workers={n_workers:<3} cold={cold:.3f}s warm={warm:.3f}s rows={rows}")
+            shutil.rmtree(bar_store.CACHE_DIR, ignore_errors=True)
+    finally:
+        bar_store.CACHE_DIR = cache_dir
+        shutil.rmtree(fixtures, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("tickers", nargs="*", help="Tickers a descargar (vacío = benchmark offline)")
+    parser.add_argument("--interval", default="1h", help="Timeframe (15m, 1h, 1d)")
+    parser.add_argument("--period", default="90d", help="Historial a mantener en el cache local")
+    parser.add_argument("--workers", type=int, default=8, help="Descargas en paralelo")
+    parser.add_argument("--rate", type=float, default=2.0, help="Máximo de peticiones por segundo")
+    parser.add_argument("--local", default=None, help="Carpeta con CSVs para usar LocalFileProvider")
+    parser.add_argument("--latency", type=float, default=0.2, help="Latencia simulada (benchmark/local)")
+    args = parser.parse_args()
+
+    if not args.tickers:
+        benchmark(interval=args.interval, latency=args.latency, workers=args.workers)
+    else:
+        provider = data_providers.LocalFileProvider(args.local, args.latency) if args.local else None
+        t0 = time.perf_counter()
+        frames = preload(args.tickers, args.interval, period=args.period, provider=provider,
+                         max_workers=args.workers, rate=args.rate)
+        for ticker, df in frames.items():
+            print(f"{ticker:<10} {len(df):>7} velas")
+        print(f"⏱️ {time.perf_counter() - t0:.2f}s")
@@ -1,19 +1,23 @@
-import yfinance as yf
+import os
+import json
+import argparse
+
+import numpy as np
 import pandas as pd
+import bar_store
+import market_data
+import download_scheduler
+import indicators
+import instrumentation
 import plotly.graph_objects as go
 
 def analizar_cruce_dorado(ticket):
     # Bajamos datos de los últimos 2 años para tener suficiente historial para la SMA 200
-    df = yf.download(ticket, start='2024-01-01', interval='1d')
-    
-    if isinstance(df.columns, pd.MultiIndex):
-        df.columns = df.columns.get_level_values(0)
-    
-    df.dropna(inplace=True)
+    df = market_data.get_bars(ticket, '1d', start='2024-01-01')
 
     # Calculamos las dos medias
-    df['SMA_20'] = df['Close'].rolling(window=20).mean()
-    df['SMA_50'] = df['Close'].rolling(window=50).mean()
+    df['SMA_20'] = indicators.sma(df['Close'].to_numpy(), 20)
+    df['SMA_50'] = indicators.sma(df['Close'].to_numpy(), 50)
     
     # Lógica de detección:
     # Golden Cross: SMA_20 cruza por encima de SMA_50
@@ -65,10 +69,207 @@ def generar_grafico_cruces(df, ticket):
     fig.add_trace(go.Scatter(x=cruces_alcistas.index, y=cruces_alcistas['SMA_20'], mode='markers', marker=dict(symbol='triangle-up', size=15, color='green'), name='Cruce Dorado'))
 
     fig.update_layout(title=f'Detección de Cruces: {ticket}', template='plotly_dark', xaxis_rangeslider_visible=False)
-    fig.write_html("cruces_trading.html")
+    with instrumentation.stage('chart.write_html'):
+        fig.write_html("cruces_trading.html")
+
+# ------------------------
+# Screener: SMA crossovers for a whole watchlist
+# ------------------------
+# Each (fast, slow) pair is computed on a (bars x symbols) panel of closes, right-aligned by
+# position (every column is the symbol's own bar sequence, shorter histories NaN-padded on
+# top), so one 2D SMA pass serves the whole watchlist. A cross is a change of fast > slow
+# between two bars where both SMAs exist (the warm-up bars don't count as crosses).
+#
+# The state per symbol and pair (last processed bar, side, last cross) is kept in a JSON
+# file next to the bar store. A rescreen only looks at the bars appended since then, plus
+# the `slow` bars before them that the SMAs need. If a symbol's history was rewritten
+# (last processed bar no longer stored) it is recomputed from scratch.
+
+DEFAULT_PAIRS = ['20/50', '50/200']
+
+
+def parse_pair(text):
+    fast, slow = (int(x) for x in text.split('/'))
+    return fast, slow
+
+
+def state_path(interval):
+    return os.path.join(bar_store.CACHE_DIR, f"cross_state_{interval}.json")
+
+
+def load_state(interval):
+    path = state_path(interval)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_state(interval, state):
+    os.makedirs(bar_store.CACHE_DIR, exist_ok=True)
+    tmp = state_path(interval) + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp, state_path(interval))
+
+
+def _new_bars(index, previous):
+    # Bars not processed yet; everything if there's no usable state
+    if not previous:
+        return len(index)
+    last = previous['last_ts']
+    pos = int(np.searchsorted(index, last, side='left'))
+    if pos >= len(index) or index[pos] != last:
+        return len(index)
+    return len(index) - pos - 1
+
+
+def close_panel(series, tickers, rows):
+    # (rows x symbols) closes and int64 timestamps, right-aligned; missing cells NaN / -1
+    close = np.full((rows, len(tickers)), np.nan)
+    times = np.full((rows, len(tickers)), -1, dtype='int64')
+    for j, ticker in enumerate(tickers):
+        index, cols = series[ticker]
+        n = min(rows, len(index))
+        if n:
+            close[rows - n:, j] = cols['Close'][-n:]
+            times[rows - n:, j] = index[-n:]
+    return close, times
+
+
+def _last_true_row(mask):
+    # Per column: last row where mask holds, -1 if none
+    rows = mask.shape[0]
+    found = mask.any(axis=0)
+    last = rows - 1 - np.argmax(mask[::-1], axis=0)
+    return np.where(found, last, -1)
+
+
+def screen_pair(series, tickers, fast, slow, state, key):
+    # Updates state[ticker][key] for every ticker with the bars appended since the last run
+    new = np.array([_new_bars(series[t][0], state.get(t, {}).get(key)) for t in tickers], dtype=int)
+    if not new.any():
+        return 0
+    lengths = np.array([len(series[t][0]) for t in tickers], dtype=int)
+    rows = int(np.minimum(lengths, new + slow).max())
+    close, times = close_panel(series, tickers, rows)
+
+    sma_fast = indicators.sma(close, fast)
+    sma_slow = indicators.sma(close, slow)
+    valid = ~np.isnan(sma_fast) & ~np.isnan(sma_slow)
+    above = sma_fast > sma_slow
+    cross = np.zeros_like(valid)
+    cross[1:] = valid[1:] & valid[:-1] & (above[1:] != above[:-1])
+    # Only the rows of new bars: older crosses are already in the state
+    cross &= np.arange(rows)[:, None] >= (rows - new)[None, :]
+    last_cross = _last_true_row(cross)
+
+    for j, ticker in enumerate(tickers):
+        if not new[j]:
+            continue
+        entry = dict(state.get(ticker, {}).get(key) or {})
+        if new[j] == lengths[j]:
+            entry = {}   # processed from scratch
+        entry['last_ts'] = int(times[-1, j])
+        entry['above'] = bool(above[-1, j]) if valid[-1, j] else None
+        entry['fast'] = None if np.isnan(sma_fast[-1, j]) else float(sma_fast[-1, j])
+        entry['slow'] = None if np.isnan(sma_slow[-1, j]) else float(sma_slow[-1, j])
+        entry['close'] = float(close[-1, j])
+        if last_cross[j] >= 0:
+            r = last_cross[j]
+            entry['cross'] = 'GOLDEN' if above[r, j] else 'DEATH'
+            entry['cross_ts'] = int(times[r, j])
+        state.setdefault(ticker, {})[key] = entry
+    return int(new.sum())
+
+
+def screen(tickers, pairs=DEFAULT_PAIRS, interval='1d', period='2y', refresh=True, full=False, chunk_size=250):
+    # DataFrame with one row per (ticker, pair): current side and the most recent cross
+    state = {} if full else load_state(interval)
+    processed = 0
+    if refresh:
+        for i in range(0, len(tickers), chunk_size):
+            try:
+                download_scheduler.preload(tickers[i:i + chunk_size], interval, period=period, load=False)
+            except Exception as e:
+                print(f"Error descargando datos: {e}")
+
+    series = {}
+    for ticker in tickers:
+        stored = bar_store.open_series(ticker, interval)
+        if stored is not None:
+            series[ticker] = stored.slice()
+    available = list(series)
+    for text in pairs:
+        fast, slow = parse_pair(text)
+        processed += screen_pair(series, available, fast, slow, state, text)
+    save_state(interval, state)
+    print(f"🔎 {len(available)} activos, {processed} velas nuevas procesadas")
+
+    rows = []
+    for ticker in available:
+        index = series[ticker][0]
+        for text in pairs:
+            entry = state.get(ticker, {}).get(text)
+            if not entry or entry['above'] is None:
+                continue
+            cross_ts = entry.get('cross_ts')
+            since = len(index) - int(np.searchsorted(index, cross_ts, side='left')) - 1 if cross_ts else np.nan
+            rows.append({
+                'Ticker': ticker,
+                'Par': text,
+                'Estado': 'ALCISTA' if entry['above'] else 'BAJISTA',
+                'Cruce': entry.get('cross'),
+                'Fecha_cruce': pd.Timestamp(cross_ts, tz='UTC') if cross_ts else pd.NaT,
+                'Velas_desde_cruce': since,
+                'Cierre': entry['close'],
+                'SMA_rapida': entry['fast'],
+                'SMA_lenta': entry['slow'],
+                'Distancia (%)': (entry['fast'] / entry['slow'] - 1) * 100,
+            })
+    table = pd.DataFrame(rows, columns=['Ticker', 'Par', 'Estado', 'Cruce', 'Fecha_cruce', 'Velas_desde_cruce',
+                                        'Cierre', 'SMA_rapida', 'SMA_lenta', 'Distancia (%)'])
+    table['Velas_desde_cruce'] = table['Velas_desde_cruce'].astype('Int64')
+    return table
+
+
+def imprimir_screener(table, fresh=5, sort='Velas_desde_cruce'):
+    recientes = table[table['Velas_desde_cruce'].fillna(fresh + 1) <= fresh]
+    recientes = recientes.sort_values(sort, ascending=sort == 'Velas_desde_cruce', kind='stable')
+    print("\n" + "="*100)
+    print(f"🚦 CRUCES RECIENTES (últimas {fresh} velas) - {len(recientes)} de {len(table)}")
+    print("-" * 100)
+    for tipo, emoji in (('GOLDEN', '🚀'), ('DEATH', '⚠️')):
+        parte = recientes[recientes['Cruce'] == tipo]
+        print(f"\n{emoji} {tipo} CROSS ({len(parte)})")
+        if len(parte):
+            print(parte.to_string(index=False, float_format=lambda v: f"{v:.2f}"))
+    print("="*100 + "\n")
+
 
 if __name__ == "__main__":
-    simbolo = 'BTC-USD'
-    datos = analizar_cruce_dorado(simbolo)
-    imprimir_estado(datos)
-    generar_grafico_cruces(datos, simbolo)
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument("tickers", nargs="*", default=['BTC-USD'], help="Ticker(s)")
+    parser.add_argument("--screen", action="store_true", help="Screener de cruces para toda la lista")
+    parser.add_argument("--watchlist", default=None, help="Archivo con la lista de tickers (activa --screen)")
+    parser.add_argument("--pairs", nargs="+", default=DEFAULT_PAIRS, help="Pares rápida/lenta (20/50 50/200)")
+    parser.add_argument("--interval", default="1d", help="Timeframe del screener")
+    parser.add_argument("--fresh", type=int, default=5, help="Cruces de las últimas N velas")
+    parser.add_argument("--sort", default="Velas_desde_cruce", help="Columna para ordenar la tabla")
+    parser.add_argument("--output", default=None, help="Guardar la tabla completa en CSV")
+    parser.add_argument("--full", action="store_true", help="Ignorar el estado guardado y recalcular todo")
+    args = parser.parse_args()
+
+    if args.screen or args.watchlist or len(args.tickers) > 1:
+        import scan_assets
+        tickers = scan_assets.load_universe(args.watchlist) if args.watchlist else args.tickers
+        tabla = screen(tickers, args.pairs, args.interval, full=args.full)
+        imprimir_screener(tabla, args.fresh, args.sort)
+        if args.output:
+            tabla.to_csv(args.output, index=False)
+            print(f"💾 Tabla guardada en {args.output}")
+    else:
+        simbolo = args.tickers[0]
+        datos = analizar_cruce_dorado(simbolo)
+        imprimir_estado(datos)
+        generar_grafico_cruces(datos, simbolo)
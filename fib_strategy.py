@@ -1,173 +1,119 @@
 
-import yfinance as yf
 import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
 import argparse
+import bar_resampler
+import backtest_engine
+import result_sinks
+import instrumentation
+import indicators
+import indicator_cache
 
 def calculate_ema(df, period=50):
-    return df['Close'].ewm(span=period, adjust=False).mean()
+    return indicator_cache.compute('ema', df['Close'].to_numpy(), period)
 
 def find_swings(df, window=20):
     # Simple Local Min/Max detection
-    df['Swing_High'] = df['High'].rolling(window=window, center=True).max()
-    df['Swing_Low'] = df['Low'].rolling(window=window, center=True).min()
+    # center=True: the window is centred on the bar, i.e. the trailing max shifted back by half
+    half = (window - 1) // 2
+    df['Swing_High'] = indicators.shift(indicators.rolling_max(df['High'].to_numpy(), window), -half)
+    df['Swing_Low'] = indicators.shift(indicators.rolling_min(df['Low'].to_numpy(), window), -half)
     return df
 
-def backtest_fib_strategy(df, initial_capital=100.0):
-    capital = initial_capital
-    position = 0.0
-    entry_price = 0.0
-    stop_loss = 0.0
-    take_profit = 0.0
-    
-    trades = []
-    
-    # State variables
-    in_trade = False
-    last_high = 0.0
-    last_low = 0.0
-    
+def fib_levels(df, lookback=50):
+    # Swing range of the previous `lookback` candles (the current candle is excluded,
+    # same as df.iloc[i-lookback:i]) and its golden-pocket retracements, for every bar at once.
+    # Retracement 0% = High, 100% = Low -> Level 0.618 = High - 0.618 * (High - Low)
+    recent_high = indicators.shift(indicators.rolling_max(df['High'].to_numpy(), lookback), 1)
+    recent_low = indicators.shift(indicators.rolling_min(df['Low'].to_numpy(), lookback), 1)
+    swing = recent_high - recent_low
+    df['Fib_High'] = recent_high
+    df['Fib_Low'] = recent_low
+    df['Fib_050'] = recent_high - 0.500 * swing
+    df['Fib_618'] = recent_high - 0.618 * swing
+    return df
+
+def fib_entry_signals(df, tolerance=0.01, min_rr=1.5):
+    # Entry mask over the whole frame:
+    # 1. Uptrend (Price > EMA 50)
+    # 2. Low touches the Golden Pocket (between the 0.5 and 0.618 retracement,
+    #    with a small tolerance below 0.618 to catch wicks slightly breaking it)
+    # 3. Risk/Reward: TP (swing high) distance must be > SL (swing low) distance * min_rr
+    price = df['Close'].to_numpy()
+    low = df['Low'].to_numpy()
+    risk = price - df['Fib_Low'].to_numpy()
+    reward = df['Fib_High'].to_numpy() - price
+    with np.errstate(invalid='ignore', divide='ignore'):
+        in_pocket = (low <= df['Fib_050'].to_numpy()) & (low >= df['Fib_618'].to_numpy() * (1 - tolerance))
+        return (price > df['EMA_50'].to_numpy()) & in_pocket & (risk > 0) & (reward / risk > min_rr)
+
+def backtest_fib_strategy(df, initial_capital=100.0, lookback=50, tolerance=0.01, min_rr=1.5, verbose=True, sinks=None,
+                          run='fib'):
+    # Simplified approach for "Golden Pocket" in UPTREND:
+    # Recent High / Recent Low = trailing window max/min (no look-ahead), precomputed as
+    # rolling arrays so the scan below is O(n) instead of slicing a sub-DataFrame per bar.
+    df = fib_levels(df, lookback)
+    entries = fib_entry_signals(df, tolerance, min_rr)
+
+    # Risk Management: SL below the swing low, TP at the swing high (levels of the entry bar)
+    result = backtest_engine.run_backtest(df['Close'].to_numpy(), entries, start=max(50, lookback),
+                                          tp_price=df['Fib_High'].to_numpy(), sl_price=df['Fib_Low'].to_numpy(),
+                                          initial_capital=initial_capital, index=df.index)
+    if verbose:
+        print_trades(df, result)
+    result_sinks.emit(result, sinks, run)
+    return result
+
+def print_trades(df, result):
     print("\n" + "="*60)
-    print(f"💰 FIBONACCI BACKTEST (Capital Inicial: ${initial_capital})")
+    print(f"💰 FIBONACCI BACKTEST (Capital Inicial: ${result.initial_capital})")
     print("-" * 60)
     print(f"{'FECHA':<25} {'ACCIÓN':<10} {'PRECIO':<10} {'BALANCE':<10} {'P&L'}")
     print("-" * 60)
 
-    # We need to iterate carefully. 
-    # Logic:
-    # 1. Identify valid Swing High -> Low move (or Low -> High for uptrend).
-    # 2. Wait for Retracement to 0.618.
-    
-    # Simplified approach for "Golden Pocket" in UPTREND:
-    # 1. Price > EMA 50
-    # 2. Find recent significant High (Swing High).
-    # 3. Find the Low that started that move (Swing Low).
-    # 4. Fib Levels: (High - Low). 
-    # 5. Buy Zone: Low + 0.618 * (High - Low)  <- Actually Retracement is from High down.
-    #    Retracement 0% = High, 100% = Low.
-    #    Level 0.618 Retracement = High - 0.618 * (High - Low).
-    
-    # Iterate candle by candle
-    
-    # Dynamic swing detection is tricky in a simple loop without looking ahead.
-    # We will use a trailing window max/min to define "Recent High" and "Recent Low".
-    
-    local_max = 0.0
-    local_min = 0.0
-    
-    for i in range(50, len(df)):
-        curr = df.iloc[i]
-        date = df.index[i]
-        price = curr['Close']
-        ema = curr['EMA_50']
-        
-        # ------------------------
-        # TRADE MANAGEMENT (Exit)
-        # ------------------------
-        if in_trade:
-            # Check Take Profit
-            if price >= take_profit:
-                revenue = position * price
-                pnl_pct = ((price / entry_price) - 1) * 100
-                capital = revenue
-                position = 0
-                in_trade = False
-                print(f"{str(date):<25} 🟢 TP HIT    ${price:.2f}     ${capital:.2f}     {pnl_pct:+.2f}%")
-                trades.append({'date': date, 'type': 'SELL', 'price': price, 'pnl': pnl_pct})
-                continue
-            
-            # Check Stop Loss
-            elif price <= stop_loss:
-                revenue = position * price
-                pnl_pct = ((price / entry_price) - 1) * 100
-                capital = revenue
-                position = 0
-                in_trade = False
-                print(f"{str(date):<25} 🔴 SL HIT    ${price:.2f}     ${capital:.2f}     {pnl_pct:+.2f}%")
-                trades.append({'date': date, 'type': 'SELL', 'price': price, 'pnl': pnl_pct})
-                continue
+    dates = df.index
+    for k in range(result.n_trades):
+        print(f"{str(dates[result.entry_idx[k]]):<25} ⚡ BUY (Fib) ${result.entry_price[k]:.2f}     SL:${result.sl_level[k]:.2f} TP:${result.tp_level[k]:.2f}")
 
-        # ------------------------
-        # TRADE ENTRY (Signal)
-        # ------------------------
-        if not in_trade:
-            # Only trade Uptrends for now (Price > EMA)
-            if price > ema:
-                # Lookback 50 periods for High/Low
-                window_data = df.iloc[i-50:i]
-                recent_high = window_data['High'].max()
-                recent_low = window_data['Low'].min()
-                
-                # Check if we are "pulling back".
-                # Current price should be significantly below recent high.
-                
-                # Definition of Fib 0.618 Level (Golden Pocket) from the High
-                fib_618 = recent_high - 0.618 * (recent_high - recent_low)
-                fib_050 = recent_high - 0.500 * (recent_high - recent_low)
-                
-                # Entry Condition:
-                # 1. Price is inside the Golden Pocket (between 0.5 and 0.618 retracement)
-                # 2. But we need to make sure we didn't just crash through it.
-                #    Let's buy if Low touches the zone.
-                
-                if curr['Low'] <= fib_050 and curr['Low'] >= (fib_618 * 0.99): 
-                    # *0.99 tolerance below 618 to catch wicks slightly breaking it
-                    
-                    # Risk Management
-                    stop_loss_price = recent_low # SL below the swing low
-                    take_profit_price = recent_high # TP at the swing high
-                    
-                    # Risk/Reward Filter: TP distance must be > SL distance * 1.5
-                    risk = price - stop_loss_price
-                    reward = take_profit_price - price
-                    
-                    if risk > 0 and (reward / risk) > 1.5:
-                        position = capital / price
-                        entry_price = price
-                        capital = 0
-                        stop_loss = stop_loss_price
-                        take_profit = take_profit_price
-                        in_trade = True
-                        print(f"{str(date):<25} ⚡ BUY (Fib) ${price:.2f}     SL:${stop_loss:.2f} TP:${take_profit:.2f}")
+        date, price = dates[result.exit_idx[k]], result.exit_price[k]
+        pnl_pct = ((price / result.entry_price[k]) - 1) * 100
+        capital = result.capital_after[k]
+        if result.reason[k] == backtest_engine.TP:
+            print(f"{str(date):<25} 🟢 TP HIT    ${price:.2f}     ${capital:.2f}     {pnl_pct:+.2f}%")
+        elif result.reason[k] == backtest_engine.SL:
+            print(f"{str(date):<25} 🔴 SL HIT    ${price:.2f}     ${capital:.2f}     {pnl_pct:+.2f}%")
+        else:
+            # Close Position at End
+            print(f"{'CIERRE FINAL':<25} ⚠️ CLOSE    ${price:.2f}     ${capital:.2f}     {pnl_pct:+.2f}%")
 
-    # Close Position at End
-    if in_trade:
-        final_price = df['Close'].iloc[-1]
-        revenue = position * final_price
-        pnl_pct = ((final_price / entry_price) - 1) * 100
-        capital = revenue
-        print(f"{'CIERRE FINAL':<25} ⚠️ CLOSE    ${final_price:.2f}     ${capital:.2f}     {pnl_pct:+.2f}%")
-
-    profit_total = capital - initial_capital
-    profit_pct = (profit_total / initial_capital) * 100
-    
     print("-" * 60)
-    print(f"RESULTADO FINAL: ${capital:.2f} ({profit_pct:+.2f}%)")
+    print(f"RESULTADO FINAL: ${result.final_capital:.2f} ({result.profit_pct:+.2f}%)")
     print("="*60 + "\n")
-    return df
 
-def run_fib(ticker, interval='1h'):
-    print(f"🔍 Analizando Swing Trading (Fibonacci) para {ticker} en {interval}...")
+def run_fib(ticker, interval='1h', start=None, end=None, lookback=50, tolerance=0.01, verbose=True, sinks=None):
+    if verbose:
+        print(f"🔍 Analizando Swing Trading (Fibonacci) para {ticker} en {interval}...")
     
     # We need more data for Swing trading, maybe 1 month or 60 days
-    df = yf.download(ticker, period='60d', interval=interval, progress=False)
-    
-    if isinstance(df.columns, pd.MultiIndex):
-        try:
-            df.columns = df.columns.get_level_values(0)
-        except:
-            pass
-            
-    df.dropna(inplace=True)
+    df = bar_resampler.get_bars(ticker, interval, period='60d', start=start, end=end)
     df['EMA_50'] = calculate_ema(df, 50)
     
-    backtest_fib_strategy(df, 100.0)
+    return backtest_fib_strategy(df, 100.0, lookback=lookback, tolerance=tolerance, verbose=verbose, sinks=sinks,
+                                 run=f"fib {ticker} {interval}")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("ticker", nargs="?", default="SOL-USD", help="Ticker")
     parser.add_argument("--interval", default="1h", help="Timeframe (15m, 1h, 4h)")
+    parser.add_argument("--start", default=None, help="Inicio del rango (YYYY-MM-DD), usa el historial local")
+    parser.add_argument("--end", default=None, help="Fin del rango (YYYY-MM-DD)")
+    parser.add_argument("--lookback", type=int, default=50, help="Velas para el swing High/Low")
+    parser.add_argument("--tolerance", type=float, default=0.01, help="Tolerancia bajo el nivel 0.618 (0.01 = 1%%)")
+    result_sinks.add_export_argument(parser)
+    instrumentation.add_arguments(parser)
     args = parser.parse_args()
     
-    run_fib(args.ticker, args.interval)
+    with instrumentation.cli_session(args, f"fib {args.ticker}"):
+        run_fib(args.ticker, args.interval, args.start, args.end, args.lookback, args.tolerance,
+                sinks=result_sinks.from_specs(args.export))
@@ -0,0 +1,125 @@
+import hashlib
+import threading
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+import indicators
+import instrumentation
+
+# Memoization for computed indicator arrays.
+# Keyed by (data version, indicator name, parameters) so the optimizer, the portfolio runner
+# and the strategies reuse the same SMA/EMA/RSI arrays instead of recomputing them for every
+# parameter combination. Bounded by entry count and bytes with LRU eviction; hit / miss /
+# eviction counters show whether it is actually working.
+
+
+class IndicatorCache:
+
+    def __init__(self, maxsize=512, max_bytes=512 * 1024 * 1024):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get_or_compute(self, key, fn):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                instrumentation.count('indicator_cache_hits')
+                return self.entries[key]
+            self.misses += 1
+        instrumentation.count('indicator_cache_misses')
+
+        value = fn()
+        arrays = value if isinstance(value, tuple) else (value,)
+        for arr in arrays:
+            # Shared between callers: nobody may modify a cached array in place
+            arr.setflags(write=False)
+        size = sum(arr.nbytes for arr in arrays)
+
+        with self.lock:
+            if key not in self.entries:
+                self.entries[key] = value
+                self.nbytes += size
+                self._evict()
+        return value
+
+    def _evict(self):
+        while self.entries and (len(self.entries) > self.maxsize or self.nbytes > self.max_bytes):
+            _, old = self.entries.popitem(last=False)
+            old = old if isinstance(old, tuple) else (old,)
+            self.nbytes -= sum(arr.nbytes for arr in old)
+            self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(self.entries),
+            'bytes': self.nbytes,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+    def __str__(self):
+        s = self.stats()
+        return (f"hits={s['hits']} misses={s['misses']} evictions={s['evictions']} "
+                f"entries={s['entries']} ({s['bytes'] / 1e6:.1f} MB, hit rate {s['hit_rate']:.0%})")
+
+
+CACHE = IndicatorCache()
+
+# Content hashes per array object, so a series is only hashed once per run
+_versions = {}
+_versions_lock = threading.Lock()
+
+
+def data_version(*arrays):
+    # Fingerprint of the input data: content hash of every array (cached per array object)
+    parts = []
+    for arr in arrays:
+        key = id(arr)
+        with _versions_lock:
+            known = _versions.get(key)
+        if known is not None and known[0]() is arr:
+            parts.append(known[1])
+            continue
+        values = np.ascontiguousarray(arr, dtype='float64')
+        digest = hashlib.blake2b(values.view(np.uint8), digest_size=16).hexdigest()
+        try:
+            ref = weakref.ref(arr, lambda _, k=key: _versions.pop(k, None))
+            with _versions_lock:
+                _versions[key] = (ref, digest)
+        except TypeError:
+            # Lists and other non weak-referenceable inputs are simply hashed every time
+            pass
+        parts.append(digest)
+    return '-'.join(parts)
+
+
+def compute(name, data, *params, version=None, cache=None):
+    # indicators.<name>(*data, *params) through the cache. `data` is one array or a tuple of
+    # arrays (e.g. (high, low, close) for atr); pass `version` to skip hashing when the
+    # caller already knows what the data is (symbol, interval, last bar, ...)
+    cache = cache or CACHE
+    arrays = data if isinstance(data, tuple) else (data,)
+    if version is None:
+        version = data_version(*arrays)
+    key = (version, name, params)
+
+    def calculate():
+        with instrumentation.stage('indicators.' + name):
+            return getattr(indicators, name)(*arrays, *params)
+    return cache.get_or_compute(key, calculate)
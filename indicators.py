@@ -0,0 +1,342 @@
+import math
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+# Shared indicator library.
+#
+# Batch mode: NumPy functions over whole arrays (time on axis 0, so a 2D time x symbol panel
+# works too). They reproduce the pandas formulas the strategies used before
+# (rolling(...).mean(), .std(), .max(), ewm(adjust=False)), including NaN warm-up.
+#
+# Streaming mode: small state objects with update(value) -> current value, O(1) per new bar
+# (running sums for SMA/RSI/ATR, windowed Welford for the Bollinger std, monotonic deques
+# for Donchian max/min). Fed bar by bar they give the same numbers as the batch functions
+# (up to float rounding), so backtests and live signals share one implementation.
+
+
+# ------------------------
+# Batch mode
+# ------------------------
+
+def _as_float(x):
+    return np.asarray(x, dtype='float64')
+
+
+def shift(x, periods=1):
+    x = _as_float(x)
+    out = np.full_like(x, np.nan)
+    if periods > 0:
+        out[periods:] = x[:-periods]
+    elif periods < 0:
+        out[:periods] = x[-periods:]
+    else:
+        out[:] = x
+    return out
+
+
+def diff(x):
+    x = _as_float(x)
+    out = np.full_like(x, np.nan)
+    out[1:] = x[1:] - x[:-1]
+    return out
+
+
+def rolling_sum(x, window):
+    # Sum over the last `window` values; NaN while the window holds any NaN (like pandas)
+    x = _as_float(x)
+    n = x.shape[0]
+    out = np.full_like(x, np.nan)
+    if n < window:
+        return out
+    nan_mask = np.isnan(x)
+    zero = np.zeros((1,) + x.shape[1:])
+    csum = np.concatenate([zero, np.cumsum(np.where(nan_mask, 0.0, x), axis=0)])
+    cnan = np.concatenate([zero, np.cumsum(nan_mask, axis=0)])
+    sums = csum[window:] - csum[:-window]
+    nans = cnan[window:] - cnan[:-window]
+    out[window - 1:] = np.where(nans > 0, np.nan, sums)
+    return out
+
+
+def sma(x, window):
+    return rolling_sum(x, window) / window
+
+
+def _windows(x, window):
+    from numpy.lib.stride_tricks import sliding_window_view
+    return sliding_window_view(x, window, axis=0)
+
+
+def _rolling_reduce(x, window, reducer):
+    x = _as_float(x)
+    out = np.full_like(x, np.nan)
+    if x.shape[0] < window:
+        return out
+    with np.errstate(invalid='ignore'):
+        out[window - 1:] = reducer(_windows(x, window), axis=-1)
+    return out
+
+
+def rolling_max(x, window):
+    return _rolling_reduce(x, window, np.max)
+
+
+def rolling_min(x, window):
+    return _rolling_reduce(x, window, np.min)
+
+
+def rolling_std(x, window, ddof=1):
+    return _rolling_reduce(x, window, lambda w, axis: np.std(w, axis=axis, ddof=ddof))
+
+
+def ema(x, span):
+    # Recursive filter (adjust=False); delegated to pandas' compiled ewm, column-wise for 2D
+    x = _as_float(x)
+    frame = pd.DataFrame(x) if x.ndim == 2 else pd.Series(x)
+    return frame.ewm(span=span, adjust=False).mean().to_numpy()
+
+
+def rsi(close, period=14):
+    # Simple-average RSI, same formula as the original strategies:
+    # gain/loss = rolling mean of positive/negative diffs, RSI = 100 - 100 / (1 + gain/loss).
+    # A NaN diff (the first bar) counts as no move, like delta.where(delta > 0, 0) did,
+    # so the first value is at index period - 1.
+    delta = diff(close)
+    up = np.where(delta > 0, delta, 0.0)
+    down = np.where(delta < 0, -delta, 0.0)
+    gain = sma(up, period)
+    loss = sma(down, period)
+    # Exact zeros where the window had no move at all (running sums leave ~1e-15 residue)
+    gain = np.where((rolling_sum(up > 0, period) == 0) & ~np.isnan(gain), 0.0, gain)
+    loss = np.where((rolling_sum(down > 0, period) == 0) & ~np.isnan(loss), 0.0, loss)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs = gain / loss
+        return 100 - (100 / (1 + rs))
+
+
+def bollinger(close, window=20, num_std=2.0):
+    # Returns (mid, upper, lower, std)
+    mid = sma(close, window)
+    std = rolling_std(close, window)
+    return mid, mid + num_std * std, mid - num_std * std, std
+
+
+def true_range(high, low, close):
+    high, low, close = _as_float(high), _as_float(low), _as_float(close)
+    prev_close = shift(close, 1)
+    # fmax skips the NaN of the first bar, like pd.concat(...).max(axis=1)
+    return np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+
+
+def atr(high, low, close, period=14):
+    return sma(true_range(high, low, close), period)
+
+
+def donchian(high, low, high_window=20, low_window=10):
+    # Upper/lower channel over the PREVIOUS bars (shifted by one, nothing from the current candle)
+    return shift(rolling_max(high, high_window), 1), shift(rolling_min(low, low_window), 1)
+
+
+# ------------------------
+# Streaming mode
+# ------------------------
+
+class SMA:
+    # Running sum over a ring buffer; re-summed once per window to cancel float drift
+
+    def __init__(self, window):
+        self.window = window
+        self.values = deque()
+        self.total = 0.0
+        self.since_resync = 0
+        self.value = math.nan
+
+    def update(self, x):
+        if math.isnan(x):
+            # A NaN poisons the window exactly like rolling().mean()
+            self.values.clear()
+            self.total = 0.0
+            self.value = math.nan
+            return self.value
+        self.values.append(x)
+        self.total += x
+        if len(self.values) > self.window:
+            self.total -= self.values.popleft()
+        self.since_resync += 1
+        if self.since_resync >= self.window:
+            self.total = math.fsum(self.values)
+            self.since_resync = 0
+        self.value = self.total / self.window if len(self.values) == self.window else math.nan
+        return self.value
+
+
+class EMA:
+    def __init__(self, span):
+        self.alpha = 2.0 / (span + 1.0)
+        self.value = math.nan
+
+    def update(self, x):
+        if math.isnan(self.value):
+            self.value = x
+        elif not math.isnan(x):
+            self.value = self.alpha * x + (1 - self.alpha) * self.value
+        return self.value
+
+
+class RSI:
+    def __init__(self, period=14):
+        self.period = period
+        self.gain = SMA(period)
+        self.loss = SMA(period)
+        # How many bars in the window actually moved up / down (for exact zero averages)
+        self.moves = deque()
+        self.ups = 0
+        self.downs = 0
+        self.prev = math.nan
+        self.value = math.nan
+
+    def update(self, close):
+        delta = close - self.prev
+        self.prev = close
+        if math.isnan(delta):
+            # No move, same as the batch version (first bar, or a gap in the closes)
+            delta = 0.0
+
+        gain = self.gain.update(delta if delta > 0 else 0.0)
+        loss = self.loss.update(-delta if delta < 0 else 0.0)
+        move = (delta > 0) - (delta < 0)
+        self.moves.append(move)
+        self.ups += move > 0
+        self.downs += move < 0
+        if len(self.moves) > self.period:
+            old = self.moves.popleft()
+            self.ups -= old > 0
+            self.downs -= old < 0
+        if math.isnan(gain):
+            self.value = math.nan
+            return self.value
+        if self.ups == 0:
+            gain = 0.0
+        if self.downs == 0:
+            loss = 0.0
+
+        if loss == 0:
+            self.value = math.nan if gain == 0 else 100.0
+        else:
+            self.value = 100 - (100 / (1 + gain / loss))
+        return self.value
+
+
+class RollingStd:
+    # Windowed Welford: add the new value, remove the one leaving the window, O(1)
+
+    def __init__(self, window, ddof=1):
+        self.window = window
+        self.ddof = ddof
+        self.values = deque()
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.since_resync = 0
+        self.value = math.nan
+
+    def _resync(self):
+        n = len(self.values)
+        self.mean = math.fsum(self.values) / n
+        self.m2 = math.fsum((v - self.mean) ** 2 for v in self.values)
+        self.since_resync = 0
+
+    def update(self, x):
+        self.values.append(x)
+        n = len(self.values)
+        delta = x - self.mean
+        self.mean += delta / n
+        self.m2 += delta * (x - self.mean)
+        if n > self.window:
+            old = self.values.popleft()
+            n -= 1
+            delta = old - self.mean
+            self.mean -= delta / n
+            self.m2 -= delta * (old - self.mean)
+        self.since_resync += 1
+        if self.since_resync >= self.window:
+            self._resync()
+        if n == self.window:
+            self.value = math.sqrt(max(self.m2, 0.0) / (n - self.ddof))
+        else:
+            self.value = math.nan
+        return self.value
+
+
+class Bollinger:
+    def __init__(self, window=20, num_std=2.0):
+        self.num_std = num_std
+        self.sma = SMA(window)
+        self.std = RollingStd(window)
+        self.mid = self.upper = self.lower = math.nan
+
+    def update(self, close):
+        self.mid = self.sma.update(close)
+        std = self.std.update(close)
+        self.upper = self.mid + self.num_std * std
+        self.lower = self.mid - self.num_std * std
+        return self.mid, self.upper, self.lower
+
+
+class RollingMax:
+    # Monotonic deque of (position, value): the front is always the window maximum
+
+    def __init__(self, window, sign=1):
+        self.window = window
+        self.sign = sign
+        self.items = deque()
+        self.count = 0
+        self.value = math.nan
+
+    def update(self, x):
+        key = self.sign * x
+        while self.items and self.sign * self.items[-1][1] <= key:
+            self.items.pop()
+        self.items.append((self.count, x))
+        if self.items[0][0] <= self.count - self.window:
+            self.items.popleft()
+        self.count += 1
+        self.value = self.items[0][1] if self.count >= self.window else math.nan
+        return self.value
+
+
+class RollingMin(RollingMax):
+    def __init__(self, window):
+        super().__init__(window, sign=-1)
+
+
+class Donchian:
+    # Channel from the previous bars only: update() returns the levels valid for the new bar
+    # BEFORE it is added to the window, matching donchian() (shift(1))
+
+    def __init__(self, high_window=20, low_window=10):
+        self.highs = RollingMax(high_window)
+        self.lows = RollingMin(low_window)
+        self.upper = self.lower = math.nan
+
+    def update(self, high, low):
+        self.upper, self.lower = self.highs.value, self.lows.value
+        self.highs.update(high)
+        self.lows.update(low)
+        return self.upper, self.lower
+
+
+class ATR:
+    def __init__(self, period=14):
+        self.sma = SMA(period)
+        self.prev_close = math.nan
+        self.value = math.nan
+
+    def update(self, high, low, close):
+        tr = high - low
+        if not math.isnan(self.prev_close):
+            tr = max(tr, abs(high - self.prev_close), abs(low - self.prev_close))
+        self.prev_close = close
+        self.value = self.sma.update(tr)
+        return self.value
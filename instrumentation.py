@@ -0,0 +1,273 @@
+import os
+import re
+import sys
+import json
+import time
+import atexit
+import threading
+import functools
+import contextlib
+from collections import Counter
+
+# Stage timers and counters for the whole pipeline (fetch, indicators, backtest, chart, DB).
+#
+#   with instrumentation.stage('fetch'): ...          # wall time + call count of a stage
+#   @instrumentation.timed('chart')                   # same, as a decorator
+#   instrumentation.count('bars_processed', n)        # plain counters
+#
+# Disabled by default: stage() hands back one shared no-op context manager and count()
+# returns right away, so the hooks can stay in hot paths. Enable with TRADING_METRICS=1
+# (TRADING_METRICS_OUT=metrics.json / metrics.prom also dumps everything at exit), with
+# enable(), or with --metrics on the CLIs.
+#
+# Every event goes to all active registries: the global one plus any run() opened around
+# it, so one portfolio run or optimizer job can be measured on its own. Stages timed in
+# worker threads add up, so a stage's total can exceed the wall time of the run.
+#
+# profile() is an opt-in sampling profiler for a single run: a background thread samples
+# the stack of the profiled thread every few milliseconds and writes collapsed stacks
+# (flamegraph.pl / speedscope format). Nothing runs unless it is used.
+
+ENABLED = os.environ.get('TRADING_METRICS', '') not in ('', '0')
+
+
+class Metrics:
+
+    def __init__(self, name='global'):
+        self.name = name
+        self.started = time.time()
+        self.timers = {}        # stage -> [calls, total s, max s]
+        self.counters = Counter()
+        self.lock = threading.Lock()
+
+    def add_time(self, name, seconds):
+        with self.lock:
+            timer = self.timers.get(name)
+            if timer is None:
+                self.timers[name] = [1, seconds, seconds]
+            else:
+                timer[0] += 1
+                timer[1] += seconds
+                if seconds > timer[2]:
+                    timer[2] = seconds
+
+    def add_count(self, name, value):
+        with self.lock:
+            self.counters[name] += value
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'run': self.name,
+                'elapsed': time.time() - self.started,
+                'stages': {name: {'calls': c, 'seconds': t, 'max_seconds': m}
+                           for name, (c, t, m) in sorted(self.timers.items())},
+                'counters': dict(sorted(self.counters.items())),
+            }
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self, prefix='trading'):
+        snap = self.snapshot()
+        run = snap['run']
+        lines = [
+            f"# HELP {prefix}_stage_seconds_total Wall time spent in each pipeline stage",
+            f"# TYPE {prefix}_stage_seconds_total counter",
+        ]
+        lines += [f'{prefix}_stage_seconds_total{{run="{run}",stage="{s}"}} {v["seconds"]:.6f}'
+                  for s, v in snap['stages'].items()]
+        lines += [f"# HELP {prefix}_stage_calls_total Calls of each pipeline stage",
+                  f"# TYPE {prefix}_stage_calls_total counter"]
+        lines += [f'{prefix}_stage_calls_total{{run="{run}",stage="{s}"}} {v["calls"]}'
+                  for s, v in snap['stages'].items()]
+        lines += [f"# HELP {prefix}_stage_max_seconds Slowest single call of each pipeline stage",
+                  f"# TYPE {prefix}_stage_max_seconds gauge"]
+        lines += [f'{prefix}_stage_max_seconds{{run="{run}",stage="{s}"}} {v["max_seconds"]:.6f}'
+                  for s, v in snap['stages'].items()]
+        for name, value in snap['counters'].items():
+            metric = f"{prefix}_{re.sub(r'[^a-zA-Z0-9_]', '_', name)}_total"
+            lines += [f"# TYPE {metric} counter", f'{metric}{{run="{run}"}} {value}']
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        # .prom / .txt -> Prometheus text format, anything else -> JSON
+        with open(path, 'w') as f:
+            f.write(self.to_prometheus() if path.endswith(('.prom', '.txt')) else self.to_json())
+
+    def report(self):
+        snap = self.snapshot()
+        print("\n" + "="*70)
+        print(f"⏱️ MÉTRICAS ({snap['run']}, {snap['elapsed']:.2f}s)")
+        print("-" * 70)
+        print(f"{'ETAPA':<28} {'LLAMADAS':>9} {'TOTAL':>10} {'MÁX':>10}")
+        for name, s in sorted(snap['stages'].items(), key=lambda kv: -kv[1]['seconds']):
+            print(f"{name:<28} {s['calls']:>9} {s['seconds']:>9.3f}s {s['max_seconds']:>9.3f}s")
+        if snap['counters']:
+            print("-" * 70)
+            for name, value in snap['counters'].items():
+                print(f"{name:<28} {value:>9}")
+        print("="*70 + "\n")
+
+
+GLOBAL = Metrics()
+_active = [GLOBAL]
+_NULL = contextlib.nullcontext()
+
+
+def enable():
+    global ENABLED
+    ENABLED = True
+
+
+def disable():
+    global ENABLED
+    ENABLED = False
+
+
+@contextlib.contextmanager
+def _timer(name):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - t0
+        for metrics in _active:
+            metrics.add_time(name, elapsed)
+
+
+def stage(name):
+    return _timer(name) if ENABLED else _NULL
+
+
+def count(name, value=1):
+    if not ENABLED:
+        return
+    for metrics in _active:
+        metrics.add_count(name, value)
+
+
+def timed(name):
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return fn(*args, **kwargs)
+            with _timer(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextlib.contextmanager
+def run(name):
+    # Fresh registry for everything that happens inside the block (also recorded globally)
+    metrics = Metrics(name)
+    _active.append(metrics)
+    try:
+        yield metrics
+    finally:
+        _active.remove(metrics)
+
+
+# ------------------------
+# Sampling profiler
+# ------------------------
+
+class SamplingProfiler:
+
+    def __init__(self, interval=0.005, thread_id=None):
+        self.interval = interval
+        self.thread_id = thread_id or threading.get_ident()
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+                self.samples += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._sample, name='sampling-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def top(self, n=15):
+        # Functions by samples where they were on top of the stack (self time)
+        leaf = Counter()
+        for stack, hits in self.stacks.items():
+            leaf[stack.rsplit(';', 1)[-1]] += hits
+        return leaf.most_common(n)
+
+    def write(self, path):
+        with open(path, 'w') as f:
+            for stack, hits in self.stacks.most_common():
+                f.write(f"{stack} {hits}\n")
+
+    def report(self, n=15):
+        print("\n" + "="*70)
+        print(f"🔬 PERFIL ({self.samples} muestras cada {self.interval * 1000:.0f} ms)")
+        print("-" * 70)
+        for name, hits in self.top(n):
+            print(f"{hits / max(self.samples, 1):>6.1%}  {name}")
+        print("="*70 + "\n")
+
+
+@contextlib.contextmanager
+def profile(path=None, interval=0.005):
+    # Samples the calling thread while the block runs; collapsed stacks go to `path`
+    profiler = SamplingProfiler(interval)
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        profiler.report()
+        if path:
+            profiler.write(path)
+            print(f"🔬 Stacks guardados en {path} (flamegraph.pl / speedscope)")
+
+
+# ------------------------
+# CLI helpers
+# ------------------------
+
+def add_arguments(parser):
+    parser.add_argument("--metrics", default=None, metavar="ARCHIVO",
+                        help="Medir tiempos por etapa y guardarlos (.json o .prom; '-' solo imprime)")
+    parser.add_argument("--profile", default=None, metavar="ARCHIVO",
+                        help="Perfilador por muestreo de la ejecución (stacks colapsados en ARCHIVO)")
+
+
+@contextlib.contextmanager
+def cli_session(args, name):
+    # --metrics / --profile around one CLI run; does nothing when neither flag is given
+    with contextlib.ExitStack() as stack:
+        metrics = None
+        if args.metrics:
+            enable()
+            metrics = stack.enter_context(run(name))
+        if args.profile:
+            stack.enter_context(profile(args.profile))
+        yield
+    if metrics is not None:
+        metrics.report()
+        if args.metrics != '-':
+            metrics.write(args.metrics)
+            print(f"💾 Métricas guardadas en {args.metrics}")
+
+
+if ENABLED and os.environ.get('TRADING_METRICS_OUT'):
+    atexit.register(GLOBAL.write, os.environ['TRADING_METRICS_OUT'])
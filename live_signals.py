@@ -0,0 +1,296 @@
+import time
+import heapq
+import itertools
+import shutil
+import asyncio
+import tempfile
+import argparse
+from collections import deque, namedtuple
+
+import numpy as np
+import pandas as pd
+import bar_store
+import market_data
+import download_scheduler
+import indicators
+import candle_patterns
+import instrumentation
+import synthetic_data
+
+# Streaming version of scalping_signals: a long-running asyncio engine that consumes closed
+# bars from a feed and keeps per-symbol state, so every new bar costs O(1) indicator updates
+# (streaming RSI 14 and Bollinger 20/2 from indicators.py) plus the candle_patterns masks on
+# the previous + new candle. BUY/SELL events are emitted as soon as the bar is processed.
+#
+# Feeds are async iterators of Bar in time order:
+#   ReplayFeed  - replays stored bars from the bar store (tests, offline runs, benchmarks)
+#   PollingFeed - live source: refreshes the store through market_data every poll and emits
+#                 the bars that closed since the last poll
+# Signals match detect_patterns() on the same bars (up to float rounding of the streaming
+# indicators right at a threshold).
+
+# Latency percentiles cover the most recent bars only, so a daemon's memory stays flat
+LATENCY_WINDOW = 10_000
+# Signals waiting for a slow events() consumer; the oldest ones are dropped past this
+QUEUE_SIZE = 1_000
+
+Bar = namedtuple('Bar', ['symbol', 'time', 'open', 'high', 'low', 'close', 'volume'])
+Signal = namedtuple('Signal', ['symbol', 'time', 'signal', 'pattern', 'price', 'rsi', 'latency'])
+
+
+class SymbolState:
+
+    def __init__(self, rsi_period=14, bb_window=20, bb_std=2.0):
+        self.rsi = indicators.RSI(rsi_period)
+        self.bollinger = indicators.Bollinger(bb_window, bb_std)
+        self.prev = None
+        self.bars = 0
+
+    def update(self, bar):
+        # Indicators first (the context uses the new bar's RSI / bands), then the patterns
+        rsi = self.rsi.update(bar.close)
+        _, upper, lower = self.bollinger.update(bar.close)
+        candle = (bar.open, bar.high, bar.low, bar.close)
+        prev, self.prev = self.prev, candle
+        self.bars += 1
+        # Same warm-up as detect_patterns (first two bars skipped); the bands need 20 anyway
+        if prev is None or self.bars <= 2 or np.isnan(rsi) or np.isnan(upper):
+            return None, ''
+        return candle_patterns.detect_bar(prev, candle, rsi, upper, lower)
+
+
+class SignalEngine:
+
+    def __init__(self, feed, on_signal=None, **state_params):
+        self.feed = feed
+        self.on_signal = on_signal
+        self.state_params = state_params
+        self.states = {}
+        # Only filled while someone iterates events(); on_signal alone needs no buffer
+        self.signals = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self.consumers = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.max_latency = 0.0
+        self.bars = 0
+        self.n_signals = 0
+
+    def state(self, symbol):
+        if symbol not in self.states:
+            self.states[symbol] = SymbolState(**self.state_params)
+        return self.states[symbol]
+
+    def warmup(self, frames):
+        # Prime the indicators with history (no signals emitted)
+        for symbol, df in frames.items():
+            state = self.state(symbol)
+            for row in df[['Open', 'High', 'Low', 'Close', 'Volume']].itertuples():
+                state.update(Bar(symbol, *row))
+
+    def process(self, bar):
+        t0 = time.perf_counter()
+        signal, pattern = self.state(bar.symbol).update(bar)
+        latency = time.perf_counter() - t0
+        self.latencies.append(latency)
+        self.max_latency = max(self.max_latency, latency)
+        self.bars += 1
+        instrumentation.count('live_bars')
+        if signal:
+            self.n_signals += 1
+            instrumentation.count('live_signals')
+            return Signal(bar.symbol, bar.time, signal, pattern, bar.close,
+                          self.states[bar.symbol].rsi.value, latency)
+        return None
+
+    def _enqueue(self, event):
+        if not self.consumers:
+            return
+        if self.signals.full():
+            self.signals.get_nowait()
+            instrumentation.count('live_signals_dropped')
+        self.signals.put_nowait(event)
+
+    async def run(self):
+        async for bar in self.feed:
+            event = self.process(bar)
+            if event is not None:
+                self._enqueue(event)
+                if self.on_signal is not None:
+                    result = self.on_signal(event)
+                    if asyncio.iscoroutine(result):
+                        await result
+        # End of feed (replay finished)
+        self._enqueue(None)
+
+    async def events(self):
+        # Async iterator over the signals emitted from now on, ends with the feed
+        self.consumers += 1
+        try:
+            while True:
+                event = await self.signals.get()
+                if event is None:
+                    return
+                yield event
+        finally:
+            self.consumers -= 1
+
+    def latency_stats(self):
+        if not self.latencies:
+            return {}
+        lat = np.fromiter(self.latencies, dtype='float64') * 1000
+        return {'bars': self.bars, 'p50_ms': float(np.percentile(lat, 50)),
+                'p99_ms': float(np.percentile(lat, 99)), 'max_ms': self.max_latency * 1000}
+
+
+# ------------------------
+# Feeds
+# ------------------------
+
+class ReplayFeed:
+    # Stored bars of several symbols merged in time order. speed=0 replays as fast as
+    # possible (yielding to the event loop at every timestamp); speed=60 plays one hour
+    # of bars per minute, and so on.
+
+    def __init__(self, symbols, interval, start=None, end=None, speed=0.0):
+        self.symbols = symbols
+        self.interval = interval
+        self.start = start
+        self.end = end
+        self.speed = speed
+
+    def _rows(self):
+        streams = []
+        for symbol in self.symbols:
+            series = bar_store.open_series(symbol, self.interval)
+            if series is None:
+                print(f"⚠️ {symbol}: sin velas {self.interval} en el almacén local")
+                continue
+            index, cols = series.slice(self.start, self.end)
+            streams.append(zip(index.tolist(), itertools.repeat(symbol),
+                               *(cols[c].tolist() for c in bar_store.COLUMNS)))
+        return heapq.merge(*streams)
+
+    async def __aiter__(self):
+        last = None
+        for ts, symbol, o, h, l, c, v in self._rows():
+            if ts != last:
+                if last is not None and self.speed > 0:
+                    await asyncio.sleep((ts - last) / 1e9 / self.speed)
+                else:
+                    await asyncio.sleep(0)
+                last = ts
+            yield Bar(symbol, pd.Timestamp(ts, tz='UTC'), o, h, l, c, v)
+
+
+class PollingFeed:
+    # Live source: every poll the store is refreshed (only the missing bars are downloaded)
+    # and the bars that closed since the last poll are emitted. The newest stored candle
+    # may still be forming, so a bar is only emitted once time >= its open + interval.
+
+    def __init__(self, symbols, interval, poll_seconds=10.0):
+        self.symbols = symbols
+        self.interval = interval
+        self.poll_seconds = poll_seconds
+        self.bar_ns = market_data.INTERVAL_SECONDS.get(interval, 60) * 1_000_000_000
+        self.last_emitted = {}
+
+    def closed(self, frames, now=None):
+        # Frames without the candles still forming (same cutoff as __aiter__), so warm-up
+        # and seed() only see final bars and the forming one is emitted once it closes
+        now = now if now is not None else pd.Timestamp.now(tz='UTC').value
+        return {symbol: df[bar_store.index_to_ns(df.index) <= now - self.bar_ns]
+                for symbol, df in frames.items()}
+
+    def seed(self, frames):
+        # Bars already used for warm-up are not emitted again
+        for symbol, df in frames.items():
+            if len(df):
+                self.last_emitted[symbol] = bar_store.index_to_ns(df.index[-1:])[0]
+
+    async def __aiter__(self):
+        while True:
+            await asyncio.to_thread(download_scheduler.preload, self.symbols, self.interval, period='2d')
+            now = pd.Timestamp.now(tz='UTC').value
+            for symbol in self.symbols:
+                series = bar_store.open_series(symbol, self.interval)
+                if series is None:
+                    continue
+                index, cols = series.slice()
+                i0 = int(np.searchsorted(index, self.last_emitted.get(symbol, -1), side='right'))
+                i1 = int(np.searchsorted(index, now - self.bar_ns, side='right'))
+                for i in range(i0, i1):
+                    yield Bar(symbol, pd.Timestamp(int(index[i]), tz='UTC'),
+                              *(float(cols[c][i]) for c in bar_store.COLUMNS))
+                if i1 > i0:
+                    self.last_emitted[symbol] = int(index[i1 - 1])
+            await asyncio.sleep(self.poll_seconds)
+
+
+# ------------------------
+# CLI
+# ------------------------
+
+def print_signal(event):
+    emoji = "🟢" if event.signal == "BUY" else "🔴"
+    print(f"{str(event.time):<27} {event.symbol:<10} {emoji} {event.signal:<5} {event.pattern:<20} "
+          f"{event.price:>12.4f}  RSI {event.rsi:5.1f}  ({event.latency * 1000:.2f} ms)")
+
+
+async def run_live(symbols, interval, poll_seconds, warmup_bars=100):
+    feed = PollingFeed(symbols, interval, poll_seconds)
+    frames = feed.closed(download_scheduler.preload(symbols, interval, period='5d'))
+    engine = SignalEngine(feed, on_signal=print_signal)
+    engine.warmup({s: df.iloc[-warmup_bars:] for s, df in frames.items()})
+    feed.seed(frames)
+    print(f"📡 Escuchando {len(symbols)} símbolos en {interval} (poll cada {poll_seconds:.0f}s)...")
+    await engine.run()
+
+
+async def run_replay(symbols, interval, start=None, end=None, speed=0.0, quiet=False):
+    engine = SignalEngine(ReplayFeed(symbols, interval, start, end, speed),
+                          on_signal=None if quiet else print_signal)
+    t0 = time.perf_counter()
+    await engine.run()
+    elapsed = time.perf_counter() - t0
+    stats = engine.latency_stats()
+    if stats:
+        print(f"\n⏱️ {stats['bars']} velas de {len(engine.states)} símbolos en {elapsed:.2f}s "
+              f"({stats['bars'] / elapsed:,.0f} velas/s) | por vela p50 {stats['p50_ms']:.3f} ms, "
+              f"p99 {stats['p99_ms']:.3f} ms, máx {stats['max_ms']:.2f} ms")
+    return engine
+
+
+def benchmark(n_symbols=50, bars=2000, interval='15m'):
+    # Replay of a synthetic universe written to a temporary bar store
+    cache_dir = bar_store.CACHE_DIR
+    bar_store.CACHE_DIR = tempfile.mkdtemp()
+    try:
+        symbols = [f'SYN{i:03d}' for i in range(n_symbols)]
+        for i, symbol in enumerate(symbols):
+            bar_store.write_bars(symbol, interval, synthetic_data.regime_bars(bars, i, interval=interval))
+        engine = asyncio.run(run_replay(symbols, interval, quiet=True))
+        print(f"📈 {engine.n_signals} señales")
+    finally:
+        shutil.rmtree(bar_store.CACHE_DIR, ignore_errors=True)
+        bar_store.CACHE_DIR = cache_dir
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("tickers", nargs="*", help="Tickers (vacío = benchmark de replay sintético)")
+    parser.add_argument("--interval", default="15m", help="Timeframe (1m, 5m, 15m)")
+    parser.add_argument("--replay", action="store_true", help="Reproducir las velas guardadas en vez de escuchar en vivo")
+    parser.add_argument("--start", default=None, help="Inicio del replay (YYYY-MM-DD)")
+    parser.add_argument("--end", default=None, help="Fin del replay (YYYY-MM-DD)")
+    parser.add_argument("--speed", type=float, default=0.0, help="Velocidad del replay (0 = lo más rápido posible)")
+    parser.add_argument("--poll", type=float, default=10.0, help="Segundos entre consultas en vivo")
+    args = parser.parse_args()
+
+    if not args.tickers:
+        benchmark(interval=args.interval)
+    elif args.replay:
+        asyncio.run(run_replay(args.tickers, args.interval, args.start, args.end, args.speed))
+    else:
+        try:
+            asyncio.run(run_live(args.tickers, args.interval, args.poll))
+        except KeyboardInterrupt:
+            print("\n👋 Motor de señales detenido")
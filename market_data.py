@@ -0,0 +1,177 @@
+import threading
+
+import pandas as pd
+import bar_store
+import data_providers
+import instrumentation
+
+# Shared market-data layer.
+# Bars are kept on disk per (symbol, interval) in the memory-mapped bar store (bar_store.py).
+# Each call only downloads the bars missing since the last stored timestamp; warm runs
+# read straight from disk, and only the requested time range is loaded into RAM.
+# Where the bars come from is decided by the active provider (data_providers.py).
+
+COLUMNS = bar_store.COLUMNS
+
+INTERVAL_SECONDS = {
+    '1m': 60, '2m': 120, '5m': 300, '15m': 900, '30m': 1800,
+    '60m': 3600, '90m': 5400, '1h': 3600, '4h': 14400,
+    '1d': 86400, '5d': 432000, '1wk': 604800, '1mo': 2592000, '3mo': 7776000,
+}
+
+DEFAULT_PERIOD = '60d'
+
+_provider = data_providers.YahooProvider()
+
+
+def get_provider():
+    return _provider
+
+
+def set_provider(provider):
+    # Swap the data source (e.g. data_providers.LocalFileProvider for offline runs)
+    global _provider
+    _provider = provider
+
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def _lock_for(ticker, interval):
+    key = (ticker, interval)
+    with _locks_guard:
+        if key not in _locks:
+            _locks[key] = threading.RLock()
+        return _locks[key]
+
+
+def _period_to_timedelta(period):
+    if period is None or period == 'max':
+        return None
+    unit_days = {'d': 1, 'wk': 7, 'mo': 30, 'y': 365}
+    for unit in ('wk', 'mo', 'd', 'y'):
+        if period.endswith(unit):
+            return pd.Timedelta(days=int(period[:-len(unit)]) * unit_days[unit])
+    raise ValueError(f"Periodo no soportado: {period}")
+
+
+def _now():
+    return pd.Timestamp.now(tz='UTC')
+
+
+def _to_utc(ts):
+    ts = pd.Timestamp(ts)
+    if ts.tzinfo is None:
+        return ts.tz_localize('UTC')
+    return ts.tz_convert('UTC')
+
+
+def requested_start(period=None, start=None):
+    # Earliest timestamp the caller is asking for (None = everything available)
+    if start is not None:
+        return _to_utc(start)
+    delta = _period_to_timedelta(period or DEFAULT_PERIOD)
+    if delta is None:
+        return None
+    return _now() - delta
+
+
+normalize_frame = data_providers.normalize_frame
+
+
+def read_bars(ticker, interval, start=None, end=None):
+    # Stored bars for (ticker, interval) in [start, end), or None if nothing is cached
+    series = bar_store.open_series(ticker, interval)
+    if series is None:
+        return None
+    return series.to_frame(start, end)
+
+
+def open_series(ticker, interval, refresh=False, period=None, start=None):
+    # Memory-mapped access to the full stored history (no DataFrame, nothing loaded into RAM).
+    # With refresh=True the store is first brought up to date like get_bars would.
+    if refresh:
+        update(ticker, interval, period=period, start=start)
+    return bar_store.open_series(ticker, interval)
+
+
+# ------------------------
+# Fetch logic
+# ------------------------
+
+def _is_stale(series, interval):
+    if series is None:
+        return True
+    last = _to_utc(series.last_timestamp())
+    return _now() - last >= pd.Timedelta(seconds=INTERVAL_SECONDS.get(interval, 86400))
+
+
+def _needs_backfill(series, ticker, interval, requested):
+    if series is None:
+        return True
+    meta = bar_store.read_meta(ticker, interval)
+    # full_history: a period='max' download already brought everything the provider has;
+    # later incremental writes set requested_from again, so it can't be told from that alone
+    if meta.get('full_history') or meta['requested_from'] is None:
+        return False
+    if requested is None:
+        return True
+    return requested.value < meta['requested_from']
+
+
+def plan_update(ticker, interval, requested):
+    # Returns (download_start, rewrite) where download_start=False means "fresh enough"
+    series = bar_store.open_series(ticker, interval)
+    if _needs_backfill(series, ticker, interval, requested):
+        return requested, True
+    if _is_stale(series, interval):
+        return _to_utc(series.last_timestamp()), False
+    return False, False
+
+
+def _store_update(ticker, interval, new_bars, requested, rewrite):
+    if rewrite:
+        # Backfill: merge what we had with the wider download
+        cached = read_bars(ticker, interval)
+        if cached is not None and len(new_bars):
+            new_bars = normalize_frame(pd.concat([cached, new_bars]))
+        elif cached is not None:
+            new_bars = cached
+    if len(new_bars) == 0 and not rewrite:
+        return
+    extra = {'full_history': True} if rewrite and requested is None else None
+    bar_store.write_bars(ticker, interval, new_bars, requested_from=requested, rewrite=rewrite, extra=extra)
+
+
+def apply_download(ticker, interval, frames, requested, rewrite):
+    # Store the bars a provider returned for ticker (called by update and the scheduler)
+    with _lock_for(ticker, interval):
+        _store_update(ticker, interval, frames.get(ticker, normalize_frame(None)), requested, rewrite)
+
+
+def update(ticker, interval='1d', period=None, start=None):
+    # Bring the local store up to date for one ticker (downloads only what is missing)
+    requested = requested_start(period, start)
+    with _lock_for(ticker, interval):
+        download_start, rewrite = plan_update(ticker, interval, requested)
+        if download_start is not False:
+            try:
+                with instrumentation.stage('fetch.download'):
+                    frames = _provider.fetch([ticker], interval, download_start)
+            except data_providers.DownloadError as e:
+                # Keep working with whatever is already stored locally
+                print(f"⚠️ {e}")
+                return requested
+            apply_download(ticker, interval, frames, requested, rewrite)
+    return requested
+
+
+def get_bars(ticker, interval='1d', period=None, start=None, end=None, refresh=True):
+    # Drop-in replacement for yf.download(ticker, period/start, interval) on a single ticker.
+    # Returns a flat OHLCV DataFrame without NaNs; only [start, end) is read from disk.
+    if refresh:
+        requested = update(ticker, interval, period=period, start=start)
+    else:
+        requested = requested_start(period, start)
+    return bar_store.load_frame(ticker, interval, requested, end)
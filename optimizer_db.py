@@ -1,51 +1,159 @@
-import yfinance as yf
 import pandas as pd
 import numpy as np
+import argparse
 import psycopg2
+import db
+import market_data
+import indicators
+import indicator_cache
+import instrumentation
+import backtest_pro
+import optimizer_search
 
-def test_strategy(df, fast_ma, slow_ma):
-    df_temp = df.copy()
-    df_temp['fast'] = df_temp['Close'].rolling(window=fast_ma).mean()
-    df_temp['slow'] = df_temp['Close'].rolling(window=slow_ma).mean()
-    df_temp['pos'] = np.where(df_temp['fast'] > df_temp['slow'], 1, 0)
-    df_temp['ret'] = df_temp['pos'].shift(1) * df_temp['Close'].pct_change()
-    return (1 + df_temp['ret']).prod()
+def test_strategy(df, fast_ma, slow_ma, version=None):
+    # SMAs come from the indicator cache: each window is computed once per run,
+    # no matter how many (fast, slow) pairs use it. No frame copy needed.
+    close = df['Close'].to_numpy()
+    if version is None:
+        version = indicator_cache.data_version(close)
+    fast = indicator_cache.compute('sma', close, fast_ma, version=version)
+    slow = indicator_cache.compute('sma', close, slow_ma, version=version)
+    pos = np.where(fast > slow, 1, 0)
+    ret = indicators.shift(pos, 1) * (close / indicators.shift(close, 1) - 1)
+    return np.nanprod(1 + ret)
 
+def sma_matrix(close, windows):
+    # (ventanas × tiempo): una fila de SMA por ventana
+    return np.stack([indicators.sma(close, w) for w in windows])
+
+def sma_grid_surface(close, fast, slow, max_bytes=50_000_000):
+    # (fast × slow) multiplicadores finales a partir de matrices de SMA ya calculadas
+    # (ventanas × tiempo, alineadas con close). Ver evaluate_sma_grid.
+    close = np.asarray(close, dtype='float64')
+    fast, slow = fast[:, :-1], slow[:, :-1]
+    # La posición de la vela t-1 cobra el retorno de la vela t
+    log_ret = np.log1p(close[1:] / close[:-1] - 1)
+
+    surface = np.empty((len(fast), len(slow)))
+    # El bloque de posiciones (fast × slow × tiempo) se escribe directamente en un único buffer
+    # float64 reutilizado (el tipo que necesita el matmul), 8 bytes por celda: el número de
+    # ventanas rápidas por bloque se elige para que ese buffer no pase de max_bytes.
+    chunk = max(1, max_bytes // (8 * max(1, len(slow) * len(log_ret))))
+    buf = np.empty((min(chunk, len(fast)), len(slow), len(log_ret)))
+    with np.errstate(invalid='ignore'):
+        for i in range(0, len(fast), chunk):
+            block = fast[i:i + chunk]
+            pos = buf[:len(block)]
+            np.greater(block[:, None, :], slow[None, :, :], out=pos, casting='unsafe')
+            surface[i:i + chunk] = np.exp(pos @ log_ret)
+    return surface
+
+@instrumentation.timed('optimizer.grid')
+def evaluate_sma_grid(close, fast_windows, slow_windows, max_bytes=50_000_000):
+    # Superficie completa de test_strategy para todos los pares (fast, slow) de una vez.
+    # Las SMAs se calculan una sola vez por ventana; la posición de cada par es la
+    # comparación broadcast fast[:, None, :] > slow[None, :, :], y el producto de
+    # (1 + retorno) se obtiene como exp(pos @ log1p(retornos)), un matmul por bloque.
+    # Se procesa por bloques de ventanas rápidas para no pasar de max_bytes de memoria.
+    close = np.asarray(close, dtype='float64')
+    fast_windows, slow_windows = list(fast_windows), list(slow_windows)
+    surface = sma_grid_surface(close, sma_matrix(close, fast_windows), sma_matrix(close, slow_windows), max_bytes)
+    return pd.DataFrame(surface, index=pd.Index(fast_windows, name='fast'),
+                        columns=pd.Index(slow_windows, name='slow'))
+
+def sweep_stoploss(df, fast_ma, slow_ma, stops, version=None):
+    # Multiplicador final del cruce fast/slow para cada stop-loss: SMAs y retornos diarios
+    # se calculan una vez, cada variante es una pasada lineal de backtest_pro.stoploss_returns
+    close = df['Close'].to_numpy()
+    if version is None:
+        version = indicator_cache.data_version(close)
+    fast = indicator_cache.compute('sma', close, fast_ma, version=version)
+    slow = indicator_cache.compute('sma', close, slow_ma, version=version)
+    finales = {}
+    for stop in stops:
+        retornos, _ = backtest_pro.stoploss_returns(close, fast, slow, stop)
+        finales[stop] = np.prod(1 + retornos)
+    return pd.Series(finales, name='final_return').rename_axis('stop_loss_pct')
+
+def stoploss_objective(df, min_bars=100):
+    # Objetivo para optimizer_search: cruce fast/slow con stop-loss sobre la fracción más
+    # reciente `fidelity` del historial; devuelve el multiplicador final
+    close = df['Close'].to_numpy()
+
+    def objective(params, fidelity=1.0):
+        if params['fast'] >= params['slow']:
+            return -np.inf
+        tramo = close[-max(min_bars, int(len(close) * fidelity)):]
+        fast = indicators.sma(tramo, params['fast'])
+        slow = indicators.sma(tramo, params['slow'])
+        retornos, _ = backtest_pro.stoploss_returns(tramo, fast, slow, params['stop_loss_pct'])
+        return np.prod(1 + retornos)
+
+    return objective
+
+STOPLOSS_SPACE = {
+    'fast': optimizer_search.Int(2, 60),
+    'slow': optimizer_search.Int(20, 200),
+    'stop_loss_pct': optimizer_search.Real(0.01, 0.2, log=True),
+}
+
+def get_db_connection():
+    # Connection parameters shared with the API pool (db.DB_PARAMS)
+    return psycopg2.connect(**db.DB_PARAMS)
+
+@instrumentation.timed('db')
 def guardar_mejor_resultado(simbolo, fast, slow, retorno):
     try:
-        conn = psycopg2.connect(
-            dbname="trading_data",
-            user="postgres", # Tu usuario de Linux
-            password="postgres", 
-            host="localhost"
-        )
+        conn = get_db_connection()
         cur = conn.cursor()
         query = """
         INSERT INTO optimization_logs (symbol, best_fast, best_slow, final_return)
         VALUES (%s, %s, %s, %s)
         """
         cur.execute(query, (simbolo, fast, slow, float(retorno)))
+        # Cached API responses built from optimization_logs are dropped on commit
+        db.notify(cur, db.OPTIMIZATION_CHANNEL)
         conn.commit()
         cur.close()
         conn.close()
+        db.publish(db.OPTIMIZATION_CHANNEL)
         print(f"📊 Resultado guardado: SMA {fast}/{slow} con {retorno:.2f}x")
     except Exception as e:
         print(f"❌ Error DB: {e}")
 
+def optimizar(simbolo, search='grid', budget=100):
+    df = market_data.get_bars(simbolo, '1d', start='2024-01-01')
+    version = indicator_cache.data_version(df['Close'].to_numpy())
+
+    if search != 'grid':
+        res = optimizer_search.optimize(stoploss_objective(df), STOPLOSS_SPACE, search, budget)
+        p = res.best_params
+        print(f"🔎 {search}: {res.evaluations} evaluaciones (coste {res.cost:.0f} backtests). "
+              f"Mejor: SMA {p['fast']}/{p['slow']} stop {p['stop_loss_pct']:.1%} -> {res.best_score:.2f}x")
+        guardar_mejor_resultado(simbolo, p['fast'], p['slow'], res.best_score)
+    else:
+        # Rejilla fina: SMA rápida 2-59 × SMA lenta 20-198 (~5.400 pares) en una sola pasada
+        superficie = evaluate_sma_grid(df['Close'].to_numpy(), range(2, 60), range(20, 200, 2))
+        validos = superficie.where(superficie.index.to_numpy()[:, None] < superficie.columns.to_numpy()[None, :])
+        mejores_p = tuple(int(w) for w in validos.stack().idxmax())
+        mejor_ret = validos.loc[mejores_p]
+        print(f"🔎 {validos.count().sum()} combinaciones evaluadas. Mejor: SMA {mejores_p[0]}/{mejores_p[1]} -> {mejor_ret:.2f}x")
+
+        # Stop-loss para el mejor cruce (1% a 15%)
+        finales = sweep_stoploss(df, mejores_p[0], mejores_p[1], np.round(np.arange(0.01, 0.16, 0.01), 2), version)
+        print(f"🛑 Mejor Stop-Loss para SMA {mejores_p[0]}/{mejores_p[1]}: {finales.idxmax():.0%} -> {finales.max():.2f}x")
+
+        print(f"🧮 Cache de indicadores: {indicator_cache.CACHE}")
+        guardar_mejor_resultado(simbolo, mejores_p[0], mejores_p[1], mejor_ret)
+
 if __name__ == "__main__":
-    simbolo = 'BTC-USD'
-    df = yf.download(simbolo, start='2024-01-01', progress=False)
-    if isinstance(df.columns, pd.MultiIndex): df.columns = df.columns.get_level_values(0)
-    df.dropna(inplace=True)
-
-    mejor_ret = 0
-    mejores_p = (0, 0)
-
-    for corta in range(5, 30, 5):
-        for larga in range(40, 100, 10):
-            res = test_strategy(df, corta, larga)
-            if res > mejor_ret:
-                mejor_ret = res
-                mejores_p = (corta, larga)
-
-    guardar_mejor_resultado(simbolo, mejores_p[0], mejores_p[1], mejor_ret)
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument("simbolo", nargs="?", default="BTC-USD", help="Ticker")
+    parser.add_argument("--search", default="grid", choices=["grid", *optimizer_search.ALGORITHMS],
+                        help="grid = rejilla completa de SMAs; random/halving/hyperband/tpe = búsqueda adaptativa (fast, slow, stop-loss)")
+    parser.add_argument("--budget", type=int, default=100, help="Backtests permitidos en la búsqueda adaptativa")
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args()
+
+    with instrumentation.cli_session(args, f"optimizer {args.simbolo}"):
+        optimizar(args.simbolo, args.search, args.budget)
@@ -0,0 +1,306 @@
+import math
+import time
+import argparse
+from dataclasses import dataclass, field
+
+import numpy as np
+import indicator_cache
+import parallel_optimizer
+import synthetic_data
+import bar_resampler
+
+# Adaptive parameter search.
+# One API for every algorithm: optimize(objective, space, algorithm, budget) where
+#   objective(params, fidelity) -> score (higher is better); fidelity in (0, 1] is the
+#                                  fraction of history to backtest on
+#   space  = {'tp_pct': Real(0.005, 0.05, log=True), 'ema': Int(10, 200), 'side': Choice([...])}
+#   budget = cost in full-history backtests (an evaluation at fidelity 0.1 costs 0.1)
+#
+# Algorithms: 'random' (random search), 'hyperband' (successive halving brackets: many
+# configs on short history, survivors promoted to the full history) and 'tpe' (Tree-structured
+# Parzen Estimator: samples where good configs are dense relative to bad ones).
+
+
+# ------------------------
+# Search space
+# ------------------------
+
+class Real:
+    def __init__(self, low, high, log=False):
+        self.low, self.high, self.log = low, high, log
+
+    def to_unit(self, x):
+        return math.log(x) if self.log else x
+
+    def from_unit(self, u):
+        return math.exp(u) if self.log else u
+
+    def bounds(self):
+        return self.to_unit(self.low), self.to_unit(self.high)
+
+    def sample(self, rng):
+        lo, hi = self.bounds()
+        return self.from_unit(rng.uniform(lo, hi))
+
+    def clip(self, x):
+        return min(max(x, self.low), self.high)
+
+
+class Int(Real):
+    def from_unit(self, u):
+        return int(round(super().from_unit(u)))
+
+    def clip(self, x):
+        return int(min(max(round(x), self.low), self.high))
+
+
+class Choice:
+    def __init__(self, values):
+        self.values = list(values)
+
+    def sample(self, rng):
+        return self.values[rng.integers(len(self.values))]
+
+
+def sample_space(space, rng):
+    return {name: dim.sample(rng) for name, dim in space.items()}
+
+
+# ------------------------
+# Results
+# ------------------------
+
+@dataclass
+class SearchResult:
+    best_params: dict = None
+    best_score: float = -math.inf
+    best_fidelity: float = 0.0
+    cost: float = 0.0
+    history: list = field(default_factory=list)   # [(params, fidelity, score), ...]
+
+    @property
+    def evaluations(self):
+        return len(self.history)
+
+
+class _Evaluator:
+    # Runs the objective, keeps the history and the spent budget, memoizes (params, fidelity)
+
+    def __init__(self, objective, budget):
+        self.objective = objective
+        self.budget = budget
+        self.result = SearchResult()
+        self.seen = {}
+        self.repeats = 0
+
+    def exhausted(self, fidelity=1.0):
+        # Also stop when a small discrete space keeps proposing configs already evaluated
+        return self.result.cost + fidelity > self.budget + 1e-9 or self.repeats > 100
+
+    def __call__(self, params, fidelity=1.0):
+        key = (tuple(sorted(params.items())), fidelity)
+        if key in self.seen:
+            self.repeats += 1
+            return self.seen[key]
+        self.repeats = 0
+        score = float(self.objective(params, fidelity))
+        if math.isnan(score):
+            score = -math.inf
+        self.seen[key] = score
+        res = self.result
+        res.cost += fidelity
+        res.history.append((params, fidelity, score))
+        # Best = highest fidelity first, then highest score
+        if (fidelity, score) > (res.best_fidelity, res.best_score):
+            res.best_params, res.best_score, res.best_fidelity = params, score, fidelity
+        return score
+
+
+# ------------------------
+# Algorithms
+# ------------------------
+
+class RandomSearch:
+    def run(self, evaluate, space, rng):
+        while not evaluate.exhausted():
+            evaluate(sample_space(space, rng))
+
+
+class Hyperband:
+    # Li et al.: brackets of successive halving with a different starting fidelity each.
+    # Bracket s starts n configs at fidelity eta^-s and keeps the best 1/eta at every rung.
+
+    def __init__(self, eta=3, min_fidelity=1 / 9):
+        self.eta = eta
+        self.s_max = int(round(math.log(1 / min_fidelity, eta)))
+
+    def successive_halving(self, evaluate, space, rng, n, s):
+        configs = [sample_space(space, rng) for _ in range(n)]
+        for i in range(s + 1):
+            fidelity = self.eta ** (i - s)
+            scored = []
+            for params in configs:
+                if evaluate.exhausted(fidelity):
+                    return
+                scored.append((evaluate(params, fidelity), params))
+            scored.sort(key=lambda item: item[0], reverse=True)
+            configs = [params for _, params in scored[:max(1, len(scored) // self.eta)]]
+
+    def run(self, evaluate, space, rng):
+        while not evaluate.exhausted(self.eta ** -self.s_max):
+            for s in range(self.s_max, -1, -1):
+                n = math.ceil((self.s_max + 1) / (s + 1) * self.eta ** s)
+                self.successive_halving(evaluate, space, rng, n, s)
+                if evaluate.exhausted(self.eta ** -s):
+                    return
+
+
+class SuccessiveHalving(Hyperband):
+    # A single bracket repeated: always start at min_fidelity
+    def run(self, evaluate, space, rng):
+        n = self.eta ** self.s_max
+        while not evaluate.exhausted(self.eta ** -self.s_max):
+            self.successive_halving(evaluate, space, rng, n, self.s_max)
+
+
+class TPE:
+    # Independent (per parameter) Tree-structured Parzen Estimator.
+    # Observations are split into the best `gamma` fraction (l) and the rest (g); candidates are
+    # drawn from l and the one with the highest l(x) / g(x) is evaluated next.
+
+    def __init__(self, n_startup=10, gamma=0.25, n_candidates=24):
+        self.n_startup = n_startup
+        self.gamma = gamma
+        self.n_candidates = n_candidates
+
+    @staticmethod
+    def _kde(dim, values):
+        # Gaussian mixture in the (log-)unit space plus a uniform prior component
+        lo, hi = dim.bounds()
+        mu = np.array([dim.to_unit(v) for v in values])
+        width = hi - lo
+        bw = max(width * len(mu) ** -0.2 / 4, width / 100)
+        return mu, bw, lo, hi
+
+    @staticmethod
+    def _log_density(kde, u):
+        mu, bw, lo, hi = kde
+        width = hi - lo
+        gauss = np.exp(-0.5 * ((u[:, None] - mu[None, :]) / bw) ** 2) / (bw * math.sqrt(2 * math.pi))
+        n = len(mu)
+        return np.log((gauss.sum(axis=1) + 1 / width) / (n + 1))
+
+    def _suggest(self, space, history, rng):
+        scores = np.array([score for _, score in history])
+        n_good = max(1, int(math.ceil(self.gamma * len(history))))
+        order = np.argsort(-scores, kind='stable')
+        good = [history[i][0] for i in order[:n_good]]
+        bad = [history[i][0] for i in order[n_good:]] or good
+
+        params = {}
+        for name, dim in space.items():
+            if isinstance(dim, Choice):
+                k = len(dim.values)
+                l = np.array([1 + sum(p[name] == v for p in good) for v in dim.values]) / (len(good) + k)
+                g = np.array([1 + sum(p[name] == v for p in bad) for v in dim.values]) / (len(bad) + k)
+                candidates = rng.choice(k, size=self.n_candidates, p=l)
+                params[name] = dim.values[candidates[np.argmax(np.log(l[candidates]) - np.log(g[candidates]))]]
+                continue
+
+            l_kde = self._kde(dim, [p[name] for p in good])
+            g_kde = self._kde(dim, [p[name] for p in bad])
+            mu, bw, lo, hi = l_kde
+            picks = rng.integers(len(mu) + 1, size=self.n_candidates)
+            # Component len(mu) is the uniform prior
+            u = np.where(picks < len(mu), rng.normal(mu[np.minimum(picks, len(mu) - 1)], bw),
+                         rng.uniform(lo, hi, self.n_candidates))
+            u = np.clip(u, lo, hi)
+            best = u[np.argmax(self._log_density(l_kde, u) - self._log_density(g_kde, u))]
+            params[name] = dim.clip(dim.from_unit(best))
+        return params
+
+    def run(self, evaluate, space, rng):
+        history = []
+        while not evaluate.exhausted():
+            if len(history) < self.n_startup:
+                params = sample_space(space, rng)
+            else:
+                params = self._suggest(space, history, rng)
+            history.append((params, evaluate(params)))
+
+
+ALGORITHMS = {
+    'random': RandomSearch,
+    'halving': SuccessiveHalving,
+    'hyperband': Hyperband,
+    'tpe': TPE,
+}
+
+
+def optimize(objective, space, algorithm='tpe', budget=50, seed=0, **options):
+    searcher = ALGORITHMS[algorithm](**options) if isinstance(algorithm, str) else algorithm
+    evaluate = _Evaluator(objective, budget)
+    searcher.run(evaluate, space, np.random.default_rng(seed))
+    return evaluate.result
+
+
+# ------------------------
+# Backtest objectives
+# ------------------------
+
+def strategy_objective(df, strategy, min_bars=200, **fixed):
+    # objective(params, fidelity) for a parallel_optimizer strategy: backtests the most recent
+    # `fidelity` fraction of the history (at least min_bars) and returns profit_pct
+    values = {col: df[col].to_numpy(dtype='float64') for col in parallel_optimizer.COLUMNS}
+    version = indicator_cache.data_version(values['Close'])
+    evaluate = parallel_optimizer.STRATEGIES[strategy]['evaluate']
+    n = len(df)
+
+    def objective(params, fidelity=1.0):
+        start = n - min(n, max(min_bars, int(n * fidelity)))
+        data = {col: arr[start:] for col, arr in values.items()}
+        return evaluate(data, f"{version}:{start}", **fixed, **params)['profit_pct']
+
+    return objective
+
+
+SMART_TREND_SPACE = {
+    'tp_pct': Real(0.005, 0.05, log=True),
+    'sl_pct': Real(0.0025, 0.03, log=True),
+    'ema': Int(10, 200),
+    'rsi_low': Int(20, 45),
+    'rsi_high': Int(50, 70),
+}
+
+
+def benchmark(df, budget=60, seeds=3):
+    # Exhaustive smart trend grid vs adaptive search with a small budget
+    objective = strategy_objective(df, 'smart_trend')
+    grid = parallel_optimizer.param_grid(parallel_optimizer.STRATEGIES['smart_trend']['grid'])
+    t0 = time.perf_counter()
+    grid_best = max(objective(p) for p in grid)
+    print(f"🧮 Grid:      {len(grid):>4} backtests  mejor {grid_best:+8.2f}%  ({time.perf_counter() - t0:.1f}s)")
+    for name in ALGORITHMS:
+        scores, costs = [], []
+        t0 = time.perf_counter()
+        for seed in range(seeds):
+            res = optimize(objective, SMART_TREND_SPACE, name, budget, seed=seed)
+            scores.append(res.best_score)
+            costs.append(res.cost)
+        print(f"🔎 {name:<10} {np.mean(costs):>4.0f} backtests  mejor {np.mean(scores):+8.2f}% "
+              f"(media de {seeds} semillas, {(time.perf_counter() - t0) / seeds:.1f}s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("ticker", nargs="?", default=None, help="Ticker (vacío = datos sintéticos)")
+    parser.add_argument("--interval", default="1h", help="Timeframe (15m, 1h)")
+    parser.add_argument("--period", default="180d", help="Historial a usar")
+    parser.add_argument("--budget", type=int, default=60, help="Backtests completos permitidos por búsqueda")
+    args = parser.parse_args()
+
+    if args.ticker:
+        df = bar_resampler.get_bars(args.ticker, args.interval, period=args.period)
+    else:
+        df = synthetic_data.gbm_bars(4000, seed=7, mu=0.0002, interval=args.interval)
+    benchmark(df, args.budget)
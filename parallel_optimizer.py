@@ -0,0 +1,241 @@
+import os
+import math
+import time
+import argparse
+import itertools
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+import indicators
+import indicator_cache
+import backtest_engine
+import smart_trend_strategy
+import breakout_strategy
+import aggressive_strategy
+import synthetic_data
+import download_scheduler
+
+# Multi-core parameter search.
+# Every symbol's OHLCV is copied once into a shared memory block; the worker processes map
+# those blocks in their initializer and keep NumPy views over them, so a task is only
+# (strategy, symbol, list of parameter dicts) - no DataFrame is pickled per task. Results
+# are streamed back as each chunk finishes. Indicators are memoized per worker process, so
+# a chunk of parameter sets on the same symbol reuses its EMA/RSI/SMA arrays.
+#
+# New strategies: register_strategy('name', evaluate_fn, {'param': [values, ...]})
+# where evaluate_fn(data, version, **params) -> {'profit_pct': ..., 'trades': ...}
+
+COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+
+# ------------------------
+# Strategies
+# ------------------------
+
+def _sma_cross(data, version, fast, slow):
+    close = data['Close']
+    fast_sma = indicator_cache.compute('sma', close, fast, version=version)
+    slow_sma = indicator_cache.compute('sma', close, slow, version=version)
+    pos = np.where(fast_sma > slow_sma, 1, 0)
+    ret = indicators.shift(pos, 1) * (close / indicators.shift(close, 1) - 1)
+    trades = int(np.count_nonzero(np.diff(pos) > 0))
+    return {'profit_pct': (np.nanprod(1 + ret) - 1) * 100, 'trades': trades}
+
+
+def _result(result):
+    return {'profit_pct': result.profit_pct, 'trades': result.n_trades}
+
+
+def _smart_trend(data, version, tp_pct, sl_pct, ema=50, rsi_low=35, rsi_high=55, leverage=5):
+    close = data['Close']
+    entries = smart_trend_strategy.smart_trend_signals(
+        close, indicator_cache.compute('ema', close, ema, version=version),
+        indicator_cache.compute('rsi', close, 14, version=version), rsi_low, rsi_high)
+    return _result(backtest_engine.run_backtest(close, entries, start=50, tp_pct=tp_pct, sl_pct=sl_pct,
+                                                leverage=leverage, liquidation_level=10))
+
+
+def _donchian(data, version, high_window, low_window):
+    close = data['Close']
+    upper, lower = indicator_cache.compute('donchian', (data['High'], data['Low']), high_window, low_window,
+                                           version=version)
+    entries, exits = breakout_strategy.breakout_signals(close, upper, lower)
+    return _result(backtest_engine.run_backtest(close, entries, exits, start=high_window + 1))
+
+
+def _rsi_reversion(data, version, period, oversold, overbought, sl_pct=0.015, leverage=10):
+    close = data['Close']
+    entries, exits = aggressive_strategy.aggressive_signals(
+        indicator_cache.compute('rsi', close, period, version=version), oversold, overbought)
+    return _result(backtest_engine.run_backtest(close, entries, exits, start=5, sl_pct=sl_pct,
+                                                leverage=leverage, liquidation_level=10))
+
+
+STRATEGIES = {}
+
+
+def register_strategy(name, evaluate, grid, valid=None):
+    STRATEGIES[name] = {'evaluate': evaluate, 'grid': grid, 'valid': valid}
+
+
+register_strategy('sma_cross', _sma_cross,
+                  {'fast': list(range(5, 50, 5)), 'slow': list(range(20, 200, 10))},
+                  valid=lambda p: p['fast'] < p['slow'])
+register_strategy('smart_trend', _smart_trend,
+                  {'tp_pct': [0.01, 0.015, 0.02, 0.03], 'sl_pct': [0.005, 0.0075, 0.01, 0.015],
+                   'ema': [20, 50, 100], 'rsi_low': [30, 35, 40], 'rsi_high': [50, 55, 60]})
+register_strategy('donchian', _donchian,
+                  {'high_window': list(range(10, 60, 5)), 'low_window': list(range(5, 30, 5))})
+register_strategy('rsi_reversion', _rsi_reversion,
+                  {'period': [2, 3, 4], 'oversold': [5, 10, 15, 20], 'overbought': [80, 85, 90, 95],
+                   'sl_pct': [0.01, 0.015, 0.02]})
+
+
+def param_grid(grid, valid=None):
+    # {'a': [1, 2], 'b': [3]} -> [{'a': 1, 'b': 3}, {'a': 2, 'b': 3}]
+    names = list(grid)
+    combos = (dict(zip(names, values)) for values in itertools.product(*grid.values()))
+    return [p for p in combos if valid is None or valid(p)]
+
+
+# ------------------------
+# Shared memory
+# ------------------------
+
+class SharedArrays:
+    # Owner side: one shared memory block per named float64 array.
+    # Use as a context manager so the blocks are always unlinked.
+
+    def __init__(self, arrays):
+        self.blocks = []
+        self.layout = {}
+        for key, values in arrays.items():
+            values = np.ascontiguousarray(values, dtype='float64')
+            shm = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+            np.ndarray(values.shape, dtype='float64', buffer=shm.buf)[:] = values
+            self.blocks.append(shm)
+            self.layout[key] = (shm.name, values.shape)
+
+    def close(self):
+        for shm in self.blocks:
+            shm.close()
+            shm.unlink()
+        self.blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SharedPrices(SharedArrays):
+    # One block per symbol holding its OHLCV as a (5, n) array
+    def __init__(self, frames):
+        super().__init__({symbol: df[COLUMNS].to_numpy(dtype='float64').T for symbol, df in frames.items()})
+
+
+# Worker side
+_BLOCKS = []
+
+
+def attach_arrays(layout):
+    # {key: read-only view into the shared block}; the blocks stay mapped for the life of the worker
+    arrays = {}
+    for key, (name, shape) in layout.items():
+        shm = shared_memory.SharedMemory(name=name)
+        _BLOCKS.append(shm)
+        values = np.ndarray(shape, dtype='float64', buffer=shm.buf)
+        values.setflags(write=False)
+        arrays[key] = values
+    return arrays
+
+
+# symbol -> {column: view}
+_DATA = {}
+
+
+def _attach(layout):
+    for symbol, values in attach_arrays(layout).items():
+        _DATA[symbol] = dict(zip(COLUMNS, values))
+
+
+def _run_chunk(strategy, symbol, params_list):
+    data = _DATA[symbol]
+    evaluate = STRATEGIES[strategy]['evaluate']
+    # The data never changes during a run: symbol + length is enough as cache version
+    version = f"{symbol}:{len(data['Close'])}"
+    rows = []
+    for params in params_list:
+        metrics = evaluate(data, version, **params)
+        rows.append({'symbol': symbol, **params, **metrics})
+    return rows
+
+
+# ------------------------
+# Runner
+# ------------------------
+
+def iter_results(frames, strategy, grid=None, max_workers=None, chunk_size=None):
+    # Yields one result dict per (symbol, parameter set), in completion order
+    spec = STRATEGIES[strategy]
+    params = param_grid(grid or spec['grid'], spec['valid'])
+    max_workers = max_workers or os.cpu_count()
+    if chunk_size is None:
+        # ~4 chunks per worker for every symbol keeps all cores busy until the end
+        chunk_size = max(1, math.ceil(len(params) / (max_workers * 4)))
+    chunks = [params[i:i + chunk_size] for i in range(0, len(params), chunk_size)]
+
+    with SharedPrices(frames) as shared:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_attach,
+                                 initargs=(shared.layout,)) as pool:
+            futures = [pool.submit(_run_chunk, strategy, symbol, chunk)
+                       for symbol in frames for chunk in chunks]
+            for future in as_completed(futures):
+                yield from future.result()
+
+
+def optimize(frames, strategy, grid=None, max_workers=None, chunk_size=None):
+    results = pd.DataFrame(list(iter_results(frames, strategy, grid, max_workers, chunk_size)))
+    return results.sort_values('profit_pct', ascending=False, ignore_index=True)
+
+
+def benchmark(strategy='smart_trend', n_symbols=8, bars=5000, max_workers=None):
+    frames = synthetic_data.universe(n_symbols, bars, interval='1h')
+    n_params = len(param_grid(STRATEGIES[strategy]['grid'], STRATEGIES[strategy]['valid']))
+    max_workers = max_workers or os.cpu_count()
+    counts = sorted({1, *[2 ** k for k in range(1, 8) if 2 ** k < max_workers], max_workers})
+
+    print(f"⚙️ Benchmark {strategy}: {n_symbols} símbolos × {bars} velas × {n_params} combinaciones")
+    base = None
+    for workers in counts:
+        t0 = time.perf_counter()
+        n = sum(1 for _ in iter_results(frames, strategy, max_workers=workers))
+        elapsed = time.perf_counter() - t0
+        base = base or elapsed
+        print(f"workers={workers:<3} {elapsed:7.2f}s  {n / elapsed:8.0f} backtests/s  speedup x{base / elapsed:.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("tickers", nargs="*", help="Tickers a optimizar (vacío = benchmark con datos sintéticos)")
+    parser.add_argument("--strategy", default="smart_trend", choices=sorted(STRATEGIES), help="Estrategia")
+    parser.add_argument("--interval", default="1h", help="Timeframe (15m, 1h, 1d)")
+    parser.add_argument("--period", default="90d", help="Historial a usar")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos (por defecto todos los núcleos)")
+    parser.add_argument("--top", type=int, default=10, help="Mejores combinaciones a mostrar")
+    args = parser.parse_args()
+
+    if not args.tickers:
+        benchmark(args.strategy, max_workers=args.workers)
+    else:
+        frames = download_scheduler.preload(args.tickers, args.interval, period=args.period)
+        frames = {t: df for t, df in frames.items() if not df.empty}
+        t0 = time.perf_counter()
+        results = optimize(frames, args.strategy, max_workers=args.workers)
+        print(f"⏱️ {len(results)} backtests en {time.perf_counter() - t0:.2f}s")
+        for symbol, group in results.groupby('symbol', sort=False):
+            print(f"\n🏆 {symbol}")
+            print(group.head(args.top).to_string(index=False))
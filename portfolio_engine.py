@@ -0,0 +1,281 @@
+import time
+import argparse
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+import indicator_cache
+import instrumentation
+import backtest_engine
+import bar_resampler
+import smart_trend_strategy
+import synthetic_data
+
+# Multi-asset portfolio simulation with shared capital.
+#
+# Panel layout: all symbols on one union timeline (T x N). Crypto has a bar every hour, stocks
+# only during their session, so `tradable[t, j]` says whether symbol j printed a bar at t;
+# prices are forward-filled only to value open positions.
+# Indicators must run on each symbol's own bars (an EMA over forward-filled overnight hours
+# would be wrong), so every column is also kept as its own bar sequence, right-aligned in an
+# (L x N) matrix padded with NaN at the top. 2D indicators run on that matrix in one call and
+# are scattered back to the timeline with to_timeline().
+#
+# The simulation walks the timeline once; at every bar exits, entries, sizing and equity are
+# computed for all symbols at once with NumPy.
+
+LIQUIDATED = 5
+REASONS = {**backtest_engine.REASONS, LIQUIDATED: 'LIQ'}
+
+
+def utc_index(index):
+    # Crypto frames come in UTC and stock frames in America/New_York: one clock for the union
+    index = pd.DatetimeIndex(index)
+    return index.tz_localize('UTC') if index.tz is None else index.tz_convert('UTC')
+
+
+class Panel:
+
+    def __init__(self, frames):
+        frames = {s: df.set_axis(utc_index(df.index)) for s, df in frames.items() if not df.empty}
+        self.symbols = list(frames)
+        self.index = pd.DatetimeIndex(sorted(set().union(*(df.index for df in frames.values()))))
+        T, N = len(self.index), len(self.symbols)
+        lengths = np.array([len(df) for df in frames.values()])
+        self.own_length = int(lengths.max())
+
+        # Own-bar matrices (L x N), right-aligned; own_row maps timeline cells to their rows
+        self.own = {col: np.full((self.own_length, N), np.nan) for col in bar_resampler.OHLCV_RULES}
+        self.tradable = np.zeros((T, N), dtype=bool)
+        self.own_row = np.full((T, N), -1, dtype=np.int64)
+        # Bar number inside each symbol's own history (for warm-up checks)
+        self.bar_number = np.full((T, N), -1, dtype=np.int64)
+        for j, df in enumerate(frames.values()):
+            pad = self.own_length - len(df)
+            for col, matrix in self.own.items():
+                matrix[pad:, j] = df[col].to_numpy(dtype='float64')
+            rows = self.index.get_indexer(df.index)
+            self.tradable[rows, j] = True
+            self.own_row[rows, j] = pad + np.arange(len(df))
+            self.bar_number[rows, j] = np.arange(len(df))
+
+        self.close = self.to_timeline(self.own['Close'])
+        # Last known price for valuation
+        self.close_ffill = pd.DataFrame(self.close).ffill().to_numpy()
+
+    def to_timeline(self, own_matrix):
+        out = np.full(self.tradable.shape, np.nan)
+        t, j = np.nonzero(self.tradable)
+        out[t, j] = own_matrix[self.own_row[t, j], j]
+        return out
+
+    def indicator(self, name, *params, column='Close'):
+        # 2D indicator over every symbol's own bars, memoized, mapped onto the timeline
+        return self.to_timeline(indicator_cache.compute(name, self.own[column], *params))
+
+
+@dataclass
+class PortfolioResult:
+    symbols: list
+    index: pd.DatetimeIndex
+    initial_capital: float
+    equity: np.ndarray
+    cash: np.ndarray
+    open_positions: np.ndarray
+    # Trade ledger
+    symbol_idx: np.ndarray
+    entry_t: np.ndarray
+    exit_t: np.ndarray
+    entry_price: np.ndarray
+    exit_price: np.ndarray
+    margin: np.ndarray
+    pnl: np.ndarray
+    reason: np.ndarray
+
+    @property
+    def final_equity(self):
+        return self.equity[-1]
+
+    @property
+    def profit_pct(self):
+        return (self.final_equity - self.initial_capital) / self.initial_capital * 100
+
+    @property
+    def max_drawdown(self):
+        peak = np.maximum.accumulate(self.equity)
+        return ((self.equity - peak) / peak).min() * 100
+
+    def per_symbol(self):
+        trades = pd.DataFrame({'Ticker': np.array(self.symbols)[self.symbol_idx], 'pnl': self.pnl,
+                               'win': self.pnl > 0})
+        summary = trades.groupby('Ticker').agg(Trades=('pnl', 'size'), PnL=('pnl', 'sum'), WinRate=('win', 'mean'))
+        summary = summary.reindex(self.symbols).fillna({'Trades': 0, 'PnL': 0.0})
+        return summary.sort_values('PnL', ascending=False)
+
+
+@instrumentation.timed('portfolio.simulate')
+def simulate(panel, entries, exits=None, tp_pct=None, sl_pct=None, leverage=1.0, initial_capital=1000.0,
+             position_size=0.1, max_positions=10, priority=None):
+    # entries / exits / priority: (T x N) arrays on the panel timeline. position_size is the
+    # margin per new position as a fraction of current equity; when more symbols signal than
+    # free slots, the highest priority wins (default: panel order).
+    T, N = panel.tradable.shape
+    px_all = panel.close_ffill
+    entries = entries & panel.tradable
+    exits = exits & panel.tradable if exits is not None else None
+    tp_mult = 1 + tp_pct if tp_pct is not None else np.inf
+    sl_mult = 1 - sl_pct if sl_pct is not None else -np.inf
+
+    is_open = np.zeros(N, dtype=bool)
+    entry = np.ones(N)
+    margin = np.zeros(N)
+    entry_t = np.zeros(N, dtype=np.int64)
+    cash = float(initial_capital)
+    equity = np.empty(T)
+    cash_curve = np.empty(T)
+    n_open = np.zeros(T, dtype=np.int64)
+    ledger = []
+
+    def close_positions(t, mask, price, reason):
+        nonlocal cash
+        idx = np.nonzero(mask)[0]
+        pnl = margin[idx] * leverage * (price[idx] / entry[idx] - 1)
+        if reason == LIQUIDATED:
+            pnl = -margin[idx]
+        cash += float((margin[idx] + pnl).sum())
+        ledger.append((idx, entry_t[idx], np.full(len(idx), t), entry[idx], price[idx], margin[idx], pnl,
+                       np.full(len(idx), reason)))
+        is_open[idx] = False
+        margin[idx] = 0.0
+
+    for t in range(T):
+        px = px_all[t]
+        live = is_open & panel.tradable[t]
+        closing = np.zeros(N, dtype=bool)
+
+        # ------------------------
+        # Exits: liquidation, TP, SL, signal
+        # ------------------------
+        if live.any():
+            ret = px / entry - 1
+            liq = live & (ret * leverage <= -1)
+            tp = live & ~liq & (px >= entry * tp_mult)
+            sl = live & ~liq & ~tp & (px <= entry * sl_mult)
+            sig = live & ~liq & ~tp & ~sl & exits[t] if exits is not None else np.zeros(N, dtype=bool)
+            for mask, reason in ((liq, LIQUIDATED), (tp, backtest_engine.TP), (sl, backtest_engine.SL),
+                                 (sig, backtest_engine.EXIT)):
+                if mask.any():
+                    close_positions(t, mask, px, reason)
+            closing = liq | tp | sl | sig
+
+        # ------------------------
+        # Entries (no re-entry on an exit bar)
+        # ------------------------
+        candidates = entries[t] & ~is_open & ~closing
+        slots = max_positions - int(is_open.sum())
+        if slots > 0 and candidates.any():
+            idx = np.nonzero(candidates)[0]
+            if priority is not None:
+                idx = idx[np.argsort(-priority[t, idx], kind='stable')]
+            open_value = (margin * (1 + leverage * (px / entry - 1))).clip(min=0)[is_open].sum()
+            size = (cash + open_value) * position_size
+            if size > 0:
+                idx = idx[:min(slots, int(cash // size))]
+                is_open[idx] = True
+                entry[idx] = px[idx]
+                margin[idx] = size
+                entry_t[idx] = t
+                cash -= size * len(idx)
+
+        value = (margin * (1 + leverage * (px / entry - 1))).clip(min=0)
+        equity[t] = cash + value[is_open].sum()
+        cash_curve[t] = cash
+        n_open[t] = is_open.sum()
+
+    # Close Position at End
+    if is_open.any():
+        close_positions(T - 1, is_open.copy(), px_all[-1], backtest_engine.END)
+        equity[-1] = cash
+
+    cols = [np.concatenate(c) for c in zip(*ledger)] if ledger else [np.array([])] * 8
+    instrumentation.count('bars_processed', int(panel.tradable.sum()))
+    instrumentation.count('trades', len(cols[0]))
+    return PortfolioResult(
+        symbols=panel.symbols, index=panel.index, initial_capital=float(initial_capital),
+        equity=equity, cash=cash_curve, open_positions=n_open,
+        symbol_idx=cols[0].astype(np.int64), entry_t=cols[1].astype(np.int64), exit_t=cols[2].astype(np.int64),
+        entry_price=cols[3].astype('float64'), exit_price=cols[4].astype('float64'),
+        margin=cols[5].astype('float64'), pnl=cols[6].astype('float64'), reason=cols[7].astype(np.int8),
+    )
+
+
+# ------------------------
+# Strategies on the panel
+# ------------------------
+
+def smart_trend_panel(panel, ema=50, rsi_low=35, rsi_high=55, warmup=50):
+    # Smart trend entries for every symbol at once; priority = deepest pullback (lowest RSI)
+    ema_values = panel.indicator('ema', ema)
+    rsi_values = panel.indicator('rsi', 14)
+    entries = smart_trend_strategy.smart_trend_signals(panel.close, ema_values, rsi_values, rsi_low, rsi_high)
+    entries &= panel.bar_number >= warmup
+    return entries, -np.nan_to_num(rsi_values, nan=100.0)
+
+
+def run_smart_trend_portfolio(frames, leverage=5, initial_capital=1000.0, position_size=0.1, max_positions=10,
+                              tp_pct=0.015, sl_pct=0.0075):
+    panel = Panel(frames)
+    entries, priority = smart_trend_panel(panel)
+    result = simulate(panel, entries, tp_pct=tp_pct, sl_pct=sl_pct, leverage=leverage,
+                      initial_capital=initial_capital, position_size=position_size,
+                      max_positions=max_positions, priority=priority)
+    return panel, result
+
+
+def print_report(result, title="PORTAFOLIO"):
+    print("\n" + "="*80)
+    print(f"💼 {title}: capital compartido ${result.initial_capital:.2f}, {len(result.symbols)} activos, "
+          f"{len(result.index)} velas")
+    print("="*80)
+    summary = result.per_symbol()
+    summary['PnL'] = summary['PnL'].map(lambda v: f"${v:+.2f}")
+    summary['WinRate'] = summary['WinRate'].map(lambda v: '-' if pd.isna(v) else f"{v:.0%}")
+    summary['Trades'] = summary['Trades'].astype(int)
+    print(summary.to_string())
+    print("-" * 80)
+    print(f"Operaciones: {len(result.pnl)}  |  Posiciones simultáneas (máx): {result.open_positions.max()}")
+    print(f"Max Drawdown: {result.max_drawdown:.2f}%")
+    print(f"RESULTADO FINAL: ${result.final_equity:.2f} ({result.profit_pct:+.2f}%)")
+    print("="*80 + "\n")
+
+
+def synthetic_universe(n_assets=50, days=90, seed=0):
+    # Mitad cripto 24/7, mitad acciones solo en sesión regular (velas 1h a las :30)
+    frames = {}
+    bars = days * 24
+    for i in range(n_assets):
+        df = synthetic_data.gbm_bars(bars, seed + i, sigma=0.004 + 0.002 * (i % 4), interval='1h')
+        if i % 2:
+            df.index = df.index + pd.Timedelta(minutes=30)
+            # Stock feeds are in exchange time, crypto in UTC (as Yahoo / bar_store give them)
+            stock = synthetic_data.stock_hours(df)
+            frames[f'STK{i:03d}'] = stock.set_axis(stock.index.tz_convert('America/New_York'))
+        else:
+            frames[f'SYN{i:03d}-USD'] = df
+    return frames
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--assets", type=int, default=50, help="Activos sintéticos")
+    parser.add_argument("--days", type=int, default=90, help="Días de velas 1h")
+    parser.add_argument("--leverage", type=int, default=5, help="Apalancamiento")
+    parser.add_argument("--max-positions", type=int, default=10, help="Posiciones simultáneas")
+    args = parser.parse_args()
+
+    frames = synthetic_universe(args.assets, args.days)
+    t0 = time.perf_counter()
+    panel, result = run_smart_trend_portfolio(frames, leverage=args.leverage, max_positions=args.max_positions)
+    elapsed = time.perf_counter() - t0
+    print_report(result, "SMART TREND (sintético)")
+    print(f"⏱️ Panel {len(panel.index)} × {len(panel.symbols)} simulado en {elapsed:.2f}s")
@@ -0,0 +1,90 @@
+import json
+import time
+import hashlib
+import threading
+
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+import instrumentation
+
+# In-memory cache for the API's query endpoints.
+#
+#   cache = ResponseCache(ttl=300)
+#   return cache.respond(request, 'mejores-estrategias', load_rows, tags=('optimization_logs',))
+#
+# Each entry keeps the encoded JSON body and its ETag. A request whose If-None-Match
+# matches the current ETag gets an empty 304; anything else gets the cached body. The
+# loader (the DB query) only runs when the entry is missing, expired or invalidated, and
+# concurrent misses on one key share a single load.
+#
+# Entries carry tags (table names); invalidate(tag) drops every entry built from that
+# table. The API wires that to db.Pool.listen(): Postgres NOTIFY from the writers
+# (optimizer_db, walk_forward), or in-process db.publish() with the SQLite stand-in. The
+# TTL is only a safety net for a missed notification.
+
+
+class ResponseCache:
+
+    def __init__(self, ttl=300.0):
+        self.ttl = ttl
+        self.entries = {}       # key -> (body, etag, expires, tags)
+        self.lock = threading.Lock()
+        self.loading = {}       # key -> lock held while that key is being loaded
+        self.counters = {'hits': 0, 'misses': 0, 'not_modified': 0, 'invalidations': 0}
+
+    def _count(self, name):
+        with self.lock:
+            self.counters[name] += 1
+        instrumentation.count(f'api_cache_{name}')
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry is None or entry[2] < time.monotonic():
+            return None
+        return entry
+
+    def load(self, key, loader, tags=()):
+        # (body, etag) for key, running loader() at most once per miss
+        entry = self.get(key)
+        if entry is not None:
+            self._count('hits')
+            return entry[0], entry[1]
+        with self.lock:
+            key_lock = self.loading.setdefault(key, threading.Lock())
+        with key_lock:
+            entry = self.get(key)
+            if entry is not None:
+                self._count('hits')
+                return entry[0], entry[1]
+            self._count('misses')
+            with self.lock:
+                generation = self.counters['invalidations']
+            body = json.dumps(jsonable_encoder(loader()), separators=(',', ':')).encode()
+            etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+            with self.lock:
+                # An invalidation that arrived during the load means the rows may be stale
+                if generation == self.counters['invalidations']:
+                    self.entries[key] = (body, etag, time.monotonic() + self.ttl, tuple(tags))
+            return body, etag
+
+    def respond(self, request, key, loader, tags=()):
+        body, etag = self.load(key, loader, tags)
+        headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+        if etag in request.headers.get('if-none-match', '').replace(' ', '').split(','):
+            self._count('not_modified')
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type='application/json', headers=headers)
+
+    def invalidate(self, tag=None):
+        # Drops the entries built from `tag` (all entries if None)
+        with self.lock:
+            self.counters['invalidations'] += 1
+            if tag is None:
+                self.entries.clear()
+            else:
+                self.entries = {k: e for k, e in self.entries.items() if tag not in e[3]}
+
+    def stats(self):
+        with self.lock:
+            return {'entries': len(self.entries), 'ttl': self.ttl, **self.counters}
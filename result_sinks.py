@@ -0,0 +1,135 @@
+import os
+import argparse
+
+import pandas as pd
+import instrumentation
+
+# Destinations for a backtest's trade ledger.
+# Backtests only fill the columnar ledger of backtest_engine.BacktestResult and return it;
+# nothing is formatted or written unless a sink is attached. The CLIs build sinks from
+# --export specs:
+#   console        -> table of trades on stdout
+#   trades.csv     -> CSV file (appends, one row per trade plus the run label)
+#   trades.parquet -> Parquet file (needs pyarrow or fastparquet)
+#   db             -> backtest_trades table in Postgres
+
+DB_TABLE = """
+CREATE TABLE IF NOT EXISTS backtest_trades (
+    id SERIAL PRIMARY KEY,
+    run TEXT,
+    entry_time TEXT,
+    exit_time TEXT,
+    entry_price DOUBLE PRECISION,
+    exit_price DOUBLE PRECISION,
+    pnl DOUBLE PRECISION,
+    capital_after DOUBLE PRECISION,
+    reason TEXT,
+    created_at TIMESTAMPTZ DEFAULT NOW()
+)
+"""
+
+
+def _table(result, run):
+    trades = result.trades()
+    trades.insert(0, 'run', run)
+    return trades
+
+
+class ConsoleSink:
+
+    def write(self, result, run):
+        trades = result.trades()
+        print(f"\n🧾 {run}: {result.n_trades} operaciones")
+        if len(trades):
+            trades['pnl'] = trades['pnl'].map(lambda v: f"{v*100:+.2f}%")
+            print(trades.to_string(index=False, float_format=lambda v: f"{v:.2f}"))
+
+
+class CsvSink:
+
+    def __init__(self, path):
+        self.path = path
+
+    def write(self, result, run):
+        exists = os.path.exists(self.path)
+        _table(result, run).to_csv(self.path, mode='a', header=not exists, index=False)
+        print(f"💾 {result.n_trades} operaciones -> {self.path}")
+
+
+class ParquetSink:
+
+    def __init__(self, path):
+        self.path = path
+
+    def write(self, result, run):
+        trades = _table(result, run)
+        try:
+            # Parquet files can't be appended to: previous runs are read back and rewritten
+            if os.path.exists(self.path):
+                trades = pd.concat([pd.read_parquet(self.path), trades], ignore_index=True)
+            trades.to_parquet(self.path, index=False)
+            print(f"💾 {result.n_trades} operaciones -> {self.path}")
+        except ImportError:
+            print("❌ Parquet no disponible: instala pyarrow (o usa un destino .csv)")
+
+
+class DbSink:
+
+    @instrumentation.timed('db')
+    def write(self, result, run):
+        # Imported here so the strategy CLIs don't need psycopg2 unless they write to the DB
+        from psycopg2.extras import execute_values
+        import optimizer_db
+        try:
+            conn = optimizer_db.get_db_connection()
+            cur = conn.cursor()
+            cur.execute(DB_TABLE)
+            trades = result.trades()
+            rows = [(run, str(t.entry_time), str(t.exit_time), float(t.entry_price), float(t.exit_price),
+                     float(t.pnl), float(t.capital_after), t.reason)
+                    for t in trades.itertuples()]
+            execute_values(cur, """
+            INSERT INTO backtest_trades (run, entry_time, exit_time, entry_price, exit_price,
+                                         pnl, capital_after, reason)
+            VALUES %s
+            """, rows)
+            conn.commit()
+            cur.close()
+            conn.close()
+            print(f"📊 {len(rows)} operaciones guardadas en backtest_trades ({run})")
+        except Exception as e:
+            print(f"❌ Error DB: {e}")
+
+
+def export_spec(spec):
+    # argparse type for --export: unknown destinations fail at parse time, before any data loads
+    if spec in ('console', 'db') or spec.endswith(('.csv', '.parquet')):
+        return spec
+    raise argparse.ArgumentTypeError(f"destino desconocido: {spec} (console, db, *.csv, *.parquet)")
+
+
+def from_specs(specs):
+    # --export values -> sinks
+    sinks = []
+    for spec in specs or ():
+        if spec == 'console':
+            sinks.append(ConsoleSink())
+        elif spec == 'db':
+            sinks.append(DbSink())
+        elif spec.endswith('.parquet'):
+            sinks.append(ParquetSink(spec))
+        elif spec.endswith('.csv'):
+            sinks.append(CsvSink(spec))
+        else:
+            raise ValueError(f"Destino desconocido: {spec} (console, db, *.csv, *.parquet)")
+    return sinks
+
+
+def emit(result, sinks, run):
+    for sink in sinks or ():
+        sink.write(result, run)
+
+
+def add_export_argument(parser):
+    parser.add_argument("--export", action="append", default=None, metavar="DESTINO", type=export_spec,
+                        help="Exportar el ledger de operaciones: console, db, archivo .csv o .parquet (repetible)")
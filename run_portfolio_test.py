@@ -1,9 +1,13 @@
 
 import smart_trend_strategy
+import download_scheduler
+import indicator_cache
+import portfolio_engine
+import instrumentation
 import pandas as pd
-import sys
+import argparse
 
-def run_portfolio():
+def run_portfolio(shared=False, capital=1000.0, max_positions=5, position_size=0.2, verbose=False):
     # Portfolio definition (Most Liquid & Volatile)
     cryptos = ['BTC-USD', 'ETH-USD', 'SOL-USD', 'XRP-USD', 'DOGE-USD', 'PEPE-USD', 'LINK-USD']
     stocks = ['NVDA', 'TSLA', 'AAPL', 'AMD', 'MSFT', 'AMZN', 'META', 'MSTR', 'COIN', 'SPY']
@@ -14,11 +18,26 @@ def run_portfolio():
     print("\n" + "🚀"*10 + " INICIANDO TEST DE PORTAFOLIO (3 MESES - SMART TREND) " + "🚀"*10)
     print("="*80)
 
+    # Fetch the whole universe up front (batched + concurrent, only missing bars),
+    # then every backtest runs on the preloaded frames.
+    # Using interval='1h' to allow >60 days history (yfinance restriction on 15m)
+    # period='90d' for 3 months
+    frames = download_scheduler.preload(all_assets, interval='1h', period='90d')
+
+    if shared:
+        # One account for all assets: common timeline (crypto 24/7, stocks in session),
+        # indicators for the whole panel at once, at most max_positions open at a time
+        panel, result = portfolio_engine.run_smart_trend_portfolio(
+            frames, leverage=5, initial_capital=capital, position_size=position_size, max_positions=max_positions)
+        portfolio_engine.print_report(result, "SMART TREND - CAPITAL COMPARTIDO (3 MESES)")
+        print(f"🧮 Cache de indicadores: {indicator_cache.CACHE}")
+        return result
+
     for ticker in all_assets:
         try:
-            # Using interval='1h' to allow >60 days history (yfinance restriction on 15m)
-            # period='90d' for 3 months
-            profit = smart_trend_strategy.run_smart_trend(ticker, interval='1h', leverage=5, period='90d')
+            # Silent by default: only the summary table below is printed
+            result = smart_trend_strategy.run_smart_trend(ticker, interval='1h', leverage=5, period='90d',
+                                                          df=frames[ticker], verbose=verbose)
             
             # Categorize
             asset_type = 'CRYPTO' if '-USD' in ticker else 'STOCK'
@@ -26,12 +45,13 @@ def run_portfolio():
             results.append({
                 'Ticker': ticker,
                 'Type': asset_type,
-                'Profit %': profit
+                'Trades': result.n_trades,
+                'Profit %': result.profit_pct
             })
             
         except Exception as e:
             print(f"❌ Error en {ticker}: {e}")
-            results.append({'Ticker': ticker, 'Type': 'ERROR', 'Profit %': -999})
+            results.append({'Ticker': ticker, 'Type': 'ERROR', 'Trades': 0, 'Profit %': -999})
 
     # Create DF and Sort
     df_results = pd.DataFrame(results)
@@ -41,7 +61,18 @@ def run_portfolio():
     print("🏆 RESULTADOS FINALES DEL PORTAFOLIO (3 MESES)")
     print("="*80)
     print(df_results.to_string(index=False))
+    print(f"🧮 Cache de indicadores: {indicator_cache.CACHE}")
     print("="*80 + "\n")
 
 if __name__ == "__main__":
-    run_portfolio()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--shared", action="store_true", help="Simular un único portafolio con capital compartido")
+    parser.add_argument("--capital", type=float, default=1000.0, help="Capital inicial del portafolio compartido")
+    parser.add_argument("--max-positions", type=int, default=5, help="Posiciones simultáneas (modo compartido)")
+    parser.add_argument("--position-size", type=float, default=0.2, help="Margen por posición como fracción del equity")
+    parser.add_argument("--verbose", action="store_true", help="Mostrar cada operación de cada activo (modo por activo)")
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args()
+
+    with instrumentation.cli_session(args, "portfolio"):
+        run_portfolio(args.shared, args.capital, args.max_positions, args.position_size, args.verbose)
@@ -1,160 +1,78 @@
 
-import yfinance as yf
 import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
 import argparse
+import bar_resampler
+import backtest_engine
+import result_sinks
+import instrumentation
+import indicator_cache
+import candle_patterns
 
 def calculate_indicators(df):
+    close = df['Close'].to_numpy()
+    version = indicator_cache.data_version(close)
+
     # RSI (14)
-    delta = df['Close'].diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-    rs = gain / loss
-    df['RSI'] = 100 - (100 / (1 + rs))
+    df['RSI'] = indicator_cache.compute('rsi', close, 14, version=version)
 
     # Bollinger Bands (20, 2)
-    df['BB_Mid'] = df['Close'].rolling(window=20).mean()
-    df['BB_Std'] = df['Close'].rolling(window=20).std()
-    df['BB_Upper'] = df['BB_Mid'] + (2 * df['BB_Std'])
-    df['BB_Lower'] = df['BB_Mid'] - (2 * df['BB_Std'])
+    df['BB_Mid'], df['BB_Upper'], df['BB_Lower'], df['BB_Std'] = indicator_cache.compute('bollinger', close, 20, 2, version=version)
     
     return df
 
 def detect_patterns(df):
-    # Detect Candle Patterns Manually
-    # Hammer / Shooting Star / Engulfing
-    
-    signals = []
-    
-    for i in range(2, len(df)):
-        curr = df.iloc[i]
-        prev = df.iloc[i-1]
-        
-        # Candle properties
-        body_size = abs(curr['Close'] - curr['Open'])
-        full_range = curr['High'] - curr['Low']
-        lower_wick = min(curr['Open'], curr['Close']) - curr['Low']
-        upper_wick = curr['High'] - max(curr['Open'], curr['Close'])
-        
-        is_bullish = curr['Close'] > curr['Open']
-        is_bearish = curr['Close'] < curr['Open']
-        prev_bearish = prev['Close'] < prev['Open']
-        prev_bullish = prev['Close'] > prev['Open']
-
-        signal = None
-        pattern_name = ""
-
-        # --- BULLISH PATTERNS (Strong Buy if at Low Band) ---
-        
-        # 1. Hammer (Long lower wick, small body at top)
-        if lower_wick > 2 * body_size and upper_wick < body_size:
-            pattern_name = "Hammer"
-        
-        # 2. Bullish Engulfing (Current bullish body engulfs previous bearish body)
-        elif is_bullish and prev_bearish and curr['Close'] > prev['Open'] and curr['Open'] < prev['Close']:
-            pattern_name = "Bullish Engulfing"
-
-        # Check Context: Price <= Lower Band AND RSI < 35
-        if pattern_name and curr['Low'] <= curr['BB_Lower'] * 1.002 and curr['RSI'] < 35:
-             signal = "BUY"
-
-        # --- BEARISH PATTERNS (Strong Sell if at High Band) ---
-        
-        if not signal:
-            pattern_name = ""
-            # 1. Shooting Star (Long upper wick, small body at bottom)
-            if upper_wick > 2 * body_size and lower_wick < body_size:
-                 pattern_name = "Shooting Star"
-            
-            # 2. Bearish Engulfing
-            elif is_bearish and prev_bullish and curr['Close'] < prev['Open'] and curr['Open'] > prev['Close']:
-                pattern_name = "Bearish Engulfing"
-
-            # Check Context: Price >= Upper Band AND RSI > 65
-            if pattern_name and curr['High'] >= curr['BB_Upper'] * 0.998 and curr['RSI'] > 65:
-                signal = "SELL"
-        
-        signals.append((df.index[i], signal, pattern_name, curr['Close']))
-
-    return signals
-
-def backtest_strategy(signals, initial_capital=100.0, df=None):
-    capital = initial_capital
-    position = 0.0 # Amount of asset
-    entry_price = 0.0
-    trades = []
-    
+    # Detect Candle Patterns (Hammer / Shooting Star / Engulfing) with Bollinger + RSI context.
+    # Vectorized in candle_patterns: whole-array masks instead of a df.iloc loop per bar.
+    return candle_patterns.detect_patterns(df)
+
+def backtest_strategy(signals, initial_capital=100.0, df=None, verbose=True, sinks=None, run='scalping'):
+    # signals: [(date, signal, pattern, price), ...] one record per bar, in order.
+    # BUY Logic: If no position, Buy All. SELL Logic: If position, Sell All.
+    dates = [record[0] for record in signals]
+    close = [record[3] for record in signals]
+    kinds = [record[1] for record in signals]
+
+    # Close Position at End with the very last candle of the period when the frame is passed
+    if df is not None and len(df) and (not dates or df.index[-1] != dates[-1]):
+        dates.append(df.index[-1])
+        close.append(df['Close'].iloc[-1])
+        kinds.append(None)
+
+    kinds = np.array(kinds, dtype=object)
+    result = backtest_engine.run_backtest(close, kinds == "BUY", kinds == "SELL", initial_capital=initial_capital,
+                                          index=pd.Index(dates))
+    if verbose:
+        print_trades(result)
+    result_sinks.emit(result, sinks, run)
+    return result
+
+def print_trades(result):
     print("\n" + "="*60)
-    print(f"💰 BACKTEST (Capital Inicial: ${initial_capital})")
+    print(f"💰 BACKTEST (Capital Inicial: ${result.initial_capital})")
     print("-" * 60)
     print(f"{'FECHA':<25} {'ACCIÓN':<10} {'PRECIO':<10} {'BALANCE':<10} {'P&L'}")
     print("-" * 60)
-    
-    for date, signal, pattern, price in signals:
-        current_price = price
-        
-        # BUY Logic: If no position, Buy All
-        if signal == "BUY" and position == 0:
-            position = capital / current_price
-            entry_price = current_price
-            capital = 0 # All in asset
-            print(f"{str(date):<25} 🟢 COMPRA   ${current_price:.2f}     en haberes   -")
-            trades.append({'date': date, 'type': 'BUY', 'price': current_price})
-            
-        # SELL Logic: If position, Sell All
-        elif signal == "SELL" and position > 0:
-            revenue = position * current_price
-            pnl_pct = ((current_price / entry_price) - 1) * 100
-            pnl_str = f"{pnl_pct:+.2f}%"
-            capital = revenue
-            position = 0
-            print(f"{str(date):<25} 🔴 VENTA    ${current_price:.2f}     ${capital:.2f}     {pnl_str}")
-            trades.append({'date': date, 'type': 'SELL', 'price': current_price, 'pnl': pnl_pct})
-
-    # Close Position at End if still holding
-    if position > 0:
-        # Use last available price from signals or dataframe if passed
-        # Since signals list has prices, we can use the last processed price or fetch simple last
-        final_price = signals[-1][3] if signals else df['Close'].iloc[-1]
-        
-        # If passed df, better use the very last candle of the period
-        if df is not None:
-             final_price = df['Close'].iloc[-1]
-             
-        revenue = position * final_price
-        pnl_pct = ((final_price / entry_price) - 1) * 100
-        pnl_str = f"{pnl_pct:+.2f}%"
-        capital = revenue
-        print(f"{'CIERRE FINAL':<25} ⚠️ CLOSE    ${final_price:.2f}     ${capital:.2f}     {pnl_str}")
-    
-    profit_total = capital - initial_capital
-    profit_pct = (profit_total / initial_capital) * 100
-    
+
+    dates = result.index
+    for k in range(result.n_trades):
+        print(f"{str(dates[result.entry_idx[k]]):<25} 🟢 COMPRA   ${result.entry_price[k]:.2f}     en haberes   -")
+
+        price = result.exit_price[k]
+        pnl_str = f"{((price / result.entry_price[k]) - 1) * 100:+.2f}%"
+        capital = result.capital_after[k]
+        if result.reason[k] == backtest_engine.EXIT:
+            print(f"{str(dates[result.exit_idx[k]]):<25} 🔴 VENTA    ${price:.2f}     ${capital:.2f}     {pnl_str}")
+        else:
+            print(f"{'CIERRE FINAL':<25} ⚠️ CLOSE    ${price:.2f}     ${capital:.2f}     {pnl_str}")
+
     print("-" * 60)
-    print(f"RESULTADO FINAL: ${capital:.2f} ({profit_pct:+.2f}%)")
+    print(f"RESULTADO FINAL: ${result.final_capital:.2f} ({result.profit_pct:+.2f}%)")
     print("="*60 + "\n")
 
-def run_scalping_tool(ticker, interval='15m'):
-    print(f"🔍 Analizando {ticker} en {interval}...")
-    
-    # Download extra data for indicators
-    df = yf.download(ticker, period='5d', interval=interval, progress=False)
-    
-    if isinstance(df.columns, pd.MultiIndex):
-        # Flatten MultiIndex if necessary, keeping just the ticker level or dropping it
-        try:
-            df.columns = df.columns.get_level_values(0)
-        except:
-            pass
-            
-    if len(df) < 50:
-        print("❌ No hay suficientes datos.")
-        return
-
-    df = calculate_indicators(df)
-    signals = detect_patterns(df)
-    
+@instrumentation.timed('chart.build')
+def build_chart(df, signals, title):
     # Plotting
     fig = go.Figure()
 
@@ -164,15 +82,8 @@ def run_scalping_tool(ticker, interval='15m'):
     fig.add_trace(go.Scatter(x=df.index, y=df['BB_Lower'], line=dict(color='gray', width=1, dash='dash'), name='BB Lower'))
 
     # Plot Signals
-    found_any = False
-    print("\n⚡ SEÑALES DETECTADAS (Últimos dias):")
-    print("-" * 60)
-    print(f"{'FECHA':<25} {'TIPO':<10} {'PATRÓN':<20} {'PRECIO'}")
-    print("-" * 60)
-
     for date, signal, pattern, price in signals:
         if signal:
-            found_any = True
             marker_symbol = 'triangle-up' if signal == 'BUY' else 'triangle-down'
             color = 'lime' if signal == 'BUY' else 'red'
             
@@ -184,28 +95,60 @@ def run_scalping_tool(ticker, interval='15m'):
                 textposition="bottom center" if signal == 'BUY' else "top center",
                 name=f"{signal} ({pattern})"
             ))
+
+    fig.update_layout(title=title, template='plotly_dark', height=800)
+    return fig
+
+def run_scalping_tool(ticker, interval='15m', start=None, end=None, sinks=None):
+    print(f"🔍 Analizando {ticker} en {interval}...")
+    
+    # Download extra data for indicators
+    df = bar_resampler.get_bars(ticker, interval, period='5d', start=start, end=end)
             
+    if len(df) < 50:
+        print("❌ No hay suficientes datos.")
+        return
+
+    df = calculate_indicators(df)
+    signals = detect_patterns(df)
+    
+    fig = build_chart(df, signals, f'Estrategia Scalping: {ticker} ({interval})')
+
+    # Print Signals
+    found_any = False
+    print("\n⚡ SEÑALES DETECTADAS (Últimos dias):")
+    print("-" * 60)
+    print(f"{'FECHA':<25} {'TIPO':<10} {'PATRÓN':<20} {'PRECIO'}")
+    print("-" * 60)
+
+    for date, signal, pattern, price in signals:
+        if signal:
+            found_any = True
             emoji = "🟢" if signal == "BUY" else "🔴"
             print(f"{str(date):<25} {emoji} {signal:<6} {pattern:<20} {price:.2f}")
 
     if not found_any:
         print("No se encontraron señales de alta probabilidad en el periodo analizado.")
     
-    fig.update_layout(title=f'Estrategia Scalping: {ticker} ({interval})', template='plotly_dark', height=800)
-    
     output_file = f"scalping_{ticker}_{interval}.html"
-    fig.write_html(output_file)
+    with instrumentation.stage('chart.write_html'):
+        fig.write_html(output_file)
     print("\n" + "=" * 60)
     print(f"📈 Gráfico guardado en: {output_file}")
     print("=" * 60 + "\n")
     
     # Run Backtest
-    backtest_strategy(signals, 100.0, df)
+    return backtest_strategy(signals, 100.0, df, sinks=sinks, run=f"scalping {ticker} {interval}")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("ticker", nargs="?", default="BTC-USD", help="Ticker symbol (e.g. BTC-USD, AMD)")
     parser.add_argument("--interval", default="15m", help="Timeframe (1m, 5m, 15m, 1h)")
+    parser.add_argument("--start", default=None, help="Inicio del rango (YYYY-MM-DD), usa el historial local")
+    parser.add_argument("--end", default=None, help="Fin del rango (YYYY-MM-DD)")
+    result_sinks.add_export_argument(parser)
+    instrumentation.add_arguments(parser)
     args = parser.parse_args()
     
-    run_scalping_tool(args.ticker, args.interval)
+    with instrumentation.cli_session(args, f"scalping {args.ticker}"):
+        run_scalping_tool(args.ticker, args.interval, args.start, args.end, result_sinks.from_specs(args.export))
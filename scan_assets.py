@@ -1,98 +1,114 @@
 
-import yfinance as yf
 import pandas as pd
 import numpy as np
+import bar_store
+import market_data
+import download_scheduler
+import indicators
 
 def calculate_atr(df, period=14):
-    high_low = df['High'] - df['Low']
-    high_close = np.abs(df['High'] - df['Close'].shift())
-    low_close = np.abs(df['Low'] - df['Close'].shift())
-    ranges = pd.concat([high_low, high_close, low_close], axis=1)
-    true_range = ranges.max(axis=1)
-    return true_range.rolling(window=period).mean()
+    atr = indicators.atr(df['High'].to_numpy(), df['Low'].to_numpy(), df['Close'].to_numpy(), period)
+    return pd.Series(atr, index=df.index)
 
-import sys
+import argparse
 
-def scan_market():
-    # Detectar modo por argumentos
-    mode = 'CRYPTO'
-    if len(sys.argv) > 1 and sys.argv[1].lower() == 'stocks':
-        mode = 'STOCKS'
+STOCK_TICKERS = ['NVDA', 'TSLA', 'AAPL', 'AMD', 'MSFT', 'AMZN', 'GOOGL', 'META', 'SPY', 'QQQ']
+CRYPTO_TICKERS = ['BTC-USD', 'ETH-USD', 'SOL-USD', 'BNB-USD', 'XRP-USD',
+                  'ADA-USD', 'DOGE-USD', 'AVAX-USD', 'LINK-USD']
 
-    if mode == 'STOCKS':
-        tickers = ['NVDA', 'TSLA', 'AAPL', 'AMD', 'MSFT', 'AMZN', 'GOOGL', 'META', 'SPY', 'QQQ']
-        suffix = "" # Stocks no usan sufijo en yfinance por defecto
+# The scan only looks at the last value of ATR(14), volume SMA(96) and SMA(50), so the
+# panel keeps the last PANEL_BARS bars of each symbol (right-aligned by position, shorter
+# histories NaN-padded on top): the same numbers as computing each symbol on its own.
+PANEL_BARS = 97
+MIN_BARS = 50
+RESULT_COLUMNS = ['Ticker', 'Precio', 'Volatilidad_15m (%)', 'Volumen_24h', 'Tendencia']
+
+def tail_panel(frames, tickers, bars=PANEL_BARS):
+    # {column: (bars x symbols) array} + number of stored bars per symbol.
+    # frames: {ticker: DataFrame or {column: array}} (bar store views work as-is)
+    columns = ['High', 'Low', 'Close', 'Volume']
+    cube = np.full((len(columns), bars, len(tickers)), np.nan)
+    lengths = np.zeros(len(tickers), dtype=int)
+    for j, ticker in enumerate(tickers):
+        df = frames.get(ticker)
+        if df is None or not len(df['Close']):
+            continue
+        lengths[j] = len(df['Close'])
+        rows = min(bars, lengths[j])
+        for k, col in enumerate(columns):
+            cube[k, bars - rows:, j] = np.asarray(df[col])[-rows:]
+    return dict(zip(columns, cube)), lengths
+
+def panel_metrics(panel, lengths):
+    # Whole universe at once: one 2D true range / ATR / volume / SMA pass, last row per symbol
+    close = panel['Close']
+    atr = indicators.atr(panel['High'], panel['Low'], close, 14)[-1]
+    avg_volume = indicators.sma(panel['Volume'], 96)[-1]
+    sma_50 = indicators.sma(close, 50)[-1]
+    price = close[-1]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        volatility_pct = atr / price * 100
+        trend = np.where(price > sma_50, "ALCISTA", "BAJISTA")
+    return lengths >= MIN_BARS, price, volatility_pct, avg_volume, trend
+
+def scan_universe(tickers, interval='15m', period='5d', chunk_size=250):
+    # Chunks of tickers are downloaded into the bar store and reduced to one row each before
+    # the next chunk is fetched. The panel reads the memory-mapped series directly (no
+    # DataFrames), so memory stays at one chunk's panel whatever the size of the universe.
+    requested = market_data.requested_start(period)
+    parts = []
+    for i in range(0, len(tickers), chunk_size):
+        chunk = tickers[i:i + chunk_size]
+        try:
+            download_scheduler.preload(chunk, interval, period=period, load=False)
+        except Exception as e:
+            print(f"Error descargando datos: {e}")
+            continue
+        views = {}
+        for ticker in chunk:
+            series = bar_store.open_series(ticker, interval)
+            if series is not None:
+                views[ticker] = series.slice(requested)[1]
+        ok, price, volatility_pct, avg_volume, trend = panel_metrics(*tail_panel(views, chunk))
+        parts.append(pd.DataFrame({
+            'Ticker': np.array(chunk)[ok],
+            'Precio': price[ok],
+            'Volatilidad_15m (%)': volatility_pct[ok],
+            'Volumen_24h': avg_volume[ok],
+            'Tendencia': trend[ok],
+        }))
+        if len(tickers) > chunk_size:
+            print(f"   {min(i + chunk_size, len(tickers))}/{len(tickers)} activos procesados")
+    return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=RESULT_COLUMNS)
+
+def load_universe(path):
+    # One ticker per line (or comma separated); '#' starts a comment
+    with open(path) as f:
+        text = f.read()
+    tickers = []
+    for line in text.splitlines():
+        tickers += [t.strip() for t in line.split('#')[0].split(',') if t.strip()]
+    return tickers
+
+def scan_market(mode='crypto', universe=None, chunk_size=250):
+    if mode == 'stocks':
+        tickers = STOCK_TICKERS
         print(f"📊 MODO: ACCIONES (Bolsa de Valores) - {len(tickers)} activos")
+    elif mode == 'universe':
+        tickers = load_universe(universe)
+        print(f"🌐 MODO: UNIVERSO ({universe}) - {len(tickers)} activos en bloques de {chunk_size}")
     else:
-        tickers = ['BTC-USD', 'ETH-USD', 'SOL-USD', 'BNB-USD', 'XRP-USD', 
-                   'ADA-USD', 'DOGE-USD', 'AVAX-USD', 'LINK-USD']
-        suffix = ""
+        tickers = CRYPTO_TICKERS
         print(f"🪙 MODO: CRIPTO - {len(tickers)} activos")
     
     print("⏳ Escaneando mercado (esto puede tardar unos segundos)...")
     
-    # Download data for all tickers at once for efficiency
-    try:
-        data = yf.download(tickers, period='5d', interval='15m', progress=False)
-    except Exception as e:
-        print(f"Error descargando datos: {e}")
+    # Only missing bars are downloaded (rest from the local cache); all metrics on 2D panels
+    results_df = scan_universe(tickers, '15m', '5d', chunk_size)
+    if results_df.empty:
+        print("⚠️ Sin datos suficientes para el ranking")
         return
 
-    results = []
-
-    for ticker in tickers:
-        try:
-            # Extract data for specific ticker
-            # yfinance returns MultiIndex if multiple tickers. 
-            # Structure: data['Close'][ticker] or data.xs(ticker, level=1, axis=1)
-            
-            if isinstance(data.columns, pd.MultiIndex):
-                df = pd.DataFrame({
-                    'Open': data['Open'][ticker],
-                    'High': data['High'][ticker],
-                    'Low': data['Low'][ticker],
-                    'Close': data['Close'][ticker],
-                    'Volume': data['Volume'][ticker]
-                })
-            else:
-                # Should not happen with multiple tickers, but fallback
-                df = data.copy()
-
-            df.dropna(inplace=True)
-            
-            if len(df) < 50:
-                continue
-
-            # Calculate ATR (Volatility)
-            df['ATR'] = calculate_atr(df)
-            current_atr = df['ATR'].iloc[-1]
-            current_price = df['Close'].iloc[-1]
-            
-            # Volatility in % (better for comparison)
-            volatility_pct = (current_atr / current_price) * 100
-            
-            # Volume (Average last 24h ~ 96 periods of 15m)
-            avg_volume = df['Volume'].rolling(window=96).mean().iloc[-1]
-            
-            # Trend (Price vs SMA 50)
-            sma_50 = df['Close'].rolling(window=50).mean().iloc[-1]
-            trend = "ALCISTA" if current_price > sma_50 else "BAJISTA"
-            
-            results.append({
-                'Ticker': ticker,
-                'Precio': current_price,
-                'Volatilidad_15m (%)': volatility_pct,
-                'Volumen_24h': avg_volume,
-                'Tendencia': trend
-            })
-            
-        except Exception as e:
-            print(f"Error procesando {ticker}: {e}")
-            continue
-
-    # Create DataFrame for results
-    results_df = pd.DataFrame(results)
-    
     # Ranking for Scalping (High Volatility is good)
     scalping_df = results_df.sort_values(by='Volatilidad_15m (%)', ascending=False).reset_index(drop=True)
     
@@ -100,6 +116,9 @@ def scan_market():
     # Simple heuristic: Volume is key for day trading liquidity.
     daytrading_df = results_df.sort_values(by='Volumen_24h', ascending=False).reset_index(drop=True)
 
+    print_rankings(scalping_df, daytrading_df)
+
+def print_rankings(scalping_df, daytrading_df):
     print("\n" + "="*60)
     print("🚀 MEJORES ACTIVOS PARA SCALPING (Mayor Volatilidad)")
     print("="*60)
@@ -112,4 +131,12 @@ def scan_market():
     print("="*60 + "\n")
 
 if __name__ == "__main__":
-    scan_market()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("mode", nargs="?", default="crypto", type=str.lower, choices=['crypto', 'stocks', 'universe'],
+                        help="crypto, stocks o universe (lista de tickers en --file)")
+    parser.add_argument("--file", default=None, help="Archivo con el universo de tickers (uno por línea o separados por comas)")
+    parser.add_argument("--chunk", type=int, default=250, help="Tickers por bloque de descarga en modo universe")
+    args = parser.parse_args()
+    if args.mode == 'universe' and not args.file:
+        parser.error("el modo universe necesita --file")
+    scan_market(args.mode, args.file, args.chunk)
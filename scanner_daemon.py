@@ -0,0 +1,242 @@
+import sys
+import json
+import time
+import bisect
+import shutil
+import asyncio
+import tempfile
+import argparse
+
+import numpy as np
+import pandas as pd
+import bar_store
+import download_scheduler
+import indicators
+import instrumentation
+import synthetic_data
+import scan_assets
+import live_signals
+
+# Long-running version of scan_assets: instead of downloading 5 days of bars and recomputing
+# ATR / 96-bar volume / SMA 50 for every ticker on each run, every symbol keeps streaming
+# indicators (indicators.ATR / SMA, O(1) per bar) and the two rankings are kept sorted as
+# bars arrive, so the current top-k can be read at any time without a rescan:
+#   scalping   -> ATR(14) / price in %, highest first
+#   daytrading -> average volume of the last 96 bars (~24h of 15m), highest first
+# Bars come from the same feeds as live_signals (PollingFeed live, ReplayFeed for stored
+# bars). Rankings match scan_market() on the same bars.
+
+MIN_BARS = 50   # same minimum history as scan_market()
+
+
+class Ranking:
+    # Symbols sorted by score (highest first). Every update moves one symbol: the old entry
+    # is found by bisection and the new one inserted with insort, so top(k) is a plain slice.
+
+    def __init__(self):
+        self.order = []     # [(-score, symbol)]
+        self.scores = {}
+
+    def update(self, symbol, score):
+        old = self.scores.pop(symbol, None)
+        if old is not None:
+            i = bisect.bisect_left(self.order, (-old, symbol))
+            del self.order[i]
+        if not np.isnan(score):
+            self.scores[symbol] = score
+            bisect.insort(self.order, (-score, symbol))
+
+    def remove(self, symbol):
+        self.update(symbol, np.nan)
+
+    def top(self, k=None):
+        return [(symbol, -neg) for neg, symbol in self.order[:k]]
+
+    def rank(self, symbol):
+        # 1-based position, None if the symbol isn't ranked
+        score = self.scores.get(symbol)
+        if score is None:
+            return None
+        return bisect.bisect_left(self.order, (-score, symbol)) + 1
+
+    def __len__(self):
+        return len(self.order)
+
+
+class SymbolScan:
+
+    def __init__(self, atr_period=14, volume_window=96, trend_window=50):
+        self.atr = indicators.ATR(atr_period)
+        self.volume = indicators.SMA(volume_window)
+        self.trend = indicators.SMA(trend_window)
+        self.price = np.nan
+        self.time = None
+        self.bars = 0
+
+    def update(self, bar):
+        self.atr.update(bar.high, bar.low, bar.close)
+        self.volume.update(bar.volume)
+        self.trend.update(bar.close)
+        self.price = bar.close
+        self.time = bar.time
+        self.bars += 1
+
+    @property
+    def volatility_pct(self):
+        return self.atr.value / self.price * 100
+
+    @property
+    def trend_label(self):
+        return "ALCISTA" if self.price > self.trend.value else "BAJISTA"
+
+    def row(self, symbol):
+        return {'Ticker': symbol, 'Precio': self.price, 'Volatilidad_15m (%)': self.volatility_pct,
+                'Volumen_24h': self.volume.value, 'Tendencia': self.trend_label}
+
+
+class Scanner:
+
+    def __init__(self, **scan_params):
+        self.scan_params = scan_params
+        self.symbols = {}
+        self.scalping = Ranking()
+        self.daytrading = Ranking()
+        self.bars = 0
+
+    def update(self, bar):
+        state = self.symbols.get(bar.symbol)
+        if state is None:
+            state = self.symbols[bar.symbol] = SymbolScan(**self.scan_params)
+        state.update(bar)
+        self.bars += 1
+        instrumentation.count('scanner_bars')
+        if state.bars >= MIN_BARS:
+            self.scalping.update(bar.symbol, state.volatility_pct)
+            self.daytrading.update(bar.symbol, state.volume.value)
+
+    def warmup(self, frames):
+        for symbol, df in frames.items():
+            for row in df[['Open', 'High', 'Low', 'Close', 'Volume']].itertuples():
+                self.update(live_signals.Bar(symbol, *row))
+
+    def remove(self, symbol):
+        self.symbols.pop(symbol, None)
+        self.scalping.remove(symbol)
+        self.daytrading.remove(symbol)
+
+    def _frame(self, ranking, k):
+        return pd.DataFrame([self.symbols[symbol].row(symbol) for symbol, _ in ranking.top(k)],
+                            columns=['Ticker', 'Precio', 'Volatilidad_15m (%)', 'Volumen_24h', 'Tendencia'])
+
+    def rankings(self, k=5):
+        # (scalping_df, daytrading_df), same columns as scan_market()
+        return self._frame(self.scalping, k), self._frame(self.daytrading, k)
+
+    def snapshot(self, k=None):
+        scalping_df, daytrading_df = self.rankings(k)
+        return {
+            'updated': pd.Timestamp.now(tz='UTC').isoformat(),
+            'bars': self.bars,
+            'scalping': json.loads(scalping_df.to_json(orient='records')),
+            'daytrading': json.loads(daytrading_df.to_json(orient='records')),
+        }
+
+    async def run(self, feed):
+        async for bar in feed:
+            self.update(bar)
+
+
+# ------------------------
+# CLI
+# ------------------------
+
+def report(scanner, top=5, output=None):
+    scalping_df, daytrading_df = scanner.rankings(top)
+    print(f"\n🕒 {pd.Timestamp.now(tz='UTC'):%Y-%m-%d %H:%M:%S} UTC | {len(scanner.scalping)} activos en ranking")
+    scan_assets.print_rankings(scalping_df, daytrading_df)
+    if output:
+        # Written to a temp file first so readers never see half a snapshot
+        tmp = output + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(scanner.snapshot(), f, indent=2)
+        shutil.move(tmp, output)
+
+
+async def _reporter(scanner, every, top, output):
+    while True:
+        await asyncio.sleep(every)
+        report(scanner, top, output)
+
+
+async def run_daemon(tickers, interval='15m', poll_seconds=30.0, every=60.0, top=5, output=None):
+    feed = live_signals.PollingFeed(tickers, interval, poll_seconds)
+    # Closed bars only: the forming candle is processed once it closes
+    frames = feed.closed(download_scheduler.preload(tickers, interval, period='5d'))
+    scanner = Scanner()
+    scanner.warmup(frames)
+    report(scanner, top, output)
+
+    feed.seed(frames)
+    print(f"📡 Escáner activo: {len(tickers)} activos en {interval} (poll cada {poll_seconds:.0f}s)")
+    reporter = asyncio.create_task(_reporter(scanner, every, top, output))
+    try:
+        await scanner.run(feed)
+    finally:
+        reporter.cancel()
+
+
+async def run_replay(tickers, interval='15m', start=None, end=None, top=5, output=None):
+    scanner = Scanner()
+    t0 = time.perf_counter()
+    await scanner.run(live_signals.ReplayFeed(tickers, interval, start, end))
+    elapsed = time.perf_counter() - t0
+    print(f"⏱️ {scanner.bars} velas de {len(scanner.symbols)} activos en {elapsed:.2f}s "
+          f"({scanner.bars / max(elapsed, 1e-9):,.0f} velas/s)")
+    report(scanner, top, output)
+    return scanner
+
+
+def benchmark(n_symbols=500, bars=2000, interval='15m'):
+    # Replay of a synthetic universe through a temporary bar store
+    cache_dir = bar_store.CACHE_DIR
+    bar_store.CACHE_DIR = tempfile.mkdtemp()
+    try:
+        symbols = [f'SYN{i:03d}' for i in range(n_symbols)]
+        for i, symbol in enumerate(symbols):
+            bar_store.write_bars(symbol, interval, synthetic_data.regime_bars(bars, i, interval=interval))
+        asyncio.run(run_replay(symbols, interval))
+    finally:
+        shutil.rmtree(bar_store.CACHE_DIR, ignore_errors=True)
+        bar_store.CACHE_DIR = cache_dir
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("mode", nargs="?", default="crypto", help="crypto, stocks, benchmark o lista de tickers separados por comas")
+    parser.add_argument("--interval", default="15m", help="Timeframe")
+    parser.add_argument("--poll", type=float, default=30.0, help="Segundos entre consultas de velas nuevas")
+    parser.add_argument("--every", type=float, default=60.0, help="Segundos entre impresiones del ranking")
+    parser.add_argument("--top", type=int, default=5, help="Activos por ranking")
+    parser.add_argument("--output", default=None, help="Archivo JSON con el ranking actual (se reescribe en cada impresión)")
+    parser.add_argument("--replay", action="store_true", help="Reproducir las velas guardadas en vez de escuchar en vivo")
+    parser.add_argument("--start", default=None, help="Inicio del replay (YYYY-MM-DD)")
+    parser.add_argument("--end", default=None, help="Fin del replay (YYYY-MM-DD)")
+    args = parser.parse_args()
+
+    if args.mode == 'benchmark':
+        benchmark(interval=args.interval)
+        sys.exit(0)
+    if args.mode.lower() == 'stocks':
+        tickers = scan_assets.STOCK_TICKERS
+    elif args.mode.lower() == 'crypto':
+        tickers = scan_assets.CRYPTO_TICKERS
+    else:
+        tickers = args.mode.split(',')
+
+    if args.replay:
+        asyncio.run(run_replay(tickers, args.interval, args.start, args.end, args.top, args.output))
+    else:
+        try:
+            asyncio.run(run_daemon(tickers, args.interval, args.poll, args.every, args.top, args.output))
+        except KeyboardInterrupt:
+            print("\n👋 Escáner detenido")
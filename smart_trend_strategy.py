@@ -1,39 +1,34 @@
 
-import yfinance as yf
 import pandas as pd
 import numpy as np
 import argparse
+import bar_resampler
+import backtest_engine
+import robustness
+import result_sinks
+import instrumentation
+import indicator_cache
 
 def calculate_indicators(df):
+    close = df['Close'].to_numpy()
+    version = indicator_cache.data_version(close)
+
     # EMA 50
-    df['EMA_50'] = df['Close'].ewm(span=50, adjust=False).mean()
+    df['EMA_50'] = indicator_cache.compute('ema', close, 50, version=version)
     
     # RSI 14
-    delta = df['Close'].diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-    rs = gain / loss
-    df['RSI'] = 100 - (100 / (1 + rs))
+    df['RSI'] = indicator_cache.compute('rsi', close, 14, version=version)
     
     return df
 
-def backtest_smart_trend(df, initial_capital=100.0, leverage=5):
-    capital = initial_capital
-    position = 0.0
-    entry_price = 0.0
-    stop_loss = 0.0
-    take_profit = 0.0
-    
-    trades = []
-    in_trade = False
-    
-    print("\n" + "="*75)
-    print(f"🧠 SMART TREND STRATEGY (Leverage {leverage}x) - Capital: ${initial_capital}")
-    print(f"Goal: Trend Following (EMA 50) + Dip Buying (RSI 40-50)")
-    print("-" * 75)
-    print(f"{'FECHA':<25} {'ACCIÓN':<10} {'PRECIO':<10} {'BALANCE':<10} {'P&L (REAL)'}")
-    print("-" * 75)
+def smart_trend_signals(close, ema, rsi, rsi_low=35, rsi_high=55):
+    # ENTRY Condition: UPTREND (Price > EMA) + PULLBACK (40 < RSI < 55)
+    # We widen the range slightly to 55 to catch shallow dips incase trend is strong
+    with np.errstate(invalid='ignore'):
+        return (close > ema) & (rsi < rsi_high) & (rsi > rsi_low)
 
+def backtest_smart_trend(df, initial_capital=100.0, leverage=5, montecarlo=0, verbose=True, sinks=None,
+                         run='smart_trend'):
     # Strategy Parameters
     # Buy Dip: Price > EMA 50 AND RSI < 50 AND RSI > 40
     # TP: 1.5% asset move
@@ -41,73 +36,51 @@ def backtest_smart_trend(df, initial_capital=100.0, leverage=5):
     
     tp_pct = 0.015
     sl_pct = 0.0075
-    
-    for i in range(50, len(df)):
-        curr = df.iloc[i]
-        date = df.index[i]
-        price = curr['Close']
-        ema = curr['EMA_50']
-        rsi = curr['RSI']
-        
-        # ------------------------
-        # TRADE MANAGEMENT (Exit)
-        # ------------------------
-        if in_trade:
-            # Check Take Profit
-            if price >= take_profit:
-                # Calculate PnL
-                asset_pnl = (price - entry_price) / entry_price
-                real_pnl = asset_pnl * leverage
-                
-                capital = capital * (1 + real_pnl)
-                position = 0
-                in_trade = False
-                print(f"{str(date):<25} 🟢 TAKE PROFIT ${price:.2f}     ${capital:.2f}     {real_pnl*100:+.2f}%")
-                trades.append({'date': date, 'type': 'SELL', 'price': price, 'pnl': real_pnl*100})
-            
-            # Check Stop Loss
-            elif price <= stop_loss:
-                asset_pnl = (price - entry_price) / entry_price
-                real_pnl = asset_pnl * leverage
-                
-                capital = capital * (1 + real_pnl)
-                position = 0
-                in_trade = False
-                print(f"{str(date):<25} 🔴 STOP LOSS  ${price:.2f}     ${capital:.2f}     {real_pnl*100:+.2f}%")
-                trades.append({'date': date, 'type': 'SELL', 'price': price, 'pnl': real_pnl*100})
 
-            if capital <= 10:
-                print(f"\n❌ CUENTA LIQUIDADA (Balance < $10).")
-                break
+    close = df['Close'].to_numpy()
+    entries = smart_trend_signals(close, df['EMA_50'].to_numpy(), df['RSI'].to_numpy())
+    result = backtest_engine.run_backtest(close, entries, start=50, tp_pct=tp_pct, sl_pct=sl_pct,
+                                          leverage=leverage, initial_capital=initial_capital,
+                                          liquidation_level=10, index=df.index)
+    if verbose:
+        print_trades(df, result, leverage)
+    result_sinks.emit(result, sinks, run)
 
-        # ------------------------
-        # TRADE ENTRY (Signal)
-        # ------------------------
+    if montecarlo:
+        # Same ledger in thousands of alternative orders / samples / fills
+        summary = robustness.analyze_result(result, montecarlo, leverage=leverage, liquidation_level=10)
+        robustness.print_report(summary, montecarlo, initial_capital)
+    return result
+
+def print_trades(df, result, leverage):
+    initial_capital = result.initial_capital
+    print("\n" + "="*75)
+    print(f"🧠 SMART TREND STRATEGY (Leverage {leverage}x) - Capital: ${initial_capital}")
+    print(f"Goal: Trend Following (EMA 50) + Dip Buying (RSI 40-50)")
+    print("-" * 75)
+    print(f"{'FECHA':<25} {'ACCIÓN':<10} {'PRECIO':<10} {'BALANCE':<10} {'P&L (REAL)'}")
+    print("-" * 75)
+
+    dates = df.index
+    for k in range(result.n_trades):
+        date = dates[result.entry_idx[k]]
+        print(f"{str(date):<25} ⚡ BUY (Dip)  ${result.entry_price[k]:.2f}     SL:${result.sl_level[k]:.2f} TP:${result.tp_level[k]:.2f}")
+
+        date, price = dates[result.exit_idx[k]], result.exit_price[k]
+        capital, real_pnl = result.capital_after[k], result.pnl[k]
+        if result.reason[k] == backtest_engine.TP:
+            print(f"{str(date):<25} 🟢 TAKE PROFIT ${price:.2f}     ${capital:.2f}     {real_pnl*100:+.2f}%")
+        elif result.reason[k] == backtest_engine.SL:
+            print(f"{str(date):<25} 🔴 STOP LOSS  ${price:.2f}     ${capital:.2f}     {real_pnl*100:+.2f}%")
         else:
-            # ENTRY Condition: UPTREND (Price > EMA) + PULLBACK (40 < RSI < 55)
-            # We widen the range slightly to 55 to catch shallow dips incase trend is strong
-            if price > ema and rsi < 55 and rsi > 35:
-                entry_price = price
-                # Calculate dynamic TP/SL
-                take_profit = entry_price * (1 + tp_pct)
-                stop_loss = entry_price * (1 - sl_pct)
-                
-                position = 1 
-                in_trade = True
-                
-                print(f"{str(date):<25} ⚡ BUY (Dip)  ${price:.2f}     SL:${stop_loss:.2f} TP:${take_profit:.2f}")
-                trades.append({'date': date, 'type': 'BUY', 'price': price})
+            # Close Position at End
+            print(f"{'CIERRE FINAL':<25} ⚠️ CLOSE      ${price:.2f}     ${capital:.2f}     {real_pnl*100:+.2f}%")
 
-    # Close Position at End
-    if in_trade:
-        final_price = df['Close'].iloc[-1]
-        asset_pnl = (final_price - entry_price) / entry_price
-        real_pnl = asset_pnl * leverage
-        capital = capital * (1 + real_pnl)
-        print(f"{'CIERRE FINAL':<25} ⚠️ CLOSE      ${final_price:.2f}     ${capital:.2f}     {real_pnl*100:+.2f}%")
+    if result.liquidated:
+        print(f"\n❌ CUENTA LIQUIDADA (Balance < $10).")
 
-    profit_total = capital - initial_capital
-    profit_pct = (profit_total / initial_capital) * 100
+    capital = result.final_capital
+    profit_pct = result.profit_pct
     
     print("-" * 75)
     print(f"RESULTADO FINAL: ${capital:.2f} ({profit_pct:+.2f}%)")
@@ -122,30 +95,34 @@ def backtest_smart_trend(df, initial_capital=100.0, leverage=5):
         print("Periodo demasiado corto para calcular promedio diario.")
         
     print("="*75 + "\n")
-    return profit_pct
 
-def run_smart_trend(ticker, interval='15m', leverage=5, period='30d'):
-    print(f"🔍 Analizando Estrategia SMART TREND para {ticker} en {interval} ({period}) con {leverage}x Apalancamiento...")
+def run_smart_trend(ticker, interval='15m', leverage=5, period='30d', start=None, end=None, df=None, montecarlo=0,
+                    verbose=True, sinks=None):
+    if verbose:
+        print(f"🔍 Analizando Estrategia SMART TREND para {ticker} en {interval} ({period}) con {leverage}x Apalancamiento...")
     
     # 60 days of 15m data is heavy, yfinance allows max 60 days for 15m.
     # Let's try 30 days to be safe and fast.
-    df = yf.download(ticker, period=period, interval=interval, progress=False)
-    
-    if isinstance(df.columns, pd.MultiIndex):
-        try:
-            df.columns = df.columns.get_level_values(0)
-        except:
-            pass
-            
-    df.dropna(inplace=True)
+    # start/end slice the local bar store, so long histories only load the requested range.
+    # Callers that already preloaded the bars (portfolio runner) pass them in via df.
+    if df is None:
+        df = bar_resampler.get_bars(ticker, interval, period=period, start=start, end=end)
     df = calculate_indicators(df)
-    return backtest_smart_trend(df, 100.0, leverage)
+    return backtest_smart_trend(df, 100.0, leverage, montecarlo, verbose, sinks, f"smart_trend {ticker} {interval}")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("ticker", nargs="?", default="BTC-USD", help="Ticker")
     parser.add_argument("--interval", default="15m", help="Timeframe (15m, 1h)")
     parser.add_argument("--leverage", type=int, default=5, help="Leverage multiplier")
+    parser.add_argument("--start", default=None, help="Inicio del rango (YYYY-MM-DD), usa el historial local")
+    parser.add_argument("--end", default=None, help="Fin del rango (YYYY-MM-DD)")
+    parser.add_argument("--montecarlo", type=int, nargs="?", const=10000, default=0,
+                        help="Simulaciones Monte Carlo sobre el resultado (por defecto 10000)")
+    result_sinks.add_export_argument(parser)
+    instrumentation.add_arguments(parser)
     args = parser.parse_args()
     
-    run_smart_trend(args.ticker, args.interval, args.leverage)
+    with instrumentation.cli_session(args, f"smart_trend {args.ticker}"):
+        run_smart_trend(args.ticker, args.interval, args.leverage, start=args.start, end=args.end, montecarlo=args.montecarlo,
+                        sinks=result_sinks.from_specs(args.export))
@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+
+# Synthetic OHLCV bars for benchmarks and offline tests.
+# Close follows a geometric Brownian motion; Open is the previous close plus a small gap,
+# High/Low wrap Open/Close with a random wick, Volume is lognormal. Same seed -> same bars.
+# regime_bars() adds Markov regime switches (bull / bear / chop with their own drift,
+# volatility and volume) and volume that rises with the size of the move.
+
+INTERVAL_FREQ = {'1m': '1min', '5m': '5min', '15m': '15min', '30m': '30min', '1h': '1h', '4h': '4h', '1d': '1D'}
+
+# name: (log drift per 1h bar, volatility per 1h bar, volume multiplier)
+# Drifts cancel out on average so very long series (10M bars) don't run off to 0 or infinity.
+REGIMES = {
+    'bull': (0.0003, 0.008, 1.0),
+    'bear': (-0.0003, 0.014, 1.6),
+    'chop': (0.0, 0.005, 0.7),
+}
+
+
+def gbm_close(n, seed=0, mu=0.0, sigma=0.01, start_price=100.0):
+    rng = np.random.default_rng(seed)
+    # dS/S = mu dt + sigma dW, one step per bar (mu / sigma are per-bar values)
+    log_ret = (mu - 0.5 * sigma ** 2) + sigma * rng.standard_normal(n)
+    return start_price * np.exp(np.cumsum(log_ret))
+
+
+def gbm_bars(n, seed=0, mu=0.0, sigma=0.01, start_price=100.0, interval='1h', end=None):
+    rng = np.random.default_rng(seed + 1_000_003)
+    close = gbm_close(n, seed, mu, sigma, start_price)
+    return _frame(close, sigma, rng, start_price, None, interval, end)
+
+
+def _frame(close, sigma, rng, start_price, volume, interval, end):
+    # OHLCV frame around a close path; sigma may be a scalar or one value per bar
+    n = len(close)
+    open_ = np.r_[start_price, close[:-1]] * (1 + rng.normal(0, sigma / 4, n))
+    wick = np.abs(rng.normal(0, sigma / 2, (2, n)))
+    high = np.maximum(open_, close) * (1 + wick[0])
+    low = np.minimum(open_, close) * (1 - wick[1])
+    if volume is None:
+        volume = np.round(rng.lognormal(8, 0.5, n))
+
+    freq = INTERVAL_FREQ.get(interval, interval)
+    end = pd.Timestamp.now(tz='UTC').floor(freq) if end is None else pd.Timestamp(end)
+    index = pd.date_range(end=end, periods=n, freq=freq)
+    return pd.DataFrame({'Open': open_, 'High': high, 'Low': low, 'Close': close, 'Volume': volume},
+                        index=index)
+
+
+def regime_path(n, seed=0, regimes=REGIMES, mean_duration=500):
+    # Regime id per bar: run lengths are geometric with mean `mean_duration`, each switch
+    # jumps to one of the other regimes at random
+    rng = np.random.default_rng(seed + 2_000_003)
+    n_regimes = len(regimes)
+    runs = []
+    total = 0
+    while total < n:
+        durations = rng.geometric(1 / mean_duration, size=n // mean_duration + 16)
+        runs.append(durations)
+        total += durations.sum()
+    durations = np.concatenate(runs)
+    states = (rng.integers(n_regimes) + np.r_[0, np.cumsum(rng.integers(1, n_regimes, len(durations) - 1))]) % n_regimes
+    return np.repeat(states, durations)[:n]
+
+
+def regime_bars(n, seed=0, start_price=100.0, interval='1h', end=None, regimes=REGIMES, mean_duration=500):
+    # GBM whose drift / volatility / volume switch with the regime; volume also grows with |move|.
+    # Regime parameters are per 1h bar and get rescaled to the bar size (drift ~ t, vol ~ sqrt(t)).
+    rng = np.random.default_rng(seed)
+    hours = pd.Timedelta(INTERVAL_FREQ.get(interval, interval)) / pd.Timedelta('1h')
+    table = np.array(list(regimes.values()), dtype='float64') * [hours, np.sqrt(hours), 1.0]
+    regime = regime_path(n, seed, regimes, mean_duration)
+    mu, sigma, volume_mult = table[regime].T
+    shock = rng.standard_normal(n)
+    close = start_price * np.exp(np.cumsum(mu + sigma * shock))
+    volume = np.round(rng.lognormal(8, 0.5, n) * volume_mult * (1 + np.abs(shock)))
+    return _frame(close, sigma, rng, start_price, volume, interval, end)
+
+
+def universe(n_symbols, n_bars, seed=0, interval='1h', sigma=0.01):
+    # {SYN000: frame, SYN001: frame, ...} with different seeds and slightly different volatility
+    return {f'SYN{i:03d}': gbm_bars(n_bars, seed + i, sigma=sigma * (0.5 + (i % 4) / 4), interval=interval)
+            for i in range(n_symbols)}
+
+
+def stock_hours(df, open_minutes=9 * 60 + 30, close_minutes=16 * 60, tz='America/New_York'):
+    # Keep only regular-session bars (Mon-Fri, 09:30-16:00 New York), like a stock feed
+    local = df.index.tz_convert(tz)
+    minutes = local.hour * 60 + local.minute
+    keep = (local.dayofweek < 5) & (minutes >= open_minutes) & (minutes < close_minutes)
+    return df[keep]
@@ -0,0 +1,212 @@
+import os
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+from psycopg2.extras import execute_values
+import bar_resampler
+import db
+import instrumentation
+import optimizer_db
+import parallel_optimizer
+import synthetic_data
+
+# Walk-forward optimization of the SMA crossover.
+# History is split into train/test folds (rolling: fixed-size train window that slides;
+# anchored: train always starts at the first bar). Each fold picks the best (fast, slow) pair
+# on its train window with the batched grid of optimizer_db and is then scored out-of-sample
+# on the following test window.
+#
+# SMAs are causal, so the full-history SMA matrices are computed once and every fold just
+# slices them; the close series and both matrices live in shared memory and the folds run in
+# a process pool. Results are stored per fold in optimization_logs.
+
+FAST_WINDOWS = list(range(2, 60))
+SLOW_WINDOWS = list(range(20, 200, 2))
+
+FOLD_COLUMNS = {
+    'study': 'TEXT',
+    'fold': 'INTEGER',
+    'train_start': 'TIMESTAMPTZ',
+    'train_end': 'TIMESTAMPTZ',
+    'test_start': 'TIMESTAMPTZ',
+    'test_end': 'TIMESTAMPTZ',
+    'train_return': 'DOUBLE PRECISION',
+}
+
+
+def make_folds(n, train_size, test_size, step=None, anchored=False):
+    # [(train_start, train_end, test_start, test_end)] as bar positions, end exclusive.
+    # The last test window may be shorter than test_size. Test windows never overlap, so the
+    # out-of-sample returns of consecutive folds can be compounded.
+    step = step or test_size
+    if step < test_size:
+        raise ValueError(f"step ({step}) < test_size ({test_size}): las ventanas de test se solaparían")
+    folds = []
+    test_start = train_size
+    while test_start < n:
+        train_start = 0 if anchored else test_start - train_size
+        folds.append((train_start, test_start, test_start, min(test_start + test_size, n)))
+        test_start += step
+    return folds
+
+
+def _best_pair(surface, fast_windows, slow_windows):
+    valid = np.array(fast_windows)[:, None] < np.array(slow_windows)[None, :]
+    masked = np.where(valid & ~np.isnan(surface), surface, -np.inf)
+    return np.unravel_index(np.argmax(masked), masked.shape)
+
+
+_ARRAYS = {}
+
+
+def _init_worker(layout):
+    _ARRAYS.update(parallel_optimizer.attach_arrays(layout))
+
+
+def evaluate_fold(fold, fast_windows, slow_windows, arrays=None):
+    arrays = arrays or _ARRAYS
+    close, fast, slow = arrays['close'], arrays['fast'], arrays['slow']
+    train_start, train_end, test_start, test_end = fold
+
+    # In-sample: every pair on the train window
+    surface = optimizer_db.sma_grid_surface(close[train_start:train_end], fast[:, train_start:train_end],
+                                            slow[:, train_start:train_end], max_bytes=10_000_000)
+    i, j = _best_pair(surface, fast_windows, slow_windows)
+
+    # Out-of-sample: the chosen pair on the test window. Starts one bar early so the position
+    # held at the last train close earns the first test bar's return.
+    lo = test_start - 1
+    test_return = optimizer_db.sma_grid_surface(close[lo:test_end], fast[i:i + 1, lo:test_end],
+                                                slow[j:j + 1, lo:test_end])[0, 0]
+    return {
+        'train_start': train_start, 'train_end': train_end,
+        'test_start': test_start, 'test_end': test_end,
+        'best_fast': fast_windows[i], 'best_slow': slow_windows[j],
+        'train_return': surface[i, j], 'test_return': test_return,
+        'buy_hold': close[test_end - 1] / close[lo],
+    }
+
+
+def walk_forward(df, train_size, test_size, step=None, anchored=False,
+                 fast_windows=FAST_WINDOWS, slow_windows=SLOW_WINDOWS, max_workers=None):
+    close = df['Close'].to_numpy(dtype='float64')
+    folds = make_folds(len(close), train_size, test_size, step, anchored)
+    if not folds:
+        return pd.DataFrame()
+
+    arrays = {
+        'close': close,
+        'fast': optimizer_db.sma_matrix(close, fast_windows),
+        'slow': optimizer_db.sma_matrix(close, slow_windows),
+    }
+    rows = []
+    with parallel_optimizer.SharedArrays(arrays) as shared:
+        with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count(), initializer=_init_worker,
+                                 initargs=(shared.layout,)) as pool:
+            futures = {pool.submit(evaluate_fold, fold, fast_windows, slow_windows): k
+                       for k, fold in enumerate(folds)}
+            for future in as_completed(futures):
+                rows.append({'fold': futures[future], **future.result()})
+
+    result = pd.DataFrame(rows).sort_values('fold', ignore_index=True)
+    # Bar positions -> timestamps (end dates are the last bar inside the window)
+    index = df.index
+    for col in ('train_start', 'test_start'):
+        result[col] = index[result[col].to_numpy()]
+    for col in ('train_end', 'test_end'):
+        result[col] = index[result[col].to_numpy() - 1]
+    return result
+
+
+def migrar_tabla():
+    # One-time migration: adds the fold columns to optimization_logs. The ALTER (which locks
+    # the table the API reads) only runs when a column is actually missing.
+    try:
+        conn = optimizer_db.get_db_connection()
+        cur = conn.cursor()
+        cur.execute("SELECT column_name FROM information_schema.columns WHERE table_name = 'optimization_logs'")
+        missing = [col for col in FOLD_COLUMNS if col not in {row[0] for row in cur.fetchall()}]
+        if missing:
+            cur.execute("ALTER TABLE optimization_logs "
+                        + ", ".join(f"ADD COLUMN IF NOT EXISTS {col} {FOLD_COLUMNS[col]}" for col in missing))
+            conn.commit()
+            print(f"🛠️ Columnas añadidas a optimization_logs: {', '.join(missing)}")
+        cur.close()
+        conn.close()
+    except Exception as e:
+        print(f"❌ Error DB: {e}")
+
+
+@instrumentation.timed('db')
+def guardar_folds(simbolo, folds, study):
+    try:
+        conn = optimizer_db.get_db_connection()
+        cur = conn.cursor()
+        query = """
+        INSERT INTO optimization_logs (symbol, best_fast, best_slow, final_return, study, fold,
+                                       train_start, train_end, test_start, test_end, train_return)
+        VALUES %s
+        """
+        rows = [(simbolo, int(r.best_fast), int(r.best_slow), float(r.test_return), study, int(r.fold),
+                 r.train_start.to_pydatetime(), r.train_end.to_pydatetime(),
+                 r.test_start.to_pydatetime(), r.test_end.to_pydatetime(), float(r.train_return))
+                for r in folds.itertuples()]
+        execute_values(cur, query, rows)
+        db.notify(cur, db.OPTIMIZATION_CHANNEL)
+        conn.commit()
+        cur.close()
+        conn.close()
+        db.publish(db.OPTIMIZATION_CHANNEL)
+        print(f"📊 {len(rows)} folds guardados ({study})")
+    except Exception as e:
+        print(f"❌ Error DB: {e}")
+
+
+def resumen(simbolo, folds, elapsed):
+    print(f"\n🧭 WALK-FORWARD {simbolo}: {len(folds)} folds en {elapsed:.1f}s")
+    print(f"{'FOLD':<5} {'TEST DESDE':<12} {'TEST HASTA':<12} {'SMA':<8} {'TRAIN':>7} {'TEST':>7} {'B&H':>7}")
+    for r in folds.itertuples():
+        print(f"{r.fold:<5} {str(r.test_start.date()):<12} {str(r.test_end.date()):<12} "
+              f"{f'{r.best_fast}/{r.best_slow}':<8} {r.train_return:>6.2f}x {r.test_return:>6.2f}x {r.buy_hold:>6.2f}x")
+    print(f"Out-of-sample compuesto: {folds['test_return'].prod():.2f}x  "
+          f"(Buy & Hold: {folds['buy_hold'].prod():.2f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("tickers", nargs="*", help="Tickers (vacío = benchmark con 5 años de velas 1h sintéticas)")
+    parser.add_argument("--interval", default="1d", help="Timeframe (1h, 1d)")
+    parser.add_argument("--start", default="2020-01-01", help="Inicio del historial (YYYY-MM-DD)")
+    parser.add_argument("--train", type=int, default=365, help="Velas de entrenamiento por fold")
+    parser.add_argument("--test", type=int, default=90, help="Velas de test por fold")
+    parser.add_argument("--step", type=int, default=None, help="Avance entre folds (por defecto = --test, nunca menor)")
+    parser.add_argument("--anchored", action="store_true", help="Ventana de entrenamiento anclada al inicio")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos (por defecto todos los núcleos)")
+    parser.add_argument("--no-save", action="store_true", help="No guardar los folds en la base de datos")
+    args = parser.parse_args()
+    if args.step is not None and args.step < args.test:
+        parser.error("--step no puede ser menor que --test (las ventanas de test se solaparían)")
+
+    if not args.tickers:
+        df = synthetic_data.gbm_bars(5 * 365 * 24, seed=11, mu=0.00002, sigma=0.006, interval='1h')
+        t0 = time.perf_counter()
+        folds = walk_forward(df, 24 * 365, 24 * 90, anchored=args.anchored, max_workers=args.workers)
+        resumen('SINTÉTICO 1h', folds, time.perf_counter() - t0)
+    else:
+        if not args.no_save:
+            migrar_tabla()
+        for simbolo in args.tickers:
+            df = bar_resampler.get_bars(simbolo, args.interval, start=args.start)
+            t0 = time.perf_counter()
+            folds = walk_forward(df, args.train, args.test, args.step, args.anchored, max_workers=args.workers)
+            if folds.empty:
+                print(f"⚠️ {simbolo}: historial insuficiente para un fold ({len(df)} velas)")
+                continue
+            resumen(simbolo, folds, time.perf_counter() - t0)
+            if not args.no_save:
+                mode = 'anchored' if args.anchored else 'rolling'
+                study = f"wf-{mode}-{args.interval}-{args.train}/{args.test}-{pd.Timestamp.now():%Y%m%d%H%M%S}"
+                guardar_folds(simbolo, folds, study)